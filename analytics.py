@@ -0,0 +1,381 @@
+"""
+Columnar analytics snapshot of files_db.
+
+The snapshot holds the step statuses of all files as NumPy arrays, one row per file and
+step (step, status code, time worked, overdue flag, user), next to per-file columns
+(supplier, process type, current step). Names are stored as integer codes. Aggregates are
+computed with vectorized group-bys (np.bincount) instead of walking nested dicts.
+
+The snapshot is built from the file summaries and refreshed incrementally: changed files
+have their rows marked invalid and their new rows appended, and the arrays are compacted
+once too many rows are invalid.
+"""
+import threading
+import time
+
+import numpy as np
+
+import data_manager
+import file_statistics
+
+# Status codes of the status column
+STATUS_CODES = {'Not Started': 0, 'In Progress': 1, 'Completed': 2}
+NOT_STARTED, IN_PROGRESS, COMPLETED = 0, 1, 2
+
+# Compact the arrays once more than this fraction of their rows is invalid
+COMPACT_INVALID_FRACTION = 0.5
+
+# Columns crosstab() can group by and sum
+CROSSTAB_DIMENSIONS = ['step', 'status', 'user', 'supplier', 'process_type', 'current_step']
+CROSSTAB_VALUES = ['count', 'time_worked', 'overdue']
+
+# Snapshot state
+_lock = threading.RLock()
+_snapshot = None
+_changed_files = set()
+_rebuild_needed = True
+
+class Categories:
+    """
+    Encode names (steps, users, suppliers, ...) as integer codes.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.codes = {}
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def __len__(self):
+        return len(self.names)
+
+class AnalyticsSnapshot:
+    """
+    Columnar copy of the statistics fields of every file.
+    Rows and files are only appended; changed or deleted ones are marked invalid.
+    """
+
+    def __init__(self, capacity_files=1024, capacity_rows=8192):
+        self.steps = Categories()
+        self.users = Categories()
+        self.suppliers = Categories()
+        self.process_types = Categories()
+        self.file_ids = []
+        self.file_index = {}  # {file_id: file row}
+        self.file_rows = {}  # {file_id: (first step row, end step row)}
+
+        # Per-file columns
+        self.file_count = 0
+        self.file_supplier = np.zeros(capacity_files, dtype=np.int32)
+        self.file_process_type = np.zeros(capacity_files, dtype=np.int32)
+        self.file_current_step = np.full(capacity_files, -1, dtype=np.int32)
+        self.file_valid = np.zeros(capacity_files, dtype=bool)
+
+        # Per-step columns
+        self.row_count = 0
+        self.row_file = np.zeros(capacity_rows, dtype=np.int32)
+        self.row_step = np.zeros(capacity_rows, dtype=np.int32)
+        self.row_status = np.zeros(capacity_rows, dtype=np.int8)
+        self.row_time = np.zeros(capacity_rows, dtype=np.int64)
+        self.row_overdue = np.zeros(capacity_rows, dtype=bool)
+        self.row_user = np.full(capacity_rows, -1, dtype=np.int32)
+        self.row_valid = np.zeros(capacity_rows, dtype=bool)
+
+        self.invalid_rows = 0
+        self.built_at = time.time()
+
+    def _grow(self, prefix, needed):
+        """
+        Double the capacity of the file or row columns until needed entries fit.
+        """
+        columns = [name for name in vars(self) if name.startswith(prefix) and isinstance(getattr(self, name), np.ndarray)]
+        capacity = len(getattr(self, columns[0]))
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in columns:
+            column = getattr(self, name)
+            grown = np.full(capacity, -1 if name in ('file_current_step', 'row_user') else 0, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def add_files(self, summaries):
+        """
+        Append the columns of files from {file_id: summary}, replacing earlier columns of them.
+        """
+        file_columns = ([], [], [])
+        row_columns = ([], [], [], [], [], [])
+        for file_id, summary in summaries.items():
+            self.remove_file(file_id)
+            index = self.file_count + len(file_columns[0])
+            self.file_index[file_id] = index
+            self.file_ids.append(file_id)
+
+            supplier = summary['supplier'] if summary.get('supplier') is not None else 'Unknown'
+            process_type = summary['process_type'] if summary.get('process_type') is not None else 'Unknown'
+            file_columns[0].append(self.suppliers.code(supplier))
+            file_columns[1].append(self.process_types.code(process_type))
+            file_columns[2].append(self.steps.code(summary['current_step']) if summary.get('current_step') else -1)
+
+            start = self.row_count + len(row_columns[0])
+            for step, status, total_time_worked, is_overdue, updated_by in summary.get('step_stats') or ():
+                row_columns[0].append(index)
+                row_columns[1].append(self.steps.code(step))
+                row_columns[2].append(STATUS_CODES.get(status, NOT_STARTED))
+                row_columns[3].append(total_time_worked)
+                row_columns[4].append(is_overdue)
+                row_columns[5].append(self.users.code(updated_by) if updated_by else -1)
+            self.file_rows[file_id] = (start, self.row_count + len(row_columns[0]))
+
+        # Write the new entries into the columns in one slice each
+        start, self.file_count = self.file_count, self.file_count + len(file_columns[0])
+        self._grow('file_', self.file_count)
+        for column, values in zip((self.file_supplier, self.file_process_type, self.file_current_step), file_columns):
+            column[start:self.file_count] = values
+        self.file_valid[start:self.file_count] = True
+
+        start, self.row_count = self.row_count, self.row_count + len(row_columns[0])
+        self._grow('row_', self.row_count)
+        for column, values in zip((self.row_file, self.row_step, self.row_status, self.row_time, self.row_overdue, self.row_user), row_columns):
+            column[start:self.row_count] = values
+        self.row_valid[start:self.row_count] = True
+
+    def remove_file(self, file_id):
+        """
+        Mark the columns of a file invalid.
+        """
+        index = self.file_index.pop(file_id, None)
+        if index is None:
+            return
+        self.file_valid[index] = False
+        start, end = self.file_rows.pop(file_id)
+        self.row_valid[start:end] = False
+        self.invalid_rows += end - start
+
+    def needs_compaction(self):
+        """
+        Check whether enough rows are invalid to rebuild the snapshot.
+        """
+        return self.invalid_rows > COMPACT_INVALID_FRACTION * max(self.row_count, 1)
+
+    def columns(self):
+        """
+        Get the valid rows as {column: array}, with the per-file columns joined onto each row.
+        """
+        valid = self.row_valid[:self.row_count]
+        row_file = self.row_file[:self.row_count][valid]
+        return {
+            'file': row_file,
+            'step': self.row_step[:self.row_count][valid],
+            'status': self.row_status[:self.row_count][valid],
+            'time_worked': self.row_time[:self.row_count][valid],
+            'overdue': self.row_overdue[:self.row_count][valid],
+            'user': self.row_user[:self.row_count][valid],
+            'supplier': self.file_supplier[row_file],
+            'process_type': self.file_process_type[row_file],
+            'current_step': self.file_current_step[row_file]
+        }
+
+def build_snapshot(summaries):
+    """
+    Build a snapshot of every file from {file_id: summary}.
+    """
+    snapshot = AnalyticsSnapshot(capacity_files=max(len(summaries), 1024),
+                                 capacity_rows=max(8 * len(summaries), 8192))
+    snapshot.add_files(summaries)
+    return snapshot
+
+def mark_file_changed(file_id=None):
+    """
+    Note that a file changed, or any file when file_id is None.
+    Registered as a data_manager file change listener.
+    """
+    global _rebuild_needed
+    with _lock:
+        if file_id is None:
+            _rebuild_needed = True
+        else:
+            _changed_files.add(file_id)
+
+def get_snapshot(files_db):
+    """
+    Get the snapshot, applying the file changes since it was last used.
+    """
+    global _snapshot, _rebuild_needed
+
+    with _lock:
+        if _snapshot is None or _rebuild_needed or _snapshot.needs_compaction():
+            started = time.perf_counter()
+            _changed_files.clear()
+            _rebuild_needed = False
+            _snapshot = build_snapshot(data_manager.get_file_summaries(files_db))
+            print(f"[ANALYTICS] Built snapshot of {_snapshot.file_count} files, {_snapshot.row_count} step rows in {time.perf_counter() - started:.3f}s")
+            return _snapshot
+
+        changed = {}
+        while _changed_files:
+            file_id = _changed_files.pop()
+            summary = data_manager.get_file_summary(files_db, file_id)
+            if summary is None:
+                _snapshot.remove_file(file_id)
+            else:
+                changed[file_id] = summary
+        _snapshot.add_files(changed)
+        return _snapshot
+
+def _counts(codes, size, weights=None):
+    """
+    Group-by sum of weights (or count) per code, as a list of Python numbers.
+    """
+    if weights is None:
+        return np.bincount(codes, minlength=size).tolist()
+    return np.bincount(codes, weights=weights, minlength=size).round().astype(np.int64).tolist()
+
+def snapshot_statistics(snapshot, users_db, steps, step_assignments):
+    """
+    Calculate the same statistics as file_statistics.compute_statistics() from a snapshot.
+    """
+    columns = snapshot.columns()
+    file_valid = snapshot.file_valid[:snapshot.file_count]
+    stats = file_statistics.new_statistics(int(file_valid.sum()), users_db, steps, step_assignments)
+    step_count = len(snapshot.steps)
+
+    # Step statistics, grouped by step and status
+    step_codes = columns['step']
+    by_step_status = np.bincount(step_codes * 3 + columns['status'], minlength=step_count * 3).reshape(step_count, 3).tolist()
+    time_by_step = _counts(step_codes, step_count, columns['time_worked'])
+    overdue_by_step = _counts(step_codes[columns['overdue']], step_count)
+    for step in steps:
+        code = snapshot.steps.codes.get(step)
+        if code is None:
+            continue
+        not_started, in_progress, completed = by_step_status[code]
+        step_data = stats['step_stats'][step]
+        step_data['total_files'] = not_started + in_progress + completed
+        step_data['completed_files'] = completed
+        step_data['in_progress_files'] = in_progress
+        step_data['not_started_files'] = not_started
+        step_data['total_time_worked'] = time_by_step[code]
+        step_data['overdue_files'] = overdue_by_step[code]
+        stats['file_distribution']['by_status']['Completed'] += completed
+        stats['file_distribution']['by_status']['In Progress'] += in_progress
+        stats['file_distribution']['by_status']['Not Started'] += not_started
+        stats['overdue_stats']['overdue_by_step'][step] = overdue_by_step[code]
+        stats['overdue_stats']['total_overdue_steps'] += overdue_by_step[code]
+
+    # User statistics, from the rows with a user
+    with_user = columns['user'] >= 0
+    user_codes = columns['user'][with_user]
+    user_status = columns['status'][with_user]
+    user_count = len(snapshot.users)
+    time_by_user = _counts(user_codes, user_count, columns['time_worked'][with_user])
+    completed_by_user = _counts(user_codes[user_status == COMPLETED], user_count)
+    in_progress_by_user = _counts(user_codes[user_status == IN_PROGRESS], user_count)
+    overdue_by_user = _counts(user_codes[columns['overdue'][with_user]], user_count)
+    for username, code in snapshot.users.codes.items():
+        if username not in stats['user_stats']:
+            continue
+        user_data = stats['user_stats'][username]
+        user_data['total_time_worked'] = time_by_user[code]
+        user_data['completed_steps'] = completed_by_user[code]
+        user_data['in_progress_steps'] = in_progress_by_user[code]
+        user_data['overdue_steps'] = overdue_by_user[code]
+        stats['overdue_stats']['overdue_by_user'][username] = overdue_by_user[code]
+
+    # Files with an overdue step among the global steps
+    global_steps = np.array([snapshot.steps.codes[step] for step in steps if step in snapshot.steps.codes], dtype=np.int32)
+    overdue_rows = columns['overdue'] & np.isin(step_codes, global_steps)
+    file_has_overdue = np.zeros(snapshot.file_count, dtype=bool)
+    file_has_overdue[columns['file'][overdue_rows]] = True
+    time_by_file = np.bincount(columns['file'], weights=columns['time_worked'], minlength=snapshot.file_count)
+
+    # Supplier and process type statistics, from the per-file columns
+    file_supplier = snapshot.file_supplier[:snapshot.file_count][file_valid]
+    file_process_type = snapshot.file_process_type[:snapshot.file_count][file_valid]
+    file_time = time_by_file[file_valid]
+    supplier_count = len(snapshot.suppliers)
+    files_by_supplier = _counts(file_supplier, supplier_count)
+    time_by_supplier = _counts(file_supplier, supplier_count, file_time)
+    overdue_by_supplier = _counts(file_supplier[file_has_overdue[file_valid]], supplier_count)
+    for supplier, code in snapshot.suppliers.codes.items():
+        if files_by_supplier[code]:
+            stats['supplier_stats'][supplier] = {
+                'total_files': files_by_supplier[code],
+                'total_time_worked': time_by_supplier[code],
+                'average_time': 0,
+                'overdue_files': overdue_by_supplier[code]
+            }
+    process_type_count = len(snapshot.process_types)
+    files_by_process_type = _counts(file_process_type, process_type_count)
+    time_by_process_type = _counts(file_process_type, process_type_count, file_time)
+    for process_type, code in snapshot.process_types.codes.items():
+        if files_by_process_type[code]:
+            stats['process_type_stats'][process_type] = {
+                'total_files': files_by_process_type[code],
+                'total_time_worked': time_by_process_type[code],
+                'average_time': 0
+            }
+
+    # File distribution by current step
+    current_steps = snapshot.file_current_step[:snapshot.file_count][file_valid]
+    files_by_current_step = _counts(current_steps[current_steps >= 0], step_count)
+    for step, code in snapshot.steps.codes.items():
+        if files_by_current_step[code]:
+            stats['file_distribution']['by_step'][step] = files_by_current_step[code]
+
+    stats['time_stats']['total_time_worked'] = int(columns['time_worked'].sum())
+    stats['overdue_stats']['total_overdue_files'] = int(file_has_overdue[file_valid].sum())
+    return file_statistics.finish_statistics(stats)
+
+def _categories_of(snapshot, dimension):
+    """
+    Get the names of the codes of a crosstab dimension.
+    """
+    if dimension == 'status':
+        return list(STATUS_CODES)
+    return {
+        'step': snapshot.steps,
+        'current_step': snapshot.steps,
+        'user': snapshot.users,
+        'supplier': snapshot.suppliers,
+        'process_type': snapshot.process_types
+    }[dimension].names
+
+def crosstab(snapshot, rows, columns, value='count'):
+    """
+    Sum value ('count' of step rows, 'time_worked' or 'overdue' steps) over the step rows,
+    grouped by two dimensions. Returns {row name: {column name: total}} without empty cells.
+    """
+    if rows not in CROSSTAB_DIMENSIONS or columns not in CROSSTAB_DIMENSIONS:
+        raise ValueError(f"Dimensions must be among {CROSSTAB_DIMENSIONS}")
+    if value not in CROSSTAB_VALUES:
+        raise ValueError(f"Value must be one of {CROSSTAB_VALUES}")
+
+    data = snapshot.columns()
+    # Rows without a user or current step have code -1 and are left out
+    present = (data[rows] >= 0) & (data[columns] >= 0)
+    row_codes = data[rows][present].astype(np.int64)
+    column_codes = data[columns][present].astype(np.int64)
+    row_names = _categories_of(snapshot, rows)
+    column_names = _categories_of(snapshot, columns)
+
+    weights = None
+    if value == 'time_worked':
+        weights = data['time_worked'][present]
+    elif value == 'overdue':
+        weights = data['overdue'][present].astype(np.int64)
+    cells = np.bincount(row_codes * len(column_names) + column_codes, weights=weights,
+                        minlength=len(row_names) * len(column_names)).reshape(len(row_names), len(column_names))
+
+    table = {}
+    for row_code, column_code in zip(*np.nonzero(cells)):
+        table.setdefault(row_names[row_code], {})[column_names[column_code]] = int(round(cells[row_code, column_code]))
+    return table
+
+data_manager.add_file_change_listener(mark_file_changed)
@@ -1,9 +1,9 @@
 import dateutil
-from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify, session, flash
+from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify, session, flash, Response
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
 import json
 import copy
@@ -12,7 +12,15 @@ import zipfile
 import tempfile
 import threading
 import time
+import queue
+import heapq
+from collections import deque
+from itertools import islice
 import data_manager
+import file_statistics
+import analytics
+import response_cache
+import file_index
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -23,15 +31,21 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 @app.template_filter('strftime')
 def _jinja2_filter_datetime(date, fmt=None):
-    date = dateutil.parser.parse(date)
-    native = date.replace(tzinfo=None)
+    # Epoch seconds are formatted directly, only strings need parsing
+    if isinstance(date, (int, float)):
+        native = datetime.fromtimestamp(date)
+    else:
+        date = dateutil.parser.parse(date)
+        native = date.replace(tzinfo=None)
     format='%Y-%m-%d, %H:%M'
     return native.strftime(format)
 
 
-# Custom filter to convert string to datetime for time difference calculation
+# Custom filter to convert epoch seconds or a string to datetime for time difference calculation
 @app.template_filter('to_datetime')
 def to_datetime(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
     return datetime.fromisoformat(value)
 
 # Load data from files
@@ -47,9 +61,15 @@ notifications_db = data_manager.load_notifications()
 if not notifications_db:
     notifications_db = {}  # Initialize empty notifications database
 
+# Replay changes journaled since the last snapshot
+data_manager.replay_journal(users_db, files_db, steps, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db)
+
 # Migrate existing files to add creation_time if missing
 def migrate_files_creation_time():
-    for _, file in files_db.items():
+    for file_id, summary in data_manager.get_file_summaries(files_db).items():
+        if summary.get('creation_time') is not None:
+            continue
+        file = files_db[file_id]
         if 'creation_time' not in file:
             # Use the first history entry timestamp as creation time if available
             if file.get('history') and len(file['history']) > 0:
@@ -58,11 +78,43 @@ def migrate_files_creation_time():
                 # If no history, use current time
                 file['creation_time'] = datetime.now().strftime('%Y-%m-%d %H:%M')
             # Mark data as changed
-            data_manager.mark_data_changed()
+            data_manager.mark_data_changed('files_db', file_id=file_id)
 
 # Run migration
 migrate_files_creation_time()
 
+# Helper function to add epoch seconds next to the timestamp strings of a file
+def add_file_epochs(file):
+    """Add 'creation_epoch', history 'epoch' and step status 'last_update_epoch' fields where missing"""
+    changed = False
+    if 'creation_epoch' not in file and 'creation_time' in file:
+        file['creation_epoch'] = data_manager.timestamp_to_epoch(file['creation_time'])
+        changed = True
+    for entry in file.get('history', []):
+        if 'epoch' not in entry:
+            entry['epoch'] = data_manager.timestamp_to_epoch(entry.get('timestamp'))
+            changed = True
+    for step_status in file.get('step_statuses', {}).values():
+        if isinstance(step_status, dict) and 'last_update_epoch' not in step_status:
+            step_status['last_update_epoch'] = data_manager.timestamp_to_epoch(step_status.get('last_update'))
+            changed = True
+    return changed
+
+# Migrate existing files to store epoch seconds, so sorting, comparing and rendering
+# times does not parse timestamp strings
+def migrate_files_epochs():
+    migrated = 0
+    for file_id, summary in data_manager.get_file_summaries(files_db).items():
+        if summary.get('creation_epoch') is not None:
+            continue
+        if add_file_epochs(files_db[file_id]):
+            data_manager.mark_data_changed('files_db', file_id=file_id)
+            migrated += 1
+    if migrated:
+        print(f"[MIGRATION] Added epoch timestamps to {migrated} files")
+
+migrate_files_epochs()
+
 # Start auto-save
 data_manager.start_auto_save(users_db, files_db, steps, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db, interval=30)
 
@@ -74,10 +126,19 @@ def save_data_on_exit():
 # Function to manually save all data
 def save_all_data():
     data_manager.save_data(users_db, files_db, steps, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db)
-    data_manager.create_backup()
 
 atexit.register(save_data_on_exit)
 
+# Keep the files_db shards a request uses loaded until it ends, so the records it changes
+# are the ones that are saved
+@app.before_request
+def hold_files_db_shards():
+    data_manager.hold_files_db_shards(files_db)
+
+@app.teardown_request
+def release_files_db_shards(exception=None):
+    data_manager.release_files_db_shards(files_db)
+
 # Notification scanner thread variables
 notification_scanner_thread = None
 stop_notification_scanner = False
@@ -97,7 +158,7 @@ def notification_scanner():
 
             if not stop_notification_scanner:
                 print("[NOTIFICATION SCANNER] Running periodic notification scan...")
-                scan_and_update_file_notifications()
+                trigger_notification_scan()
 
         except Exception as e:
             print(f"[NOTIFICATION SCANNER] Error in notification scanner: {e}")
@@ -127,12 +188,154 @@ def stop_notification_scanner_thread():
 # Register cleanup function
 atexit.register(stop_notification_scanner_thread)
 
+# Notification stream settings for /api/notifications/stream (Server-Sent Events).
+# waitress serves every open stream from one of its worker threads (see wsgi.py),
+# so streams are capped and clients over the cap fall back to polling
+NOTIFICATION_STREAM_MAX_CONNECTIONS = 16
+NOTIFICATION_STREAM_QUEUE_SIZE = 100  # Pending events per connection before it is told to resync
+NOTIFICATION_STREAM_HEARTBEAT = 15  # Seconds between heartbeats, also how fast closed connections are noticed
+NOTIFICATION_STREAM_MAX_AGE = 300  # Seconds before a stream is closed and the browser reconnects
+
+# Open notification streams: {username: [queue.Queue]}
+notification_streams = {}
+notification_streams_lock = threading.Lock()
+
+# Helper function to open a notification stream
+def subscribe_notification_stream(username):
+    """Register a new stream queue for a user, or return None if too many streams are open"""
+    with notification_streams_lock:
+        if sum(len(queues) for queues in notification_streams.values()) >= NOTIFICATION_STREAM_MAX_CONNECTIONS:
+            return None
+        stream_queue = queue.Queue(maxsize=NOTIFICATION_STREAM_QUEUE_SIZE)
+        notification_streams.setdefault(username, []).append(stream_queue)
+        return stream_queue
+
+# Helper function to close a notification stream
+def unsubscribe_notification_stream(username, stream_queue):
+    """Remove a stream queue of a user"""
+    with notification_streams_lock:
+        queues = notification_streams.get(username, [])
+        if stream_queue in queues:
+            queues.remove(stream_queue)
+        if not queues:
+            notification_streams.pop(username, None)
+
+# Notification changes are kept in a per-user log so clients can ask for what changed
+# after a cursor (/api/notifications?since=<cursor>) instead of reloading everything.
+# A cursor is "<epoch>:<seq>", the epoch changes on every start so cursors handed out
+# by a previous process are recognised and answered with the full list
+NOTIFICATION_CHANGE_LOG_SIZE = 1000  # Changes kept per user, older cursors get the full list again
+NOTIFICATION_PAGE_SIZE_MAX = 200
+
+# - notification_changes: {username: deque([(seq, event, notification_id)])}
+# - notification_changes_dropped: {username: seq of the newest change dropped from the log}
+# - notification_unread_counts: {username: unread count}, kept up to date by publish_notification_event
+notification_changes = {}
+notification_changes_dropped = {}
+notification_unread_counts = {}
+notification_seq = 0
+notification_epoch = uuid.uuid4().hex[:8]
+notification_lock = threading.RLock()
+
+# Helper function to get the current notification cursor
+def get_notification_cursor():
+    """Get a cursor pointing after the latest notification change"""
+    return f"{notification_epoch}:{notification_seq}"
+
+# Helper function to parse a notification cursor
+def parse_notification_cursor(cursor):
+    """Get the seq of a cursor, or None if it is malformed or from a previous process"""
+    epoch, _, seq = (cursor or '').partition(':')
+    if epoch != notification_epoch or not seq.isdigit():
+        return None
+    return int(seq)
+
+# Helper function to record a notification change and push it to a user's open streams
+def publish_notification_event(username, event, ids, unread_delta=0):
+    """
+    Record that notifications were 'created', 'removed' or 'read', adjust the user's
+    unread count by unread_delta and send the change to every open stream of the user
+    """
+    global notification_seq
+    with notification_lock:
+        notification_unread_counts[username] = notification_unread_counts.get(username, 0) + unread_delta
+        changes = notification_changes.get(username)
+        if changes is None:
+            changes = notification_changes[username] = deque(maxlen=NOTIFICATION_CHANGE_LOG_SIZE)
+        for notification_id in ids:
+            notification_seq += 1
+            if len(changes) == changes.maxlen:
+                notification_changes_dropped[username] = changes[0][0]
+            changes.append((notification_seq, event, notification_id))
+        cursor = get_notification_cursor()
+        unread_count = notification_unread_counts[username]
+
+    with notification_streams_lock:
+        queues = list(notification_streams.get(username, []))
+    if not queues:
+        return
+
+    if event == 'created':
+        data = {'notification': render_notification(notifications_db[username][ids[0]])}
+    else:
+        data = {'ids': list(ids)}
+    data.update(unread_count=unread_count, cursor=cursor)
+    for stream_queue in queues:
+        try:
+            stream_queue.put_nowait((event, data))
+        except queue.Full:
+            # The client is not keeping up, drop its backlog and have it reload the list
+            while True:
+                try:
+                    stream_queue.get_nowait()
+                except queue.Empty:
+                    break
+            stream_queue.put_nowait(('resync', {}))
+
+# Notifications are stored per user in a dict keyed by notification id.
+# file_assigned notifications go to every user of a step, so they are fanned out: one shared
+# event per (file, step) holds the id, title, message and timestamp, and each user only stores
+# {'id': event id, 'event': event, 'read': bool}. render_notification turns both kinds into
+# the same dict for the API. file_assigned notifications are also indexed, the indexes are
+# rebuilt on startup:
+# - notification_key_index: {username: {get_notification_key(...): notification_id}}
+# - file_assigned_index: {file_id: {username: step}}
+# - notification_events: {(file_id, step): shared event}
+notification_key_index = {}
+file_assigned_index = {}
+notification_events = {}
+
+# Helper function to get the fields of a notification
+def get_notification_event(notification):
+    """Get the dict holding the type, title, message, file_id, step and timestamp of a notification"""
+    return notification.get('event', notification)
+
+# Helper function to render a notification for the API
+def render_notification(notification):
+    """Get a notification as a single dict, expanding shared events"""
+    if 'event' not in notification:
+        return notification
+    return dict(notification['event'], id=notification['id'], read=notification.get('read', False))
+
+# Helper function to store a new notification
+def store_notification(username, notification):
+    """Add a notification or shared event entry to a user's notifications"""
+    with notification_lock:
+        if username not in notifications_db:
+            notifications_db[username] = {}
+            data_manager.record_change('notifications_db', 'set', [username], {})
+        notifications_db[username][notification['id']] = notification
+        data_manager.record_change('notifications_db', 'set', [username, notification['id']], notification)
+        index_notification(username, notification)
+        publish_notification_event(username, 'created', [notification['id']], unread_delta=1)
+        over_limit = len(notifications_db[username]) > NOTIFICATION_MAX_PER_USER
+
+    if over_limit:
+        request_notification_compaction(username)
+
 # Helper function to create a notification
 def create_notification(username, notification_type, title, message, file_id=None, step=None):
     """Create a notification for a user"""
-    if username not in notifications_db:
-        notifications_db[username] = []
-
     notification = {
         'id': str(uuid.uuid4()),
         'type': notification_type,  # 'file_assigned', 'step_overdue', 'file_completed', etc.
@@ -143,41 +346,178 @@ def create_notification(username, notification_type, title, message, file_id=Non
         'timestamp': datetime.now().isoformat(),
         'read': False
     }
+    store_notification(username, notification)
+    return notification
 
-    notifications_db[username].append(notification)
-    data_manager.mark_data_changed()
+# Helper function to create a shared notification for a user
+def create_shared_notification(username, notification_type, title, message, file_id, step):
+    """Give a user the shared event of a (file, step), creating the event for its first user"""
+    with notification_lock:
+        event = notification_events.get((file_id, step))
+        if event is None:
+            event = {
+                'id': str(uuid.uuid4()),
+                'type': notification_type,
+                'title': title,
+                'message': message,
+                'file_id': file_id,
+                'step': step,
+                'timestamp': datetime.now().isoformat()
+            }
+            notification_events[(file_id, step)] = event
+        notification = {'id': event['id'], 'event': event, 'read': False}
+        store_notification(username, notification)
     return notification
 
+# Helper function to add a notification to the indexes
+def index_notification(username, notification):
+    """Add a file_assigned notification to the notification indexes"""
+    event = get_notification_event(notification)
+    if event.get('type') != 'file_assigned':
+        return
+    file_id = event.get('file_id')
+    step = event.get('step')
+    if file_id and step:
+        notification_key_index.setdefault(username, {})[get_notification_key(username, file_id, step)] = notification['id']
+        file_assigned_index.setdefault(file_id, {})[username] = step
+        if 'event' in notification:
+            # Entries loaded separately (journal replay, SQLite) are linked to one shared event again
+            shared = notification_events.setdefault((file_id, step), event)
+            if shared is not event and shared['id'] == event['id']:
+                notification['event'] = shared
+
+# Helper function to convert file_assigned notifications to shared events
+def share_file_assigned_notifications():
+    """
+    Convert per-user file_assigned notifications (stored before they were fanned out, or
+    loaded from SQLite, which keeps one row per user) into entries of shared events
+    """
+    events = {}
+    changed = False
+    with notification_lock:
+        for username, user_notifications in list(notifications_db.items()):
+            converted = {}
+            for notification_id, notification in user_notifications.items():
+                if notification.get('type') == 'file_assigned' and 'event' not in notification:
+                    key = (notification.get('file_id'), notification.get('step'))
+                    event = events.get(key)
+                    if event is None:
+                        event = events[key] = {field: notification.get(field) for field in
+                                               ('id', 'type', 'title', 'message', 'file_id', 'step', 'timestamp')}
+                    notification = {'id': event['id'], 'event': event, 'read': notification.get('read', False)}
+                    changed = True
+                converted[notification['id']] = notification
+            notifications_db[username] = converted
+
+    if changed:
+        data_manager.mark_data_changed('notifications_db')
+        print("[NOTIFICATION] Converted file_assigned notifications to shared events")
+    return changed
+
+# Helper function to rebuild the notification indexes
+def rebuild_notification_index():
+    """Rebuild notification_key_index, file_assigned_index, the shared events and the unread counts from notifications_db"""
+    with notification_lock:
+        notification_key_index.clear()
+        file_assigned_index.clear()
+        notification_events.clear()
+        notification_unread_counts.clear()
+        for username, user_notifications in notifications_db.items():
+            unread = 0
+            for notification in user_notifications.values():
+                index_notification(username, notification)
+                if not notification.get('read', False):
+                    unread += 1
+            notification_unread_counts[username] = unread
+
 # Helper function to get user notifications
 def get_user_notifications(username, unread_only=False):
     """Get notifications for a user"""
     if username not in notifications_db:
         return []
 
-    user_notifications = notifications_db[username]
+    user_notifications = [render_notification(n) for n in notifications_db[username].values()]
     if unread_only:
         return [n for n in user_notifications if not n.get('read', False)]
 
     # Sort by timestamp (newest first)
     return sorted(user_notifications, key=lambda x: x['timestamp'], reverse=True)
 
+# Helper function to get a page of user notifications
+def get_user_notifications_page(username, limit, before=None, unread_only=False):
+    """
+    Get up to limit notifications of a user, newest first, starting after the notification
+    with id before. Notifications are kept in creation order, so no sorting is needed.
+    Returns (notifications, id to pass as before for the next page or None)
+    """
+    user_notifications = reversed(notifications_db.get(username, {}).values())
+    if before:
+        for notification in user_notifications:
+            if notification['id'] == before:
+                break
+    if unread_only:
+        user_notifications = (n for n in user_notifications if not n.get('read', False))
+
+    page = [render_notification(n) for n in islice(user_notifications, limit + 1)]
+    if len(page) > limit:
+        return page[:limit], page[limit - 1]['id']
+    return page, None
+
+# Helper function to get the notification changes of a user after a cursor
+def get_notification_changes(username, since):
+    """
+    Get the notifications created, removed and read after the cursor seq since,
+    or None if the change log no longer reaches back that far
+    """
+    with notification_lock:
+        if since > notification_seq or since < notification_changes_dropped.get(username, 0):
+            return None
+        entries = []
+        for entry in reversed(notification_changes.get(username, ())):
+            if entry[0] <= since:
+                break
+            entries.append(entry)
+
+    created = {}
+    removed = []
+    read = []
+    user_notifications = notifications_db.get(username, {})
+    for seq, event, notification_id in reversed(entries):
+        if event == 'created':
+            created[notification_id] = True
+        elif event == 'removed':
+            # Notifications created and removed after the cursor were never seen by the client
+            if created.pop(notification_id, None) is None:
+                removed.append(notification_id)
+        elif event == 'read' and notification_id not in created:
+            read.append(notification_id)
+
+    return {
+        'created': [render_notification(user_notifications[nid]) for nid in created if nid in user_notifications],
+        'removed': removed,
+        'read': [nid for nid in read if nid in user_notifications]
+    }
+
+# Helper function to count unread notifications
+def count_unread_notifications(username):
+    """Count the unread notifications of a user"""
+    return notification_unread_counts.get(username, 0)
+
 # Helper function to mark notification as read
 def mark_notification_read(username, notification_id):
     """Mark a notification as read"""
-    if username not in notifications_db:
-        return False
-    print(notifications_db[username])
-    print("notification id: ",notification_id)
-    for notification in notifications_db[username]:
-        if notification['id'] == notification_id:
-            notification['read'] = True
-            data_manager.mark_data_changed()
-            
-            print("All nots: ",notifications_db[username])
-            print("Marked notification as read: ", notification)
+    with notification_lock:
+        notification = notifications_db.get(username, {}).get(notification_id)
+        if notification is None:
+            return False
+        if notification.get('read', False):
             return True
-    
-    return False
+
+        notification['read'] = True
+        data_manager.record_change('notifications_db', 'update', [username, notification_id], {'read': True})
+        publish_notification_event(username, 'read', [notification_id], unread_delta=-1)
+    print(f"[NOTIFICATION] Marked notification {notification_id} as read for user {username}")
+    return True
 
 # Helper function to create a unique notification key for file assignments
 def get_notification_key(username, file_id, step):
@@ -187,105 +527,492 @@ def get_notification_key(username, file_id, step):
 # Helper function to check if a notification already exists
 def notification_exists(username, file_id, step):
     """Check if a notification already exists for this user, file, and step"""
-    if username not in notifications_db:
-        return False
-
-    for notification in notifications_db[username]:
-        if (notification.get('type') == 'file_assigned' and
-            notification.get('file_id') == file_id and
-            notification.get('step') == step):
-            return True
-    return False
+    return get_notification_key(username, file_id, step) in notification_key_index.get(username, {})
 
 # Helper function to remove notification for a specific file/step combination
 def remove_file_notification(username, file_id, step):
     """Remove notification for a specific file/step combination"""
-    if username not in notifications_db:
+    notification_id = notification_key_index.get(username, {}).pop(get_notification_key(username, file_id, step), None)
+    if notification_id is None:
         return False
 
-    initial_count = len(notifications_db[username])
-    notifications_db[username] = [n for n in notifications_db[username]
-                                if not (n.get('type') == 'file_assigned' and
-                                       n.get('file_id') == file_id and
-                                       n.get('step') == step)]
-
-    removed = len(notifications_db[username]) < initial_count
-    if removed:
-        data_manager.mark_data_changed()
-        print(f"[NOTIFICATION] Removed notification for user {username}, file {file_id}, step {step}")
-    return removed
+    with notification_lock:
+        file_users = file_assigned_index.get(file_id, {})
+        if file_users.get(username) == step:
+            del file_users[username]
+            if not file_users:
+                del file_assigned_index[file_id]
+        # Drop the shared event once its last user lost it, the file may enter the step again later
+        if step not in file_users.values():
+            notification_events.pop((file_id, step), None)
+
+        notification = notifications_db.get(username, {}).pop(notification_id, None)
+        if notification is not None:
+            data_manager.record_change('notifications_db', 'delete', [username, notification_id])
+            publish_notification_event(username, 'removed', [notification_id], unread_delta=0 if notification.get('read', False) else -1)
+    print(f"[NOTIFICATION] Removed notification for user {username}, file {file_id}, step {step}")
+    return True
+
+# Helper function to get the users a file in a step should notify
+def get_file_step_users(summary):
+    """Get the users assigned to the current step of a file, from its summary"""
+    current_step = summary.get('current_step') if summary else None
+    if not current_step:
+        return set()
+
+    step_users = set()
+    for username, user_data in users_db.items():
+        if current_step in user_data.get('roles', []) or current_step in user_data.get('custom_steps', []):
+            step_users.add(username)
+
+    # File-specific assignments narrow the global role assignment
+    current_step_users = summary.get('current_step_users')
+    if current_step_users is not None:
+        step_users &= set(current_step_users)
+    return step_users
+
+# Helper function to create a file_assigned notification
+def create_file_assigned_notification(username, file_id, step, summary):
+    """Create the notification telling a user a file is in one of their steps"""
+    create_shared_notification(
+        username,
+        'file_assigned',
+        f'File in your step: {step}',
+        f'File "{summary.get("original_filename") or "Unknown"}" is currently in step "{step}" which is assigned to you.',
+        file_id=file_id,
+        step=step
+    )
+    print(f"[NOTIFICATION] Created new notification for user {username}, file {file_id}, step {step}")
+
+# Helper function to update the notifications of a single file
+def update_file_notifications(file_id):
+    """Update file_assigned notifications after a file moved step, its step assignments changed or it was deleted"""
+    summary = data_manager.get_file_summary(files_db, file_id)
+    step = summary.get('current_step') if summary else None
+    target_users = get_file_step_users(summary)
+    existing = dict(file_assigned_index.get(file_id, {}))  # {username: step}
+
+    # Remove notifications of users no longer assigned, or for a previous step
+    for username, notified_step in existing.items():
+        if username not in target_users or notified_step != step:
+            remove_file_notification(username, file_id, notified_step)
+
+    # Notify newly assigned users
+    for username in target_users:
+        if existing.get(username) != step:
+            create_file_assigned_notification(username, file_id, step, summary)
+
+# Helper function to update the notifications of a single user
+def update_user_notifications(username):
+    """Update a user's file_assigned notifications after their roles or custom steps changed"""
+    if username not in users_db:
+        return
+    user_steps = set(users_db[username].get('roles', []) + users_db[username].get('custom_steps', []))
+
+    current_files = {}  # {file_id: step}
+    for file_id, summary in data_manager.get_file_summaries(files_db).items():
+        current_step = summary.get('current_step')
+        if current_step in user_steps:
+            current_step_users = summary.get('current_step_users')
+            if current_step_users is None or username in current_step_users:
+                current_files[file_id] = (current_step, summary)
+
+    existing = {file_id: users[username] for file_id, users in file_assigned_index.items() if username in users}
+    for file_id, notified_step in existing.items():
+        if file_id not in current_files or current_files[file_id][0] != notified_step:
+            remove_file_notification(username, file_id, notified_step)
+    for file_id, (step, summary) in current_files.items():
+        if existing.get(file_id) != step:
+            create_file_assigned_notification(username, file_id, step, summary)
 
 # Helper function to scan and update file notifications for all users
 def scan_and_update_file_notifications():
-    """Scan all files and update notifications based on current file positions"""
-    print("\n[NOTIFICATION SCAN] Starting notification scan...")
-
-    # Track current file positions for each user
-    current_user_files = {}  # {username: {file_id: step}}
-
-    # Build current state of files in user steps
-    for username in users_db:
-        user_roles = users_db[username].get('roles', [])
-        user_custom_steps = users_db[username].get('custom_steps', [])
-        user_steps = set(user_roles + user_custom_steps)
-        current_user_files[username] = {}
-
-        for file_id, file in files_db.items():
-            current_step = file.get('current_step')
-
-            # Check if user is assigned to current step
-            if current_step in user_steps:
-                # Check file-specific assignments if they exist
-                file_assignments = file.get('step_assignments', {})
-                if current_step in file_assignments:
-                    if username in file_assignments[current_step]:
-                        current_user_files[username][file_id] = current_step
-                else:
-                    # Fall back to global role assignment
-                    current_user_files[username][file_id] = current_step
-
-    # For each user, compare current state with existing notifications
-    for username in users_db:
-        if username not in notifications_db:
-            notifications_db[username] = []
-
-        # Get existing file assignment notifications
-        existing_notifications = {}  # {file_id: step}
-        for notification in notifications_db[username]:
-            if notification.get('type') == 'file_assigned':
-                file_id = notification.get('file_id')
-                step = notification.get('step')
-                if file_id and step:
-                    existing_notifications[file_id] = step
-
-        current_files = current_user_files.get(username, {})
-
-        # Remove notifications for files no longer in user's steps
-        for file_id, step in existing_notifications.items():
-            if file_id not in current_files or current_files[file_id] != step:
+    """
+    Scan all files and update notifications based on current file positions.
+    Changes are handled incrementally by update_file_notifications and update_user_notifications,
+    this full scan only runs periodically as a consistency check.
+    """
+    print("\n[NOTIFICATION SCAN] Starting notification consistency scan...")
+    fixed = 0
+
+    # Rebuild the index in case notifications were changed outside the helpers
+    rebuild_notification_index()
+
+    # Expected state: {file_id: {username: step}}
+    expected = {}
+    file_summaries = data_manager.get_file_summaries(files_db)
+    for file_id, summary in file_summaries.items():
+        step = summary.get('current_step')
+        for username in get_file_step_users(summary):
+            expected.setdefault(file_id, {})[username] = step
+
+    # Remove notifications that do not match the expected state
+    for file_id, file_users in list(file_assigned_index.items()):
+        for username, step in list(file_users.items()):
+            if expected.get(file_id, {}).get(username) != step:
                 remove_file_notification(username, file_id, step)
+                fixed += 1
+
+    # Add missing notifications
+    for file_id, file_users in expected.items():
+        for username, step in file_users.items():
+            if file_assigned_index.get(file_id, {}).get(username) != step:
+                create_file_assigned_notification(username, file_id, step, file_summaries[file_id])
+                fixed += 1
+
+    print(f"[NOTIFICATION SCAN] Notification consistency scan completed, {fixed} notifications fixed")
+    return fixed
+
+# Notification worker settings. Notification updates run on a background worker so
+# request handlers return immediately; triggers arriving close together are batched
+NOTIFICATION_WORKER_DEBOUNCE = 0.5  # Seconds without new triggers before a batch is processed
+NOTIFICATION_WORKER_MAX_DELAY = 5  # Seconds a trigger may be held back by a steady stream of new ones
+
+# Pending notification work. Triggers for a file or user that is already pending are merged,
+# and a pending full scan covers every file and user
+notification_work = {'files': set(), 'users': set(), 'scan': False, 'first_trigger': None, 'last_trigger': None}
+notification_work_condition = threading.Condition()
+notification_worker_thread = None
+notification_worker_busy = False
+notification_worker_flushing = 0
+stop_notification_worker = False
+
+# Notification worker metrics, lags are seconds from the oldest trigger of a batch until it was processed
+notification_worker_stats = {
+    'triggers': 0,
+    'merged': 0,
+    'batches': 0,
+    'files_processed': 0,
+    'users_processed': 0,
+    'scans': 0,
+    'errors': 0,
+    'last_lag': 0.0,
+    'max_lag': 0.0,
+    'total_lag': 0.0
+}
+
+# Helper function to check for pending notification work
+def has_notification_work():
+    """Check if any notification work is pending, call with notification_work_condition held"""
+    return bool(notification_work['files'] or notification_work['users'] or notification_work['scan'])
+
+# Helper function to take the pending notification work
+def take_notification_work():
+    """Take and reset the pending notification work, call with notification_work_condition held"""
+    batch = {
+        'files': notification_work['files'],
+        'users': notification_work['users'],
+        'scan': notification_work['scan'],
+        'first_trigger': notification_work['first_trigger']
+    }
+    notification_work.update(files=set(), users=set(), scan=False, first_trigger=None, last_trigger=None)
+    return batch
+
+# Helper function to process a batch of notification work
+def process_notification_work(batch):
+    """Run the notification updates of a batch, a full scan replaces the individual updates"""
+    processed = {'files_processed': 0, 'users_processed': 0, 'scans': 0, 'errors': 0}
+    if batch['scan']:
+        try:
+            scan_and_update_file_notifications()
+            processed['scans'] += 1
+        except Exception as e:
+            print(f"[NOTIFICATION WORKER] Error in notification scan: {e}")
+            processed['errors'] += 1
+        return processed
+
+    for file_id in batch['files']:
+        try:
+            update_file_notifications(file_id)
+            processed['files_processed'] += 1
+        except Exception as e:
+            print(f"[NOTIFICATION WORKER] Error updating notifications for file {file_id}: {e}")
+            processed['errors'] += 1
+    for username in batch['users']:
+        try:
+            update_user_notifications(username)
+            processed['users_processed'] += 1
+        except Exception as e:
+            print(f"[NOTIFICATION WORKER] Error updating notifications for user {username}: {e}")
+            processed['errors'] += 1
+    return processed
+
+def notification_worker():
+    """Background thread that processes queued notification updates in debounced batches"""
+    global notification_worker_busy
+    print("[NOTIFICATION WORKER] Starting notification worker thread...")
+
+    while True:
+        with notification_work_condition:
+            while not has_notification_work() and not stop_notification_worker:
+                notification_work_condition.wait()
+            if not has_notification_work():
+                break
+
+            # Wait for the triggers to settle, unless stopping or flushing
+            while not stop_notification_worker and not notification_worker_flushing:
+                deadline = min(notification_work['last_trigger'] + NOTIFICATION_WORKER_DEBOUNCE,
+                               notification_work['first_trigger'] + NOTIFICATION_WORKER_MAX_DELAY)
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                notification_work_condition.wait(remaining)
 
-        # Add notifications for new files in user's steps
-        for file_id, step in current_files.items():
-            if not notification_exists(username, file_id, step):
-                file = files_db.get(file_id, {})
-                create_notification(
-                    username,
-                    'file_assigned',
-                    f'File in your step: {step}',
-                    f'File "{file.get("original_filename", "Unknown")}" is currently in step "{step}" which is assigned to you.',
-                    file_id=file_id,
-                    step=step
-                )
-                print(f"[NOTIFICATION] Created new notification for user {username}, file {file_id}, step {step}")
-
-    print("[NOTIFICATION SCAN] Notification scan completed")
-
-# Helper function to trigger immediate notification scan
+            batch = take_notification_work()
+            notification_worker_busy = True
+
+        data_manager.hold_files_db_shards(files_db)
+        try:
+            processed = process_notification_work(batch)
+        finally:
+            data_manager.release_files_db_shards(files_db)
+        lag = time.time() - batch['first_trigger']
+        print(f"[NOTIFICATION WORKER] Processed {len(batch['files'])} files, {len(batch['users'])} users"
+              f"{' and a full scan' if batch['scan'] else ''} with {lag:.2f}s lag")
+
+        with notification_work_condition:
+            for key, value in processed.items():
+                notification_worker_stats[key] += value
+            notification_worker_stats['batches'] += 1
+            notification_worker_stats['last_lag'] = lag
+            notification_worker_stats['max_lag'] = max(notification_worker_stats['max_lag'], lag)
+            notification_worker_stats['total_lag'] += lag
+            notification_worker_busy = False
+            notification_work_condition.notify_all()
+
+    print("[NOTIFICATION WORKER] Notification worker thread stopped")
+
+def start_notification_worker():
+    """Start the notification worker thread"""
+    global notification_worker_thread, stop_notification_worker
+
+    with notification_work_condition:
+        if notification_worker_thread is None or not notification_worker_thread.is_alive():
+            stop_notification_worker = False
+            notification_worker_thread = threading.Thread(target=notification_worker, daemon=True)
+            notification_worker_thread.start()
+            print("[NOTIFICATION WORKER] Notification worker thread started")
+
+def stop_notification_worker_thread():
+    """Stop the notification worker thread after it processed the pending work"""
+    global stop_notification_worker
+    with notification_work_condition:
+        stop_notification_worker = True
+        notification_work_condition.notify_all()
+    if notification_worker_thread and notification_worker_thread.is_alive():
+        notification_worker_thread.join(timeout=5)
+
+# Register cleanup function, it runs before save_data_on_exit so pending updates are saved
+atexit.register(stop_notification_worker_thread)
+
+# Helper function to queue notification work
+def queue_notification_work(file_id=None, username=None, scan=False):
+    """Add work for the notification worker, merging it with work that is already pending"""
+    if not stop_notification_worker and (notification_worker_thread is None or not notification_worker_thread.is_alive()):
+        start_notification_worker()
+
+    with notification_work_condition:
+        now = time.time()
+        notification_worker_stats['triggers'] += 1
+        merged = False
+        if file_id is not None:
+            merged = file_id in notification_work['files']
+            notification_work['files'].add(file_id)
+        if username is not None:
+            merged = merged or username in notification_work['users']
+            notification_work['users'].add(username)
+        if scan:
+            merged = notification_work['scan']
+            notification_work['scan'] = True
+        if merged or (notification_work['scan'] and not scan):
+            notification_worker_stats['merged'] += 1
+
+        if notification_work['first_trigger'] is None:
+            notification_work['first_trigger'] = now
+        notification_work['last_trigger'] = now
+        notification_work_condition.notify_all()
+
+    # The worker is gone during shutdown, do the work right away
+    if stop_notification_worker:
+        flush_notification_worker()
+
+# Helper function to wait for the notification worker
+def flush_notification_worker(timeout=None):
+    """
+    Process pending notification work now, skipping the debounce, and wait until it is done.
+    Returns False if the work was not finished within timeout seconds
+    """
+    global notification_worker_flushing
+    deadline = time.time() + timeout if timeout is not None else None
+    with notification_work_condition:
+        notification_worker_flushing += 1
+        notification_work_condition.notify_all()
+        try:
+            while has_notification_work() or notification_worker_busy:
+                if notification_worker_thread is None or not notification_worker_thread.is_alive():
+                    # Nothing will pick the work up, process it here
+                    batch = take_notification_work()
+                    process_notification_work(batch)
+                    continue
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                notification_work_condition.wait(remaining)
+            return True
+        finally:
+            notification_worker_flushing -= 1
+
+# Helper function to get the notification worker metrics
+def get_notification_worker_stats():
+    """Get the notification worker counters and lag metrics, including the pending work"""
+    with notification_work_condition:
+        stats = dict(notification_worker_stats)
+        stats['average_lag'] = stats['total_lag'] / stats['batches'] if stats['batches'] else 0.0
+        stats['pending_files'] = len(notification_work['files'])
+        stats['pending_users'] = len(notification_work['users'])
+        stats['pending_scan'] = notification_work['scan']
+        first_trigger = notification_work['first_trigger']
+        stats['oldest_pending_age'] = time.time() - first_trigger if first_trigger is not None else 0.0
+        stats['busy'] = notification_worker_busy
+        stats['running'] = notification_worker_thread is not None and notification_worker_thread.is_alive()
+    return stats
+
+# Helper function to trigger a notification update
+def trigger_notification_update(file_id=None, username=None):
+    """Queue an update of the notifications affected by a change to a file or to a user's steps"""
+    print(f"[NOTIFICATION] Queueing notification update for file {file_id} / user {username}")
+    queue_notification_work(file_id=file_id, username=username)
+    if file_id is not None:
+        schedule_step_deadline(file_id)
+
+# Helper function to trigger a notification scan
 def trigger_notification_scan():
-    """Trigger an immediate notification scan (used when files change steps)"""
-    print("[NOTIFICATION] Triggering immediate notification scan due to file changes...")
-    scan_and_update_file_notifications()
+    """Queue a full notification scan"""
+    print("[NOTIFICATION] Queueing notification scan...")
+    queue_notification_work(scan=True)
+
+# Notification retention settings, applied by the notification compactor.
+# file_assigned notifications mirror where files are right now and are never removed by retention
+NOTIFICATION_MAX_PER_USER = 500  # Oldest notifications beyond this are archived, read ones first
+NOTIFICATION_MAX_READ_AGE = 30 * 24 * 3600  # Seconds before read notifications are archived
+NOTIFICATION_COMPACT_INTERVAL = 600  # Seconds between compactions of all users
+
+# Notification compactor thread variables, users that went over the limit are compacted right away
+notification_compactor_thread = None
+stop_notification_compactor = False
+notification_compact_wakeup = threading.Event()
+notification_compact_users = set()
+
+# Helper function to select the notifications removed by the retention policy
+def get_notifications_to_compact(user_notifications, now):
+    """Get the ids of the notifications of a user the retention policy removes, oldest first"""
+    min_read_time = now - timedelta(seconds=NOTIFICATION_MAX_READ_AGE)
+    expired = []
+    kept_read = []
+    kept_unread = []
+    kept_file_assigned = 0
+
+    # Notifications are kept in creation order, oldest first
+    for notification_id, notification in user_notifications.items():
+        event = get_notification_event(notification)
+        if event.get('type') == 'file_assigned':
+            kept_file_assigned += 1
+        elif not notification.get('read', False):
+            kept_unread.append(notification_id)
+        elif datetime.fromisoformat(event['timestamp']) < min_read_time:
+            expired.append(notification_id)
+        else:
+            kept_read.append(notification_id)
+
+    excess = kept_file_assigned + len(kept_read) + len(kept_unread) - NOTIFICATION_MAX_PER_USER
+    if excess > 0:
+        expired.extend((kept_read + kept_unread)[:excess])
+    return expired
+
+# Helper function to apply the retention policy to a user's notifications
+def compact_user_notifications(username, now=None):
+    """Archive and remove the notifications of a user the retention policy removes"""
+    now = now or datetime.now()
+    with notification_lock:
+        user_notifications = notifications_db.get(username)
+        if not user_notifications:
+            return 0
+        notification_ids = get_notifications_to_compact(user_notifications, now)
+        if not notification_ids:
+            return 0
+
+        # Archive before removing, so nothing is lost if the app stops in between
+        data_manager.archive_notifications(username, [render_notification(user_notifications[nid]) for nid in notification_ids])
+        unread = 0
+        for notification_id in notification_ids:
+            if not user_notifications.pop(notification_id).get('read', False):
+                unread += 1
+        data_manager.record_changes('notifications_db', [('delete', [username, notification_id], None) for notification_id in notification_ids])
+        publish_notification_event(username, 'removed', notification_ids, unread_delta=-unread)
+
+    print(f"[NOTIFICATION COMPACTOR] Archived {len(notification_ids)} notifications of user {username}")
+    return len(notification_ids)
+
+# Helper function to apply the retention policy to all notifications
+def compact_notifications(now=None):
+    """Archive and remove the notifications of all users the retention policy removes"""
+    return sum(compact_user_notifications(username, now) for username in list(notifications_db))
+
+def notification_compactor():
+    """Background thread that compacts all users periodically and users over the limit right away"""
+    print("[NOTIFICATION COMPACTOR] Starting notification compactor thread...")
+    next_full_compaction = time.time() + NOTIFICATION_COMPACT_INTERVAL
+
+    while not stop_notification_compactor:
+        notification_compact_wakeup.wait(max(0, next_full_compaction - time.time()))
+        notification_compact_wakeup.clear()
+        if stop_notification_compactor:
+            break
+
+        try:
+            if time.time() >= next_full_compaction:
+                notification_compact_users.clear()
+                compact_notifications()
+                next_full_compaction = time.time() + NOTIFICATION_COMPACT_INTERVAL
+            else:
+                while notification_compact_users:
+                    compact_user_notifications(notification_compact_users.pop())
+        except Exception as e:
+            print(f"[NOTIFICATION COMPACTOR] Error compacting notifications: {e}")
+
+    print("[NOTIFICATION COMPACTOR] Notification compactor thread stopped")
+
+def start_notification_compactor():
+    """Start the notification compactor thread"""
+    global notification_compactor_thread, stop_notification_compactor
+
+    if notification_compactor_thread is None or not notification_compactor_thread.is_alive():
+        stop_notification_compactor = False
+        notification_compactor_thread = threading.Thread(target=notification_compactor, daemon=True)
+        notification_compactor_thread.start()
+
+def stop_notification_compactor_thread():
+    """Stop the notification compactor thread"""
+    global stop_notification_compactor
+    stop_notification_compactor = True
+    notification_compact_wakeup.set()
+    if notification_compactor_thread and notification_compactor_thread.is_alive():
+        notification_compactor_thread.join(timeout=5)
+
+atexit.register(stop_notification_compactor_thread)
+
+# Helper function to have a user's notifications compacted soon
+def request_notification_compaction(username):
+    """Wake the notification compactor for a user that went over NOTIFICATION_MAX_PER_USER"""
+    notification_compact_users.add(username)
+    notification_compact_wakeup.set()
+
+# Build the notification index from the loaded notifications
+share_file_assigned_notifications()
+rebuild_notification_index()
+
+# Start the notification compactor
+start_notification_compactor()
 
 # Legacy function kept for backward compatibility but now uses the new scan system
 def generate_user_file_notifications(username):
@@ -318,13 +1045,97 @@ def is_authorized_for_step(username, step, file_id=None):
 
 # Helper function to count files in each step
 def count_files_in_steps():
-    step_counts = {step: 0 for step in steps}
-    for _, file in files_db.items():
-        current_step = file.get('current_step')
-        if current_step in step_counts:
-            step_counts[current_step] += 1
+    return data_manager.count_files_in_steps(files_db, steps)
+
+# Step timelines derived from each file's history, kept so step times do not need a sorted
+# copy of the history on every call: {file_id: {'length': number of history entries applied,
+# 'first': earliest entry {'time', 'step', 'timestamp'}, 'steps': {step: {'status', 'last_update',
+# 'last_update_epoch', 'updated_by', 'completed_at', 'completed_time'}}}}. Times are epoch seconds.
+# append_history_entry updates a timeline in place, any other change to a history makes
+# get_file_timeline rebuild it
+file_timelines = {}
+
+# Helper function to get the epoch of a history entry
+def get_entry_epoch(entry):
+    """Get the epoch seconds of a history entry, parsing its timestamp if it has no epoch"""
+    epoch = entry.get('epoch')
+    return epoch if epoch is not None else data_manager.timestamp_to_epoch(entry.get('timestamp'))
+
+# Helper function to apply a history entry to a step timeline
+def apply_timeline_entry(timeline, entry):
+    """Update a step timeline with one history entry, in history order"""
+    step = entry.get('step')
+    timestamp = entry['timestamp']
+    entry_time = entry.get('epoch')
+    if entry_time is None:
+        entry_time = int(datetime.fromisoformat(timestamp).timestamp())
+
+    first = timeline['first']
+    if first is None or entry_time < first['time']:
+        timeline['first'] = {'time': entry_time, 'step': step, 'timestamp': timestamp}
+
+    step_timeline = timeline['steps'].get(step)
+    if step_timeline is None:
+        step_timeline = timeline['steps'][step] = {
+            'status': 'Not Started',
+            'last_update': None,
+            'last_update_epoch': None,
+            'updated_by': None,
+            'completed_at': None,
+            'completed_time': None
+        }
 
-    return step_counts
+    # Last update and user come from the newest entry, the status from the latest one in history order
+    if step_timeline['last_update_epoch'] is None or entry_time > step_timeline['last_update_epoch']:
+        step_timeline['last_update'] = timestamp
+        step_timeline['last_update_epoch'] = entry_time
+        step_timeline['updated_by'] = entry.get('user')
+
+    filename = entry.get('filename') or ''
+    if filename.startswith('Status update to '):
+        step_timeline['status'] = filename.replace('Status update to ', '')
+    elif entry.get('path'):  # If there's a file upload, mark as in progress
+        step_timeline['status'] = 'In Progress'
+    else:
+        step_timeline['status'] = 'Completed'
+
+    # A step is completed at its newest "Status update to Completed" entry
+    if filename.startswith('Status update to Completed'):
+        if step_timeline['completed_time'] is None or entry_time >= step_timeline['completed_time']:
+            step_timeline['completed_at'] = timestamp
+            step_timeline['completed_time'] = entry_time
+
+    timeline['length'] += 1
+
+# Helper function to get the step timeline of a file
+def get_file_timeline(file_id):
+    """Get the step timeline of a file, rebuilding it if its history changed other than by appending"""
+    history = files_db[file_id].get('history', [])
+    timeline = file_timelines.get(file_id)
+    if timeline is None or timeline['length'] != len(history):
+        timeline = {'length': 0, 'first': None, 'steps': {}}
+        for entry in history:
+            apply_timeline_entry(timeline, entry)
+        file_timelines[file_id] = timeline
+    return timeline
+
+# Helper function to append a history entry
+def append_history_entry(file_id, history_entry):
+    """Append an entry to a file's history and its step timeline"""
+    history_entry.setdefault('epoch', data_manager.timestamp_to_epoch(history_entry.get('timestamp')))
+    history = files_db[file_id].setdefault('history', [])
+    history.append(history_entry)
+    timeline = file_timelines.get(file_id)
+    if timeline is not None and timeline['length'] == len(history) - 1:
+        apply_timeline_entry(timeline, history_entry)
+
+# Helper function to drop step timelines after history entries were changed in place
+def invalidate_file_timeline(file_id=None):
+    """Forget the step timeline of a file, or of all files"""
+    if file_id is None:
+        file_timelines.clear()
+    else:
+        file_timelines.pop(file_id, None)
 
 # Helper function to update the current step based on completed steps
 def update_current_step(file_id):
@@ -343,52 +1154,27 @@ def update_current_step(file_id):
         step_statuses[s] = 'Not Started'
     print(f"[STEP] Initialized step statuses: {step_statuses}")
 
-    # Create dictionaries to track the status, last update time, and user for each step
+    # Take the status, last update time, user and completion time of each step from the timeline
+    timeline = get_file_timeline(file_id)
     step_last_updates = {}
     step_users = {}
-    print(f"[STEP] Initialized tracking dictionaries")
-
-    # Update statuses based on history
-    print(f"[STEP] Updating statuses based on history entries: {len(file['history'])}")
-    for entry in file['history']:
-        if entry['step'] in step_statuses:
-            print(f"[STEP] Processing history entry for step: {entry['step']}, timestamp: {entry['timestamp']}")
-            # Update timestamp and user if this is a newer entry
-            if entry['step'] not in step_last_updates or entry['timestamp'] > step_last_updates[entry['step']]:
-                step_last_updates[entry['step']] = entry['timestamp']
-                step_users[entry['step']] = entry['user']
-                print(f"[STEP] Updated last update time for step {entry['step']} to {entry['timestamp']} by {entry['user']}")
-
-            if entry.get('filename', '').startswith('Status update to '):
-                status = entry['filename'].replace('Status update to ', '')
-                step_statuses[entry['step']] = status
-                print(f"[STEP] Updated status for step {entry['step']} to '{status}' based on status update entry")
-            elif entry.get('path'):  # If there's a file upload, mark as in progress
-                step_statuses[entry['step']] = 'In Progress'
-                print(f"[STEP] Updated status for step {entry['step']} to 'In Progress' based on file upload")
-            else:
-                step_statuses[entry['step']] = 'Completed'
-                print(f"[STEP] Updated status for step {entry['step']} to 'Completed' based on other entry type")
+    step_completion_times = {}
+    for s in file_steps:
+        step_timeline = timeline['steps'].get(s)
+        if step_timeline is None:
+            continue
+        step_statuses[s] = step_timeline['status']
+        step_last_updates[s] = (step_timeline['last_update'], step_timeline['last_update_epoch'])
+        step_users[s] = step_timeline['updated_by']
+        if step_timeline['completed_time'] is not None:
+            step_completion_times[s] = step_timeline['completed_time']
+    print(f"[STEP] Step statuses from timeline: {step_statuses}")
 
     # Ensure file has step_statuses dictionary
     if 'step_statuses' not in file:
         file['step_statuses'] = {}
-
-    # Update the file's step_statuses with the calculated values
-    # First, find the completion time for each step
-    step_completion_times = {}
-
-    # Sort all history entries by timestamp
-    all_entries = file['history'].copy()
-    all_entries.sort(key=lambda x: datetime.fromisoformat(x['timestamp']))
-
-    # Find the completion time for each step
-    for entry in all_entries:
-        step = entry.get('step')
-        if step in file_steps:
-            # Check if this entry marks the step as completed
-            if entry.get('filename', '').startswith('Status update to Completed'):
-                step_completion_times[step] = entry['timestamp']
+    first_entry = timeline['first']
+    now = time.time()
 
     # Calculate total time worked for each step based on previous step completion
     for i, s in enumerate(file_steps):
@@ -403,22 +1189,22 @@ def update_current_step(file_id):
             prev_step = file_steps[i-1]
             prev_status = step_statuses.get(prev_step, 'Not Started')
             if prev_status == 'Completed' and prev_step in step_completion_times:
-                start_time = datetime.fromisoformat(step_completion_times[prev_step])
+                start_time = step_completion_times[prev_step]
             else:
-                start_time = datetime.now()
+                start_time = now
             """if prev_step in step_completion_times:
                 start_time = datetime.fromisoformat(step_completion_times[prev_step])"""
         else:  # For the first step, use the first history entry time
-            if all_entries and all_entries[0]['step'] == s:
-                start_time = datetime.fromisoformat(all_entries[0]['timestamp'])
+            if first_entry and first_entry['step'] == s:
+                start_time = first_entry['time']
         # If we have a start time, calculate the total time worked
-        if start_time:
+        if start_time is not None:
             if step_statuses[s] == 'Completed':
-                end_time = datetime.fromisoformat(step_completion_times[s])
-                total_time_minutes = (end_time - start_time).total_seconds() / 60
+                end_time = step_completion_times[s]
+                total_time_minutes = (end_time - start_time) / 60
             elif current_status == 'In Progress':
-                end_time = datetime.now()
-                total_time_minutes = (end_time - start_time).total_seconds() / 60
+                end_time = now
+                total_time_minutes = (end_time - start_time) / 60
 
             """if s in step_completion_times:  # If step is completed
                 end_time = datetime.fromisoformat(step_completion_times[s])
@@ -430,9 +1216,11 @@ def update_current_step(file_id):
 
         # If we don't have an existing entry, create a new one with default values
         if s not in file['step_statuses'] or not isinstance(file['step_statuses'][s], dict):
+            last_update, last_update_epoch = step_last_updates.get(s, (None, None))
             file['step_statuses'][s] = {
                 'status': step_statuses[s],
-                'last_update': step_last_updates.get(s, None),
+                'last_update': last_update,
+                'last_update_epoch': last_update_epoch,
                 'updated_by': step_users.get(s, None),
                 'assigned_time': 0,  # Default assigned time
                 'total_time_worked': int(total_time_minutes)
@@ -452,7 +1240,7 @@ def update_current_step(file_id):
 
             # Update last_update and updated_by if we have newer information
             if s in step_last_updates:
-                file['step_statuses'][s]['last_update'] = step_last_updates[s]
+                file['step_statuses'][s]['last_update'], file['step_statuses'][s]['last_update_epoch'] = step_last_updates[s]
                 file['step_statuses'][s]['updated_by'] = step_users[s]
 
     # Find the first non-completed step
@@ -469,14 +1257,16 @@ def update_current_step(file_id):
         next_step = file_steps[-1]
         print(f"[STEP] All steps completed, setting to last step: {next_step}")
 
+    data_manager.record_change('files_db', 'set', [file_id, 'step_statuses'], file['step_statuses'])
+
     # Update the current step
     if next_step is not None and file['current_step'] != next_step:
         print(f"[STEP] Updating current step from {file['current_step']} to {next_step}")
         file['current_step'] = next_step
-        # Mark data as changed
-        data_manager.mark_data_changed()
-        # Trigger notification scan since file changed steps
-        trigger_notification_scan()
+        # Record the step change
+        data_manager.record_change('files_db', 'set', [file_id, 'current_step'], next_step)
+        # Update notifications since file changed steps
+        trigger_notification_update(file_id=file_id)
     else:
         print(f"[STEP] Current step remains unchanged: {file.get('current_step')}")
 
@@ -505,15 +1295,45 @@ def get_notifications():
     username = session['username']
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
 
-    # Notifications are now managed by the background scanner
-    # No need to regenerate them on every API call
+    # Read the cursor first, so changes made while building the response are sent again next time
+    with notification_lock:
+        cursor = get_notification_cursor()
+        unread_count = count_unread_notifications(username)
+
+    # Delta: only what changed after the client's cursor
+    since = request.args.get('since')
+    if since is not None:
+        since_seq = parse_notification_cursor(since)
+        changes = get_notification_changes(username, since_seq) if since_seq is not None else None
+        if changes is not None:
+            changes.update(cursor=cursor, unread_count=unread_count, reset=False)
+            return jsonify(changes)
+        # The cursor is too old or unknown, the client has to start over from the full list
+        return jsonify({
+            "notifications": get_user_notifications(username),
+            "unread_count": unread_count,
+            "cursor": cursor,
+            "reset": True
+        })
+
+    # History page
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, NOTIFICATION_PAGE_SIZE_MAX))
+        notifications, next_before = get_user_notifications_page(username, limit, request.args.get('before'), unread_only)
+        return jsonify({
+            "notifications": notifications,
+            "unread_count": unread_count,
+            "cursor": cursor,
+            "next_before": next_before
+        })
 
     notifications = get_user_notifications(username, unread_only)
-    unread_count = len([n for n in get_user_notifications(username) if not n.get('read', False)])
 
     return jsonify({
         "notifications": notifications,
-        "unread_count": unread_count
+        "unread_count": unread_count,
+        "cursor": cursor
     })
 
 @app.route('/api/notifications/mark_read', methods=['POST'])
@@ -544,13 +1364,59 @@ def mark_all_notifications_read():
 
     username = session['username']
 
-    if username in notifications_db:
-        for notification in notifications_db[username]:
-            notification['read'] = True
-        data_manager.mark_data_changed()
+    read_ids = []
+    with notification_lock:
+        for notification in notifications_db.get(username, {}).values():
+            if not notification.get('read', False):
+                notification['read'] = True
+                read_ids.append(notification['id'])
+        if read_ids:
+            data_manager.record_changes('notifications_db', [('update', [username, notification_id], {'read': True}) for notification_id in read_ids])
+            publish_notification_event(username, 'read', read_ids, unread_delta=-len(read_ids))
 
     return jsonify({"success": True})
 
+@app.route('/api/notifications/worker_stats')
+def notification_worker_stats_route():
+    """Get the notification worker metrics"""
+    if 'username' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    # Check if user is admin
+    if not users_db.get(session['username'], {}).get('is_admin', False):
+        return jsonify({"error": "Only administrators can view notification worker metrics"}), 403
+
+    return jsonify(get_notification_worker_stats())
+
+@app.route('/api/notifications/stream')
+def notification_stream():
+    """Push notification changes of the current user as Server-Sent Events"""
+    if 'username' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    username = session['username']
+    stream_queue = subscribe_notification_stream(username)
+    if stream_queue is None:
+        return jsonify({"error": "Too many notification streams, poll /api/notifications instead"}), 503
+
+    def generate():
+        try:
+            # Ask the browser to wait 5 seconds before reconnecting
+            yield 'retry: 5000\n\n'
+            deadline = time.time() + NOTIFICATION_STREAM_MAX_AGE
+            while time.time() < deadline:
+                try:
+                    event, data = stream_queue.get(timeout=NOTIFICATION_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+        finally:
+            unsubscribe_notification_stream(username, stream_queue)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/')
 def index():
     print("\n[EXECUTING] index() - Main page route")
@@ -564,43 +1430,60 @@ def index():
     # Notifications are now managed by the background scanner
     # No need to regenerate them on every page load
 
+    # Filter, sort and page the files with the secondary indexes over the summaries
+    filters = {}
+    for field, arg in (('supplier', 'supplier'), ('process_type', 'process_type'), ('current_step', 'step'), ('status', 'status')):
+        if request.args.get(arg):
+            filters[field] = request.args[arg]
+    if request.args.get('overdue'):
+        filters['overdue'] = True
+    assigned_to = username if request.args.get('mine') else None
+    assigned_steps = ()
+    if assigned_to:
+        user_data = users_db.get(username, {})
+        assigned_steps = set(user_data.get('roles', [])) | set(user_data.get('custom_steps', []))
+    sort = request.args.get('sort') if request.args.get('sort') in file_index.SORT_KEYS else None
+    descending = request.args.get('order') == 'desc'
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', file_index.DEFAULT_PAGE_SIZE, type=int)
+    if per_page not in file_index.PAGE_SIZES:
+        per_page = file_index.DEFAULT_PAGE_SIZE
+
+    result = file_index.query_files(files_db, filters, assigned_to, assigned_steps, sort, descending, page, per_page)
+    facets = file_index.get_facets(files_db)
+    print(f"[STEP] Showing page {result['page']} of {result['pages']}, {result['total']} matching files")
+
     print("[STEP] Calculating current step time data for each file")
-    # Calculate current step time data for each file
+    # Calculate current step time data for each file on the page from the summary index,
+    # full records with their history are not loaded for the main page
+    file_summaries = result['summaries']
     current_step_times = {}
-    for file_id, file in files_db.items():
-        current_step = file.get('current_step')
-        print(f"[STEP] Processing file {file_id} - Current step: {current_step}")
-        if current_step and 'step_statuses' in file and current_step in file['step_statuses']:
-            step_status = file['step_statuses'][current_step]
-            if isinstance(step_status, dict):
-                total_time_worked = step_status.get('total_time_worked', 0)
-                assigned_time = step_status.get('assigned_time', 0)
-                is_overdue = assigned_time > 0 and total_time_worked > assigned_time
-                print(f"[STEP] File {file_id} - Step {current_step} - Time worked: {total_time_worked} min - Assigned time: {assigned_time} min - Overdue: {is_overdue}")
-
-                current_step_times[file_id] = {
-                    'total_time_worked': total_time_worked,
-                    'assigned_time': assigned_time,
-                    'is_overdue': is_overdue
-                }
-            else:
-                # Handle legacy format
-                print(f"[STEP] File {file_id} - Step {current_step} - Legacy format detected")
-                current_step_times[file_id] = {
-                    'total_time_worked': 0,
-                    'assigned_time': 0,
-                    'is_overdue': False
-                }
+    for file_id, summary in file_summaries.items():
+        current_step_time = summary.get('current_step_time')
+        if current_step_time is not None:
+            current_step_times[file_id] = current_step_time
         else:
-            print(f"[STEP] File {file_id} - No current step or step status information")
+            # No current step, no step status or legacy format
             current_step_times[file_id] = {
                 'total_time_worked': 0,
                 'assigned_time': 0,
                 'is_overdue': False
             }
 
+    # The query string of the page without its page number, for the pagination links
+    page_args = {arg: value for arg, value in request.args.items() if arg != 'page'}
+
     return render_template('index.html',
-                          files=files_db,
+                          files=file_summaries,
+                          facets=facets,
+                          total_files=result['total'],
+                          page=result['page'],
+                          pages=result['pages'],
+                          per_page=result['per_page'],
+                          page_sizes=file_index.PAGE_SIZES,
+                          page_args=page_args,
+                          sort=sort,
+                          descending=descending,
                           steps=steps,
                           process_types=process_types,
                           current_step_times=current_step_times,
@@ -656,7 +1539,7 @@ def update_default_assigned_time():
     default_assigned_times[step] = assigned_time
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('default_assigned_times')
 
     return jsonify({"success": True})
 
@@ -730,7 +1613,7 @@ def add_step():
     default_assigned_times[step_name] = assigned_time_minutes
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('steps', 'step_assignments', 'users_db', 'custom_steps', 'default_assigned_times')
 
     flash(f'Step "{step_name}" added successfully')
     return redirect(url_for('manage_steps'))
@@ -770,8 +1653,11 @@ def rename_step():
             user_data['assigned_steps'].remove(old_step)
             user_data['assigned_steps'].append(new_step)
 
-    # Update files
-    for _, file in files_db.items():
+    # Update files, loading only those in the step or with it in their history
+    for file_id, summary in data_manager.get_file_summaries(files_db).items():
+        if summary.get('current_step') != old_step and old_step not in summary.get('history_steps', ()):
+            continue
+        file = files_db[file_id]
         if file.get('current_step') == old_step:
             file['current_step'] = new_step
 
@@ -779,6 +1665,8 @@ def rename_step():
         for entry in file.get('history', []):
             if entry.get('step') == old_step:
                 entry['step'] = new_step
+        data_manager.mark_data_changed('files_db', file_id=file_id)
+    invalidate_file_timeline()
 
     # Update custom steps list if needed
     if old_step in custom_steps_list:
@@ -790,7 +1678,7 @@ def rename_step():
         default_assigned_times[new_step] = default_assigned_times.pop(old_step)
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('steps', 'step_assignments', 'users_db', 'custom_steps', 'default_assigned_times')
 
     return jsonify({"success": True})
 
@@ -813,8 +1701,8 @@ def remove_step():
         return jsonify({"success": False, "message": f"Step '{step}' not found"}), 404
 
     # Check if any files are in this step
-    for _, file in files_db.items():
-        if file.get('current_step') == step:
+    for _, summary in data_manager.get_file_summaries(files_db).items():
+        if summary.get('current_step') == step:
             return jsonify({"success": False, "message": f"Cannot remove step '{step}' because it has files. Move files to another step first."}), 400
 
     # Remove step from steps list
@@ -840,7 +1728,7 @@ def remove_step():
     # Remove step from file history (but keep the entries for record)
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('steps', 'step_assignments', 'users_db', 'custom_steps', 'default_assigned_times')
 
     return jsonify({"success": True})
 
@@ -877,7 +1765,7 @@ def move_step():
         return jsonify({"success": False, "message": "Invalid direction"}), 400
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('steps')
 
     return jsonify({"success": True})
 
@@ -920,6 +1808,7 @@ def file_pipeline(file_id):
         step_data = {
             'status': 'Not Started',
             'last_update': None,
+            'last_update_epoch': None,
             'user': None,
             'can_edit': is_authorized_for_step(session['username'], step, file_id)
         }
@@ -931,6 +1820,7 @@ def file_pipeline(file_id):
                 # Use the stored dictionary values
                 step_data['status'] = file['step_statuses'][step].get('status', 'Not Started')
                 step_data['last_update'] = file['step_statuses'][step].get('last_update')
+                step_data['last_update_epoch'] = file['step_statuses'][step].get('last_update_epoch')
                 step_data['user'] = file['step_statuses'][step].get('updated_by')
                 step_data['assigned_time'] = file['step_statuses'][step].get('assigned_time', 0)
                 step_data['total_time_worked'] = file['step_statuses'][step].get('total_time_worked', 0)
@@ -942,16 +1832,20 @@ def file_pipeline(file_id):
                 # Still need to get last_update and user from history
                 for entry in file['history']:
                     if entry['step'] == step:
-                        if step_data['last_update'] is None or entry['timestamp'] > step_data['last_update']:
+                        entry_epoch = get_entry_epoch(entry)
+                        if entry_epoch is not None and (step_data['last_update_epoch'] is None or entry_epoch > step_data['last_update_epoch']):
                             step_data['last_update'] = entry['timestamp']
+                            step_data['last_update_epoch'] = entry_epoch
                             step_data['user'] = entry['user']
         else:
             # Fall back to calculating from history for backward compatibility
             # Check file history for this step
             for entry in file['history']:
                 if entry['step'] == step:
-                    if step_data['last_update'] is None or entry['timestamp'] > step_data['last_update']:
+                    entry_epoch = get_entry_epoch(entry)
+                    if entry_epoch is not None and (step_data['last_update_epoch'] is None or entry_epoch > step_data['last_update_epoch']):
                         step_data['last_update'] = entry['timestamp']
+                        step_data['last_update_epoch'] = entry_epoch
                         step_data['user'] = entry['user']
 
                         # Check for explicit status updates
@@ -976,6 +1870,34 @@ def file_pipeline(file_id):
                           username=session['username'],
                           is_admin=users_db.get(session['username'], {}).get('is_admin', False))
 
+# Helper function to serve a JSON response from the response cache
+def cached_json_response(key, compute):
+    """Compute (data, status) once per data generation and serve its JSON body from the cache"""
+    def render():
+        data, status = compute()
+        return jsonify(data).get_data(), status
+
+    body, status = response_cache.get_or_compute(key, render)
+    return Response(body, status=status, mimetype='application/json')
+
+# Helper function to parse the from/to dates (YYYY-MM-DD) of a statistics range
+def parse_statistics_range(args):
+    """Return (start epoch, end epoch, error), to is inclusive; (None, None, None) without dates"""
+    date_from = args.get('from', '').strip()
+    date_to = args.get('to', '').strip()
+    if not date_from and not date_to:
+        return None, None, None
+    try:
+        start = datetime.strptime(date_from, '%Y-%m-%d') if date_from else datetime(1970, 1, 2)
+        # An open end is the start of tomorrow, so the range (and its cache key) only changes daily
+        end = datetime.strptime(date_to, '%Y-%m-%d') if date_to else datetime.combine(datetime.now().date(), datetime.min.time())
+        end += timedelta(days=1)
+    except ValueError:
+        return None, None, 'Dates must be given as YYYY-MM-DD'
+    if end <= start:
+        return None, None, 'The from date must not be after the to date'
+    return int(start.timestamp()), int(end.timestamp()), None
+
 @app.route('/statistics')
 def statistics():
     print("\n[EXECUTING] statistics() - Statistics page route")
@@ -983,183 +1905,92 @@ def statistics():
         print("[STEP] User not in session, redirecting to login")
         return redirect(url_for('login'))
 
-    print("[STEP] Calculating comprehensive statistics")
-
-    # Initialize statistics data
-    stats = {
-        'total_files': len(files_db),
-        'total_users': len(users_db),
-        'total_steps': len(steps),
-        'user_stats': {},
-        'step_stats': {},
-        'supplier_stats': {},
-        'process_type_stats': {},
-        'overdue_stats': {
-            'total_overdue_files': 0,
-            'total_overdue_steps': 0,
-            'overdue_by_step': {},
-            'overdue_by_user': {}
-        },
-        'time_stats': {
-            'total_time_worked': 0,
-            'average_time_per_file': 0,
-            'average_time_per_step': 0
-        },
-        'file_distribution': {
-            'by_step': {},
-            'by_status': {'Not Started': 0, 'In Progress': 0, 'Completed': 0}
-        }
-    }
+    # Statistics come from totals kept up to date as files change. Administrators can add
+    # ?verify=1 to recompute them from every file and check the totals against them
+    is_admin = users_db.get(session['username'], {}).get('is_admin', False)
+    if request.args.get('verify') and is_admin:
+        print("[STEP] Recomputing statistics to verify the maintained totals")
+        stats, differences = file_statistics.verify_statistics(files_db, users_db, steps, step_assignments)
+        if differences:
+            flash(f'Maintained statistics differed in {len(differences)} places and were rebuilt')
+        else:
+            flash('Maintained statistics match the recomputed ones')
+    else:
+        print("[STEP] Reading maintained statistics")
+        stats = response_cache.get_or_compute(('statistics',), lambda: file_statistics.get_statistics(files_db, users_db, steps, step_assignments))
 
-    # Initialize step statistics
-    for step in steps:
-        stats['step_stats'][step] = {
-            'total_files': 0,
-            'completed_files': 0,
-            'in_progress_files': 0,
-            'not_started_files': 0,
-            'total_time_worked': 0,
-            'average_time': 0,
-            'overdue_files': 0,
-            'assigned_users': len(step_assignments.get(step, []))
-        }
-        stats['file_distribution']['by_step'][step] = 0
-        stats['overdue_stats']['overdue_by_step'][step] = 0
-
-    # Initialize user statistics
-    for username in users_db:
-        stats['user_stats'][username] = {
-            'total_files_worked': 0,
-            'total_time_worked': 0,
-            'average_time_per_file': 0,
-            'completed_steps': 0,
-            'in_progress_steps': 0,
-            'overdue_steps': 0,
-            'assigned_steps': users_db[username].get('roles', [])
-        }
-        stats['overdue_stats']['overdue_by_user'][username] = 0
-
-    # Process each file for statistics
-    for file_id, file in files_db.items():
-        current_step = file.get('current_step')
-        supplier = file.get('supplier', 'Unknown')
-        process_type = file.get('process_type', 'Unknown')
-
-        # Supplier statistics
-        if supplier not in stats['supplier_stats']:
-            stats['supplier_stats'][supplier] = {
-                'total_files': 0,
-                'total_time_worked': 0,
-                'average_time': 0,
-                'overdue_files': 0
-            }
-        stats['supplier_stats'][supplier]['total_files'] += 1
+    print(f"[STEP] Statistics calculated - Total files: {stats['total_files']}, Total overdue files: {stats['overdue_stats']['total_overdue_files']}")
 
-        # Process type statistics
-        if process_type not in stats['process_type_stats']:
-            stats['process_type_stats'][process_type] = {
-                'total_files': 0,
-                'total_time_worked': 0,
-                'average_time': 0
-            }
-        stats['process_type_stats'][process_type]['total_files'] += 1
-
-        # File distribution by current step
-        if current_step:
-            stats['file_distribution']['by_step'][current_step] = stats['file_distribution']['by_step'].get(current_step, 0) + 1
-
-        # Check if file has any overdue steps
-        file_has_overdue = False
-
-        # Process step statuses for this file
-        step_statuses = file.get('step_statuses', {})
-        for step, step_data in step_statuses.items():
-            if isinstance(step_data, dict):
-                status = step_data.get('status', 'Not Started')
-                total_time_worked = step_data.get('total_time_worked', 0)
-                is_overdue = step_data.get('is_overdue', False)
-                updated_by = step_data.get('updated_by')
-
-                # Update step statistics
-                if step in stats['step_stats']:
-                    stats['step_stats'][step]['total_files'] += 1
-                    stats['step_stats'][step]['total_time_worked'] += total_time_worked
-
-                    if status == 'Completed':
-                        stats['step_stats'][step]['completed_files'] += 1
-                        stats['file_distribution']['by_status']['Completed'] += 1
-                    elif status == 'In Progress':
-                        stats['step_stats'][step]['in_progress_files'] += 1
-                        stats['file_distribution']['by_status']['In Progress'] += 1
-                    else:
-                        stats['step_stats'][step]['not_started_files'] += 1
-                        stats['file_distribution']['by_status']['Not Started'] += 1
-
-                    if is_overdue:
-                        stats['step_stats'][step]['overdue_files'] += 1
-                        stats['overdue_stats']['overdue_by_step'][step] += 1
-                        stats['overdue_stats']['total_overdue_steps'] += 1
-                        file_has_overdue = True
-
-                # Update user statistics
-                if updated_by and updated_by in stats['user_stats']:
-                    stats['user_stats'][updated_by]['total_time_worked'] += total_time_worked
-
-                    if status == 'Completed':
-                        stats['user_stats'][updated_by]['completed_steps'] += 1
-                    elif status == 'In Progress':
-                        stats['user_stats'][updated_by]['in_progress_steps'] += 1
-
-                    if is_overdue:
-                        stats['user_stats'][updated_by]['overdue_steps'] += 1
-                        stats['overdue_stats']['overdue_by_user'][updated_by] += 1
-
-                # Update total time statistics
-                stats['time_stats']['total_time_worked'] += total_time_worked
-
-                # Update supplier time statistics
-                stats['supplier_stats'][supplier]['total_time_worked'] += total_time_worked
-
-                # Update process type time statistics
-                stats['process_type_stats'][process_type]['total_time_worked'] += total_time_worked
-
-        # Count files with overdue steps
-        if file_has_overdue:
-            stats['overdue_stats']['total_overdue_files'] += 1
-            stats['supplier_stats'][supplier]['overdue_files'] += 1
-
-    # Calculate averages
-    if stats['total_files'] > 0:
-        stats['time_stats']['average_time_per_file'] = stats['time_stats']['total_time_worked'] / stats['total_files']
-
-    # Calculate step averages
-    for step, step_data in stats['step_stats'].items():
-        if step_data['total_files'] > 0:
-            step_data['average_time'] = step_data['total_time_worked'] / step_data['total_files']
-
-    # Calculate user averages
-    for username, user_data in stats['user_stats'].items():
-        files_worked = user_data['completed_steps'] + user_data['in_progress_steps']
-        user_data['total_files_worked'] = files_worked
-        if files_worked > 0:
-            user_data['average_time_per_file'] = user_data['total_time_worked'] / files_worked
-
-    # Calculate supplier averages
-    for supplier, supplier_data in stats['supplier_stats'].items():
-        if supplier_data['total_files'] > 0:
-            supplier_data['average_time'] = supplier_data['total_time_worked'] / supplier_data['total_files']
-
-    # Calculate process type averages
-    for process_type, pt_data in stats['process_type_stats'].items():
-        if pt_data['total_files'] > 0:
-            pt_data['average_time'] = pt_data['total_time_worked'] / pt_data['total_files']
+    # Completions in a date range are summed from the hourly rollups
+    range_stats = None
+    start_epoch, end_epoch, range_error = parse_statistics_range(request.args)
+    if range_error:
+        flash(range_error)
+    elif start_epoch is not None:
+        range_stats = response_cache.get_or_compute(('statistics_range', start_epoch, end_epoch),
+                                                    lambda: file_statistics.get_range_statistics(files_db, steps, start_epoch, end_epoch))
+        print(f"[STEP] Range statistics calculated - Completions: {range_stats['total']['completions']}")
 
-    print(f"[STEP] Statistics calculated - Total files: {stats['total_files']}, Total overdue files: {stats['overdue_stats']['total_overdue_files']}")
+    # Percentiles of the completed step durations come from streaming sketches
+    durations = response_cache.get_or_compute(('statistics_durations',), lambda: file_statistics.get_duration_statistics(files_db, steps))
 
     return render_template('statistics.html',
                           stats=stats,
+                          range_stats=range_stats,
+                          durations=durations,
+                          date_from=request.args.get('from', ''),
+                          date_to=request.args.get('to', ''),
                           username=session['username'],
-                          is_admin=users_db.get(session['username'], {}).get('is_admin', False))
+                          is_admin=is_admin)
+
+@app.route('/api/statistics')
+def statistics_api():
+    """Get the statistics as JSON, with ?rows=&columns=&value= a crosstab of the step rows, or with ?from=&to= the completions in that range"""
+    if 'username' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    start_epoch, end_epoch, range_error = parse_statistics_range(request.args)
+    if range_error:
+        return jsonify({"error": range_error}), 400
+    if start_epoch is not None:
+        return cached_json_response(('api_statistics_range', start_epoch, end_epoch), lambda: (
+            {"from": start_epoch, "to": end_epoch, **file_statistics.get_range_statistics(files_db, steps, start_epoch, end_epoch)}, 200))
+
+    # Reporting queries run on the columnar analytics snapshot
+    rows = request.args.get('rows')
+    columns = request.args.get('columns')
+    value = request.args.get('value', 'count')
+    if rows or columns:
+        def compute_crosstab():
+            try:
+                table = analytics.crosstab(analytics.get_snapshot(files_db), rows, columns, value)
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            return {"rows": rows, "columns": columns, "table": table}, 200
+        return cached_json_response(('api_statistics_crosstab', rows, columns, value), compute_crosstab)
+
+    return cached_json_response(('api_statistics',), lambda: (
+        analytics.snapshot_statistics(analytics.get_snapshot(files_db), users_db, steps, step_assignments), 200))
+
+@app.route('/api/statistics/durations')
+def statistics_durations_api():
+    """Get the p50/p90/p99 and histogram of the completed step durations (minutes) per step and supplier"""
+    if 'username' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    return cached_json_response(('api_statistics_durations',), lambda: (file_statistics.get_duration_statistics(files_db, steps), 200))
+
+@app.route('/api/cache_stats')
+def cache_stats_route():
+    """Get the hit and miss counters of the response cache"""
+    if 'username' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    # Check if user is admin
+    if not users_db.get(session['username'], {}).get('is_admin', False):
+        return jsonify({"error": "Only administrators can view cache metrics"}), 403
+
+    return jsonify(response_cache.get_cache_stats())
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -1206,13 +2037,7 @@ def manage_suppliers():
         return redirect(url_for('index'))
 
     # Count files per supplier
-    suppliers = {}
-    for _, file in files_db.items():
-        supplier = file.get('supplier', 'unknown')
-        if supplier in suppliers:
-            suppliers[supplier] += 1
-        else:
-            suppliers[supplier] = 1
+    suppliers = data_manager.count_files_by_supplier(files_db)
 
     return render_template('manage_suppliers.html',
                           suppliers=suppliers,
@@ -1265,7 +2090,7 @@ def update_process_types():
     process_types.extend(new_process_types)
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('process_types')
 
     flash('Process types updated successfully')
     return redirect(url_for('manage_process_types'))
@@ -1286,10 +2111,7 @@ def delete_supplier():
         return jsonify({"success": False, "message": "Missing required fields"}), 400
 
     # Find all files for this supplier
-    files_to_delete = []
-    for file_id, file in files_db.items():
-        if file.get('supplier') == supplier:
-            files_to_delete.append(file_id)
+    files_to_delete = data_manager.get_file_ids_by_supplier(files_db, supplier)
 
     if not files_to_delete:
         return jsonify({"success": False, "message": "No files found for this supplier"}), 404
@@ -1308,9 +2130,9 @@ def delete_supplier():
 
         # Remove file from database
         del files_db[file_id]
-
-    # Mark data as changed
-    data_manager.mark_data_changed()
+        invalidate_file_timeline(file_id)
+        data_manager.record_change('files_db', 'delete', [file_id])
+        trigger_notification_update(file_id=file_id)
 
     return jsonify({"success": True})
 
@@ -1345,18 +2167,21 @@ def delete_user():
         if username_to_delete in users:
             users.remove(username_to_delete)
 
-    # Remove user from file-specific step assignments
-    for _, file in files_db.items():
-        if 'step_assignments' in file:
-            for _, users in file['step_assignments'].items():
-                if username_to_delete in users:
-                    users.remove(username_to_delete)
+    # Remove user from file-specific step assignments, loading only the files assigned to them
+    for file_id, summary in data_manager.get_file_summaries(files_db).items():
+        if username_to_delete not in (summary.get('assigned_users') or ()):
+            continue
+        file = files_db[file_id]
+        for _, users in file['step_assignments'].items():
+            if username_to_delete in users:
+                users.remove(username_to_delete)
+        data_manager.mark_data_changed('files_db', file_id=file_id)
 
     # Delete the user
     del users_db[username_to_delete]
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('users_db', 'step_assignments')
 
     return jsonify({"success": True})
 
@@ -1396,8 +2221,13 @@ def register():
                 elif username in step_assignments[step]:
                     step_assignments[step].remove(username)
 
-            # Update file-specific step assignments for all existing files
-            for _, file in files_db.items():
+            # Update file-specific step assignments of the existing files, loading only those
+            # without step assignments or with one of the user's roles among their steps
+            for file_id, summary in data_manager.get_file_summaries(files_db).items():
+                file_steps = summary.get('custom_steps')
+                if summary.get('assigned_users') is not None and not set(assigned_roles) & set(file_steps if file_steps is not None else steps):
+                    continue
+                file = files_db[file_id]
                 if 'step_assignments' not in file:
                     # Create step assignments if they don't exist
                     file['step_assignments'] = {}
@@ -1411,9 +2241,13 @@ def register():
                             file['step_assignments'][s] = []
                         if username not in file['step_assignments'][s]:
                             file['step_assignments'][s].append(username)
+                data_manager.mark_data_changed('files_db', file_id=file_id)
 
             # Mark data as changed
-            data_manager.mark_data_changed()
+            data_manager.mark_data_changed('users_db', 'step_assignments')
+
+            # Notify the new user of files already in their steps
+            trigger_notification_update(username=username)
 
             flash('User registered successfully')
             return redirect(url_for('manage_users'))
@@ -1452,6 +2286,7 @@ def upload_file():
     file_id = request.form.get('file_id', str(uuid.uuid4()))
     filename = secure_filename(file.filename)
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+    epoch = data_manager.timestamp_to_epoch(timestamp)
     print(f"[STEP] Generated file_id: {file_id}, Secured filename: {filename}, Timestamp: {timestamp}")
 
     # Save file with unique name
@@ -1462,7 +2297,8 @@ def upload_file():
     # Update database
     print(f"[STEP] Updating database for file_id: {file_id}")
 
-    if file_id not in files_db:
+    is_new_file = file_id not in files_db
+    if is_new_file:
         print(f"[STEP] Creating new file entry in database")
         if file_id == '':
             file_id = str(uuid.uuid4())
@@ -1493,6 +2329,7 @@ def upload_file():
             file_step_statuses[s] = {
                 'status': 'Not Started',
                 'last_update': None,
+                'last_update_epoch': None,
                 'updated_by': None,
                 'assigned_time': default_time,  # Use the default assigned time from global settings
                 'total_time_worked': 0,  # Initialize total time worked to 0
@@ -1508,6 +2345,7 @@ def upload_file():
             file_step_statuses[file_steps[0]] = {
                 'status': 'In Progress',
                 'last_update': timestamp,
+                'last_update_epoch': epoch,
                 'updated_by': session['username'],
                 'assigned_time': default_time,  # Use the default assigned time from global settings
                 'total_time_worked': 0,  # Initialize total time worked to 0
@@ -1524,28 +2362,35 @@ def upload_file():
             'custom_steps': file_steps,  # Add custom steps for this file
             'step_assignments': file_step_assignments,  # Add file-specific step assignments
             'step_statuses': file_step_statuses,  # Add step statuses
-            'creation_time': timestamp  # Store creation time
+            'creation_time': timestamp,  # Store creation time
+            'creation_epoch': epoch
         }
         print(f"[STEP] File entry created with current_step: {files_db[file_id]['current_step']}")
 
     print(f"[STEP] Adding history entry for step: {step}")
-    files_db[file_id]['history'].append({
+    history_entry = {
         'step': step,
         'timestamp': timestamp,
+        'epoch': epoch,
         'filename': filename,
         'path': file_path,
         'user': session['username']
-    })
+    }
+    append_history_entry(file_id, history_entry)
 
     print(f"[STEP] Setting current step to: {step}")
     files_db[file_id]['current_step'] = step
 
-    # Mark data as changed
-    print(f"[STEP] Marking data as changed")
-    data_manager.mark_data_changed()
+    # Record the changes
+    print(f"[STEP] Recording data changes")
+    if is_new_file:
+        data_manager.record_change('files_db', 'set', [file_id], files_db[file_id])
+    else:
+        data_manager.record_change('files_db', 'append', [file_id, 'history'], history_entry)
+        data_manager.record_change('files_db', 'set', [file_id, 'current_step'], step)
 
-    # Trigger notification scan since new file was uploaded
-    trigger_notification_scan()
+    # Update notifications since new file was uploaded
+    trigger_notification_update(file_id=file_id)
 
     print(f"[STEP] Upload complete, redirecting to index")
     flash('File uploaded successfully')
@@ -1610,6 +2455,8 @@ def upload_to_step():
 
         # Update file database
         file_data = files_db[file_id]
+        timestamp = datetime.now().isoformat()
+        epoch = data_manager.timestamp_to_epoch(timestamp)
 
         # Update step status
         if 'step_statuses' not in file_data:
@@ -1617,7 +2464,8 @@ def upload_to_step():
 
         file_data['step_statuses'][step] = {
             'status': status,
-            'last_update': datetime.now().isoformat(),
+            'last_update': timestamp,
+            'last_update_epoch': epoch,
             'updated_by': username,
             'assigned_time': file_data.get('step_statuses', {}).get(step, {}).get('assigned_time', 0)
         }
@@ -1631,7 +2479,8 @@ def upload_to_step():
             history_entry = {
                 'step': step,
                 'status': status,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': timestamp,
+                'epoch': epoch,
                 'user': username,
                 'filename': unique_filename,
                 'path': file_path,
@@ -1642,14 +2491,15 @@ def upload_to_step():
             history_entry = {
                 'step': step,
                 'status': status,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': timestamp,
+                'epoch': epoch,
                 'user': username,
                 'filename': f"Status update to {status}",
                 'path': None,  # No file for status-only updates
                 'comment': comment
             }
 
-        file_data['history'].append(history_entry)
+        append_history_entry(file_id, history_entry)
 
         # If status is completed, move to next step
         if status == 'Completed':
@@ -1664,7 +2514,8 @@ def upload_to_step():
                 if next_step not in file_data['step_statuses']:
                     file_data['step_statuses'][next_step] = {
                         'status': 'In Progress',
-                        'last_update': datetime.now().isoformat(),
+                        'last_update': timestamp,
+                        'last_update_epoch': epoch,
                         'assigned_time': default_assigned_times.get(next_step, 0)
                     }
 
@@ -1672,11 +2523,13 @@ def upload_to_step():
             else:
                 print(f"[STEP] File completed all steps")
 
-        # Mark data as changed for auto-save
-        data_manager.mark_data_changed()
+        # Record the changes for auto-save
+        data_manager.record_change('files_db', 'append', [file_id, 'history'], history_entry)
+        data_manager.record_change('files_db', 'set', [file_id, 'step_statuses'], file_data['step_statuses'])
+        data_manager.record_change('files_db', 'set', [file_id, 'current_step'], file_data['current_step'])
 
-        # Trigger notification scan since file step was updated
-        trigger_notification_scan()
+        # Update notifications since file step was updated
+        trigger_notification_update(file_id=file_id)
 
         success_message = f"Step '{step}' updated to '{status}'"
         if file_uploaded:
@@ -1743,19 +2596,19 @@ def download_previous_step_files():
 
     # Find all files that are currently in user's assigned steps
     files_in_user_steps = []
-    for file_id, file in files_db.items():
-        current_step = file.get('current_step')
+    for file_id, summary in data_manager.get_file_summaries(files_db).items():
+        current_step = summary.get('current_step')
         if current_step in user_assigned_steps:
             # Check file-specific assignments if they exist
-            file_assignments = file.get('step_assignments', {})
-            if current_step in file_assignments:
+            current_step_users = summary.get('current_step_users')
+            if current_step_users is not None:
                 # Check if user is specifically assigned to this file's current step
-                if username in file_assignments[current_step]:
-                    files_in_user_steps.append((file_id, file, current_step))
+                if username in current_step_users:
+                    files_in_user_steps.append((file_id, files_db[file_id], current_step))
                     print(f"[STEP] File {file_id} is in user's assigned step '{current_step}' (file-specific assignment)")
             else:
                 # Fall back to global role assignment
-                files_in_user_steps.append((file_id, file, current_step))
+                files_in_user_steps.append((file_id, files_db[file_id], current_step))
                 print(f"[STEP] File {file_id} is in user's assigned step '{current_step}' (global assignment)")
 
     print(f"[STEP] Found {len(files_in_user_steps)} files in user's assigned steps")
@@ -1950,7 +2803,8 @@ def download_single_previous_step_file():
 def get_files():
     if 'username' not in session:
         return jsonify({"error": "Not authenticated"}), 401
-    return jsonify(files_db)
+    # Served from the file summaries, so the records do not have to be loaded
+    return cached_json_response(('api_files',), lambda: (data_manager.get_file_summaries(files_db), 200))
 
 @app.route('/delete_file', methods=['POST'])
 def delete_file():
@@ -1983,9 +2837,13 @@ def delete_file():
 
     # Remove file from database
     del files_db[file_id]
+    invalidate_file_timeline(file_id)
 
-    # Mark data as changed
-    data_manager.mark_data_changed()
+    # Record the deletion
+    data_manager.record_change('files_db', 'delete', [file_id])
+
+    # Remove the file's notifications
+    trigger_notification_update(file_id=file_id)
 
     return jsonify({"success": True})
 
@@ -2033,13 +2891,12 @@ def delete_step_file():
 
     # Remove entry from history
     file['history'].pop(entry_index)
+    invalidate_file_timeline(file_id)
+    data_manager.record_change('files_db', 'set', [file_id, 'history'], file['history'])
 
     # Update current step if needed
     update_current_step(file_id)
 
-    # Mark data as changed
-    data_manager.mark_data_changed()
-
     return jsonify({"success": True})
 
 @app.route('/api/file_versions/<file_id>/<step>')
@@ -2069,103 +2926,274 @@ def get_file_versions(file_id, step):
 
     return jsonify({"versions": versions})
 
-@app.route('/api/step_times/<file_id>')
-def get_step_times(file_id):
+# Helper function to calculate the time worked on the steps of a file
+def calculate_step_times(file_id, now=None, only_step=None):
     """
-    API endpoint to get the current total time worked for all steps of a file.
-    This is used for real-time updates of the time worked display.
+    Calculate the total time worked and overdue state of each step of a file (or only of
+    only_step) from its step timeline. now (epoch seconds) is passed by callers handling many
+    files at once. Each step also gets the epoch seconds the time is counted from (start_time)
+    and, if the count stopped, when (completed_at), so pages can keep the time running themselves.
     """
-    print(f"\n[EXECUTING] get_step_times({file_id}) - Getting step times for file")
-    if 'username' not in session:
-        print("[STEP] User not in session, returning authentication error")
-        return jsonify({"error": "Not authenticated"}), 401
-
-    if file_id not in files_db:
-        print(f"[STEP] File {file_id} not found in database")
-        return jsonify({"error": "File not found"}), 404
-
+    now = now or time.time()
     file = files_db[file_id]
     file_steps = file.get('custom_steps', steps)
-    print(f"[STEP] File steps: {file_steps}")
-
-    # Calculate step times
-    print(f"[STEP] Calculating step times for file {file_id}")
-    step_times = {}
-
-    # Sort all history entries by timestamp
-    all_entries = file['history'].copy()
-    all_entries.sort(key=lambda x: datetime.fromisoformat(x['timestamp']))
+    file_step_statuses = file.get('step_statuses')
 
     # Find the completion time for each step
+    timeline = get_file_timeline(file_id)
+    first_entry = timeline['first']
     step_completion_times = {}
-    for entry in all_entries:
-        step = entry.get('step')
-        if step in file_steps:
-            # Check if this entry marks the step as completed
-            if entry.get('filename', '').startswith('Status update to Completed'):
-                step_completion_times[step] = entry['timestamp']
-
-    # Get current step statuses
-    step_statuses = {}
-    if 'step_statuses' in file:
-        for step in file_steps:
-            if step in file['step_statuses']:
-                if isinstance(file['step_statuses'][step], dict):
-                    step_statuses[step] = file['step_statuses'][step].get('status', 'Not Started')
-                else:
-                    step_statuses[step] = file['step_statuses'][step]
-            else:
-                step_statuses[step] = 'Not Started'
+    for step in file_steps:
+        step_timeline = timeline['steps'].get(step)
+        if step_timeline and step_timeline['completed_time'] is not None:
+            step_completion_times[step] = step_timeline['completed_time']
 
-    # Calculate total time worked for each step
+    step_times = {}
     for i, step in enumerate(file_steps):
-        print(f"[STEP] Calculating time for step: {step} (index {i})")
-        total_time_minutes = 0
-        is_overdue = False
-        assigned_time = 0
+        if only_step is not None and step != only_step:
+            continue
 
-        # Get assigned time if available
-        if 'step_statuses' in file and step in file['step_statuses'] and isinstance(file['step_statuses'][step], dict):
-            assigned_time = file['step_statuses'][step].get('assigned_time', 0)
-            print(f"[STEP] Step '{step}' assigned time: {assigned_time} minutes")
+        # Get current status and assigned time if available
+        step_status = file_step_statuses.get(step, 'Not Started') if file_step_statuses is not None else None
+        assigned_time = 0
+        if isinstance(step_status, dict):
+            assigned_time = step_status.get('assigned_time', 0)
+            step_status = step_status.get('status', 'Not Started')
 
         # Find when this step started (when previous step was completed)
         start_time = None
         if i > 0:  # If not the first step
-            prev_step = file_steps[i-1]
-            if prev_step in step_completion_times:
-                start_time = datetime.fromisoformat(step_completion_times[prev_step])
-                print(f"[STEP] Step '{step}' start time based on previous step completion: {start_time}")
-        else:  # For the first step, use the first history entry time
-            if all_entries and all_entries[0]['step'] == step:
-                start_time = datetime.fromisoformat(all_entries[0]['timestamp'])
-                print(f"[STEP] First step '{step}' start time based on first history entry: {start_time}")
+            start_time = step_completion_times.get(file_steps[i-1])
+        elif first_entry and first_entry['step'] == step:  # For the first step, use the first history entry time
+            start_time = first_entry['time']
 
         # If we have a start time, calculate the total time worked
-        if start_time:
-            if step_statuses.get(step) == 'Completed' and step in step_completion_times:
-                end_time = datetime.fromisoformat(step_completion_times[step])
-                total_time_minutes = (end_time - start_time).total_seconds() / 60
-                print(f"[STEP] Step '{step}' is completed - End time: {end_time}, Total time: {int(total_time_minutes)} minutes")
-            elif step_statuses.get(step) == 'In Progress' or step_statuses.get(step) == 'Not Started':
-                end_time = datetime.now()
-                total_time_minutes = (end_time - start_time).total_seconds() / 60
-                print(f"[STEP] Step '{step}' is in progress - Current time: {end_time}, Total time so far: {int(total_time_minutes)} minutes")
-        else:
-            print(f"[STEP] No start time found for step '{step}', cannot calculate time worked")
-
-        # Check if overdue
-        is_overdue = assigned_time > 0 and total_time_minutes > assigned_time
-        if is_overdue:
-            print(f"[STEP] Step '{step}' is OVERDUE - Worked: {int(total_time_minutes)} min, Assigned: {assigned_time} min")
+        total_time_minutes = 0
+        counted_from = None
+        completed_at = None
+        if start_time is not None:
+            if step_status == 'Completed' and step in step_completion_times:
+                total_time_minutes = (step_completion_times[step] - start_time) / 60
+                counted_from = start_time
+                completed_at = step_completion_times[step]
+            elif step_status == 'In Progress' or step_status == 'Not Started':
+                total_time_minutes = (now - start_time) / 60
+                counted_from = start_time
 
-        # Add to result
         step_times[step] = {
             'total_time_worked': int(total_time_minutes),
-            'is_overdue': is_overdue
+            'assigned_time': assigned_time,
+            'is_overdue': assigned_time > 0 and total_time_minutes > assigned_time,
+            'start_time': counted_from,
+            'completed_at': completed_at
         }
-        print(f"[STEP] Added time data for step '{step}': {step_times[step]}")
-    return jsonify({"step_times": step_times})
+    return step_times
+
+# Overdue deadlines of the current steps of files, so a step is flagged overdue and its users
+# notified when its assigned time runs out instead of whenever its times are next calculated.
+# A heap of (deadline, file_id, step) entries is ordered by deadline (epoch seconds). step_deadlines
+# holds the valid deadline of each file, heap entries that no longer match it are skipped
+step_deadlines = {}  # {file_id: (deadline, step)}
+step_deadline_heap = []
+step_deadline_condition = threading.Condition()
+step_deadline_thread = None
+stop_step_deadline_scheduler = False
+
+# Helper function to get the overdue deadline of a file's current step
+def get_step_deadline(file_id):
+    """Get (deadline, step) for the current step of a file, or None if it cannot become overdue"""
+    if file_id not in files_db:
+        return None
+    file = files_db[file_id]
+    step = file.get('current_step')
+    step_status = file.get('step_statuses', {}).get(step)
+    if not step or not isinstance(step_status, dict) or step_status.get('status') == 'Completed':
+        return None
+    assigned_time = step_status.get('assigned_time', 0)
+    if assigned_time <= 0:
+        return None
+
+    step_time = calculate_step_times(file_id, only_step=step).get(step)
+    if not step_time or step_time['start_time'] is None or step_time['completed_at'] is not None:
+        return None
+    deadline = step_time['start_time'] + assigned_time * 60
+
+    # overdue_at is set when the deadline fired, so it fires once even across restarts
+    if step_status.get('overdue_at') == deadline:
+        return None
+    return deadline, step
+
+# Helper function to (re)schedule the overdue deadline of a file
+def schedule_step_deadline(file_id):
+    """Schedule the overdue deadline of a file's current step, replacing or dropping its previous one"""
+    deadline = get_step_deadline(file_id)
+    with step_deadline_condition:
+        if deadline is None:
+            step_deadlines.pop(file_id, None)
+            return
+        if step_deadlines.get(file_id) == deadline:
+            return
+        step_deadlines[file_id] = deadline
+        heapq.heappush(step_deadline_heap, (deadline[0], file_id, deadline[1]))
+
+        # Drop stale entries once they outnumber the valid ones
+        if len(step_deadline_heap) > 2 * len(step_deadlines) + 64:
+            step_deadline_heap[:] = [(d, f, s) for f, (d, s) in step_deadlines.items()]
+            heapq.heapify(step_deadline_heap)
+        step_deadline_condition.notify_all()
+
+# Helper function to rebuild the overdue deadlines
+def rebuild_step_deadlines():
+    """Schedule the deadlines of all files whose current step has an assigned time"""
+    with step_deadline_condition:
+        step_deadlines.clear()
+        step_deadline_heap.clear()
+
+    # The summaries tell which files can have a deadline without loading every record
+    for file_id, summary in data_manager.get_file_summaries(files_db).items():
+        current_step_time = summary.get('current_step_time') or {}
+        if not summary.get('is_completed') and current_step_time.get('assigned_time', 0) > 0:
+            try:
+                schedule_step_deadline(file_id)
+            except Exception as e:
+                print(f"[DEADLINES] Error scheduling deadline of file {file_id}: {e}")
+    print(f"[DEADLINES] Scheduled {len(step_deadlines)} step deadlines")
+
+# Helper function to handle a step deadline that ran out
+def fire_step_deadline(file_id, step, deadline):
+    """Flag the step of a file overdue and notify the users of the step"""
+    # Check the deadline still holds, the file may have changed in the meantime
+    if get_step_deadline(file_id) != (deadline, step):
+        schedule_step_deadline(file_id)
+        return
+
+    file = files_db[file_id]
+    file['step_statuses'][step].update({'is_overdue': True, 'overdue_at': deadline})
+    data_manager.record_change('files_db', 'update', [file_id, 'step_statuses', step], {'is_overdue': True, 'overdue_at': deadline})
+    print(f"[DEADLINES] Step {step} of file {file_id} is overdue")
+
+    summary = data_manager.get_file_summary(files_db, file_id)
+    filename = summary.get('original_filename') or 'Unknown'
+    assigned_time = file['step_statuses'][step].get('assigned_time', 0)
+    for username in get_file_step_users(summary):
+        create_notification(
+            username,
+            'step_overdue',
+            f'Step overdue: {step}',
+            f'File "{filename}" has been in step "{step}" longer than its assigned {assigned_time} minutes.',
+            file_id=file_id,
+            step=step
+        )
+
+def step_deadline_scheduler():
+    """Background thread that fires step deadlines when they are due"""
+    print("[DEADLINES] Starting step deadline scheduler thread...")
+    rebuild_step_deadlines()
+
+    while True:
+        with step_deadline_condition:
+            while not stop_step_deadline_scheduler:
+                if step_deadline_heap:
+                    remaining = step_deadline_heap[0][0] - time.time()
+                    if remaining <= 0:
+                        break
+                    step_deadline_condition.wait(remaining)
+                else:
+                    step_deadline_condition.wait()
+            if stop_step_deadline_scheduler:
+                break
+
+            deadline, file_id, step = heapq.heappop(step_deadline_heap)
+            if step_deadlines.get(file_id) != (deadline, step):
+                continue
+            del step_deadlines[file_id]
+
+        data_manager.hold_files_db_shards(files_db)
+        try:
+            fire_step_deadline(file_id, step, deadline)
+        except Exception as e:
+            print(f"[DEADLINES] Error firing deadline of file {file_id}: {e}")
+        finally:
+            data_manager.release_files_db_shards(files_db)
+
+    print("[DEADLINES] Step deadline scheduler thread stopped")
+
+def start_step_deadline_scheduler():
+    """Start the step deadline scheduler thread"""
+    global step_deadline_thread, stop_step_deadline_scheduler
+
+    if step_deadline_thread is None or not step_deadline_thread.is_alive():
+        stop_step_deadline_scheduler = False
+        step_deadline_thread = threading.Thread(target=step_deadline_scheduler, daemon=True)
+        step_deadline_thread.start()
+
+def stop_step_deadline_scheduler_thread():
+    """Stop the step deadline scheduler thread"""
+    global stop_step_deadline_scheduler
+    with step_deadline_condition:
+        stop_step_deadline_scheduler = True
+        step_deadline_condition.notify_all()
+    if step_deadline_thread and step_deadline_thread.is_alive():
+        step_deadline_thread.join(timeout=5)
+
+atexit.register(stop_step_deadline_scheduler_thread)
+
+# Start the step deadline scheduler, it schedules the existing deadlines first
+start_step_deadline_scheduler()
+
+@app.route('/api/step_times/<file_id>')
+def get_step_times(file_id):
+    """
+    API endpoint to get the current total time worked for all steps of a file.
+    This is used for real-time updates of the time worked display.
+    """
+    print(f"\n[EXECUTING] get_step_times({file_id}) - Getting step times for file")
+    if 'username' not in session:
+        print("[STEP] User not in session, returning authentication error")
+        return jsonify({"error": "Not authenticated"}), 401
+
+    if file_id not in files_db:
+        print(f"[STEP] File {file_id} not found in database")
+        return jsonify({"error": "File not found"}), 404
+
+    step_times = calculate_step_times(file_id)
+    print(f"[STEP] Step times for file {file_id}: {step_times}")
+    return jsonify({"step_times": step_times, "server_time": time.time()})
+
+@app.route('/api/step_times/batch', methods=['POST'])
+def get_step_times_batch():
+    """
+    API endpoint to get the step times of many files in one request.
+    Accepts {"file_ids": [...]} or {"all": true}, with "current_step_only": true
+    to return only the current step of each file. Unknown file ids are skipped.
+    """
+    print("\n[EXECUTING] get_step_times_batch() - Getting step times for many files")
+    if 'username' not in session:
+        print("[STEP] User not in session, returning authentication error")
+        return jsonify({"error": "Not authenticated"}), 401
+
+    data = request.json or {}
+    if data.get('all'):
+        file_ids = list(files_db.keys())
+    else:
+        file_ids = data.get('file_ids')
+        if not isinstance(file_ids, list):
+            return jsonify({"error": "Missing file_ids"}), 400
+    current_step_only = bool(data.get('current_step_only'))
+
+    # One clock reading for all files, so they are consistent with each other
+    now = time.time()
+    step_times = {}
+    for file_id in file_ids:
+        if file_id not in files_db:
+            continue
+        only_step = None
+        if current_step_only:
+            only_step = data_manager.get_file_summary(files_db, file_id).get('current_step')
+        step_times[file_id] = calculate_step_times(file_id, now, only_step)
+
+    print(f"[STEP] Calculated step times for {len(step_times)} of {len(file_ids)} files")
+    return jsonify({"step_times": step_times, "server_time": now})
 
 @app.route('/update_status', methods=['POST'])
 def update_status():
@@ -2204,14 +3232,18 @@ def update_status():
     if status == 'Completed' or status == 'In Progress' or status == 'Not Started':
         # Add a status update entry to history
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+        epoch = data_manager.timestamp_to_epoch(timestamp)
         print(f"[STEP] Creating history entry with timestamp: {timestamp}")
-        files_db[file_id]['history'].append({
+        history_entry = {
             'step': step,
             'timestamp': timestamp,
+            'epoch': epoch,
             'filename': f"Status update to {status}",
             'path': None,  # No file for status updates
             'user': session['username']
-        })
+        }
+        append_history_entry(file_id, history_entry)
+        data_manager.record_change('files_db', 'append', [file_id, 'history'], history_entry)
 
         # Ensure file has step_statuses dictionary
         if 'step_statuses' not in files_db[file_id]:
@@ -2224,6 +3256,7 @@ def update_status():
             files_db[file_id]['step_statuses'][step] = {
                 'status': status,
                 'last_update': timestamp,
+                'last_update_epoch': epoch,
                 'updated_by': session['username'],
                 'assigned_time': 0  # Default assigned time in minutes (0 means no time limit)
             }
@@ -2232,6 +3265,7 @@ def update_status():
             print(f"[STEP] Updating existing status entry for step {step}")
             files_db[file_id]['step_statuses'][step]['status'] = status
             files_db[file_id]['step_statuses'][step]['last_update'] = timestamp
+            files_db[file_id]['step_statuses'][step]['last_update_epoch'] = epoch
             files_db[file_id]['step_statuses'][step]['updated_by'] = session['username']
 
         # Get file's custom steps
@@ -2244,12 +3278,8 @@ def update_status():
             # Find the last completed step and set current step to the next one
             update_current_step(file_id)
 
-        # Mark data as changed
-        print(f"[STEP] Marking data as changed")
-        data_manager.mark_data_changed()
-
-        # Trigger notification scan since file status was updated
-        trigger_notification_scan()
+        # Update notifications since file status was updated
+        trigger_notification_update(file_id=file_id)
         print(f"[STEP] Status update complete")
 
     return jsonify({"success": True})
@@ -2295,19 +3325,13 @@ def update_step_assigned_time():
         file_steps = file.get('custom_steps', steps)
 
         # First, find the completion time for each step
+        timeline = get_file_timeline(file_id)
+        first_entry = timeline['first']
         step_completion_times = {}
-
-        # Sort all history entries by timestamp
-        all_entries = file['history'].copy()
-        all_entries.sort(key=lambda x: datetime.fromisoformat(x['timestamp']))
-
-        # Find the completion time for each step
-        for entry in all_entries:
-            entry_step = entry.get('step')
-            if entry_step in file_steps:
-                # Check if this entry marks the step as completed
-                if entry.get('filename', '').startswith('Status update to Completed'):
-                    step_completion_times[entry_step] = entry['timestamp']
+        for timeline_step in file_steps:
+            step_timeline = timeline['steps'].get(timeline_step)
+            if step_timeline and step_timeline['completed_time'] is not None:
+                step_completion_times[timeline_step] = step_timeline['completed_time']
 
         # Get the index of the current step
         try:
@@ -2330,23 +3354,24 @@ def update_step_assigned_time():
         if step_index > 0:  # If not the first step
             prev_step = file_steps[step_index-1]
             if prev_step in step_completion_times:
-                start_time = datetime.fromisoformat(step_completion_times[prev_step])
+                start_time = step_completion_times[prev_step]
         else:  # For the first step, use the first history entry time
-            if all_entries and all_entries[0]['step'] == step:
-                start_time = datetime.fromisoformat(all_entries[0]['timestamp'])
+            if first_entry and first_entry['step'] == step:
+                start_time = first_entry['time']
 
         # If we have a start time, calculate the total time worked
-        if start_time:
+        if start_time is not None:
             if step in step_completion_times:  # If step is completed
-                end_time = datetime.fromisoformat(step_completion_times[step])
-                total_time_minutes = (end_time - start_time).total_seconds() / 60
+                end_time = step_completion_times[step]
+                total_time_minutes = (end_time - start_time) / 60
             elif current_status == 'In Progress':  # If step is in progress
-                end_time = datetime.now()
-                total_time_minutes = (end_time - start_time).total_seconds() / 60
+                end_time = time.time()
+                total_time_minutes = (end_time - start_time) / 60
 
         files_db[file_id]['step_statuses'][step] = {
             'status': 'Not Started',
             'last_update': timestamp,
+            'last_update_epoch': data_manager.timestamp_to_epoch(timestamp),
             'updated_by': session['username'],
             'assigned_time': assigned_time,
             'total_time_worked': int(total_time_minutes),
@@ -2363,7 +3388,10 @@ def update_step_assigned_time():
         files_db[file_id]['step_statuses'][step]['is_overdue'] = assigned_time > 0 and total_time_worked > assigned_time
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('files_db', file_id=file_id)
+
+    # The step's overdue deadline moves with its assigned time
+    schedule_step_deadline(file_id)
 
     return jsonify({"success": True})
 
@@ -2392,6 +3420,7 @@ def manage_file_steps(file_id):
         step_data = {
             'status': 'Not Started',
             'last_update': None,
+            'last_update_epoch': None,
             'user': None,
             'total_time_worked': 0
         }
@@ -2402,6 +3431,7 @@ def manage_file_steps(file_id):
                 # Use the stored dictionary values
                 step_data['status'] = file['step_statuses'][step].get('status', 'Not Started')
                 step_data['last_update'] = file['step_statuses'][step].get('last_update')
+                step_data['last_update_epoch'] = file['step_statuses'][step].get('last_update_epoch')
                 step_data['user'] = file['step_statuses'][step].get('updated_by')
                 step_data['total_time_worked'] = file['step_statuses'][step].get('total_time_worked', 0)
                 step_data['assigned_time'] = file['step_statuses'][step].get('assigned_time', 0)
@@ -2413,16 +3443,20 @@ def manage_file_steps(file_id):
                 # Still need to get last_update and user from history
                 for entry in file['history']:
                     if entry['step'] == step:
-                        if step_data['last_update'] is None or entry['timestamp'] > step_data['last_update']:
+                        entry_epoch = get_entry_epoch(entry)
+                        if entry_epoch is not None and (step_data['last_update_epoch'] is None or entry_epoch > step_data['last_update_epoch']):
                             step_data['last_update'] = entry['timestamp']
+                            step_data['last_update_epoch'] = entry_epoch
                             step_data['user'] = entry['user']
         else:
             # Fall back to calculating from history for backward compatibility
             # Check file history for this step
             for entry in file['history']:
                 if entry['step'] == step:
-                    if step_data['last_update'] is None or entry['timestamp'] > step_data['last_update']:
+                    entry_epoch = get_entry_epoch(entry)
+                    if entry_epoch is not None and (step_data['last_update_epoch'] is None or entry_epoch > step_data['last_update_epoch']):
                         step_data['last_update'] = entry['timestamp']
+                        step_data['last_update_epoch'] = entry_epoch
                         step_data['user'] = entry['user']
 
                         # Check for explicit status updates
@@ -2522,6 +3556,7 @@ def add_file_step(file_id):
     file['step_statuses'][step_name] = {
         'status': 'Not Started',
         'last_update': timestamp,
+        'last_update_epoch': data_manager.timestamp_to_epoch(timestamp),
         'updated_by': session['username'],
         'assigned_time': default_time,  # Use the default assigned time from global settings
         'total_time_worked': 0,  # Initialize total time worked to 0
@@ -2541,7 +3576,7 @@ def add_file_step(file_id):
             file['step_assignments'][step_name].append(username)
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('files_db', file_id=file_id)
 
     flash(f'Step "{step_name}" added successfully')
     return redirect(url_for('manage_file_steps', file_id=file_id))
@@ -2585,6 +3620,7 @@ def rename_file_step(file_id):
     for entry in file['history']:
         if entry['step'] == old_step:
             entry['step'] = new_step
+    invalidate_file_timeline(file_id)
 
     # Update step_statuses if they exist
     if 'step_statuses' in file and old_step in file['step_statuses']:
@@ -2599,10 +3635,11 @@ def rename_file_step(file_id):
         if isinstance(file['step_statuses'][new_step], dict):
             timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
             file['step_statuses'][new_step]['last_update'] = timestamp
+            file['step_statuses'][new_step]['last_update_epoch'] = data_manager.timestamp_to_epoch(timestamp)
             file['step_statuses'][new_step]['updated_by'] = session['username']
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('files_db', file_id=file_id)
 
     return jsonify({"success": True})
 
@@ -2651,7 +3688,7 @@ def remove_file_step(file_id):
         del file['step_statuses'][step]
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('files_db', file_id=file_id)
 
     return jsonify({"success": True})
 
@@ -2693,7 +3730,7 @@ def move_file_step(file_id):
         return jsonify({"success": False, "message": "Invalid direction"}), 400
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('files_db', file_id=file_id)
 
     return jsonify({"success": True})
 
@@ -2711,6 +3748,7 @@ def reset_file_steps(file_id):
 
     # Reset step_statuses
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+    epoch = data_manager.timestamp_to_epoch(timestamp)
     files_db[file_id]['step_statuses'] = {}
     for s in steps:
         # Use the default assigned time for this step if available
@@ -2719,6 +3757,7 @@ def reset_file_steps(file_id):
         files_db[file_id]['step_statuses'][s] = {
             'status': 'Not Started',
             'last_update': timestamp,
+            'last_update_epoch': epoch,
             'updated_by': session['username'],
             'assigned_time': default_time,  # Use the default assigned time from global settings
             'total_time_worked': 0,  # Initialize total time worked to 0
@@ -2733,6 +3772,7 @@ def reset_file_steps(file_id):
         files_db[file_id]['step_statuses'][steps[0]] = {
             'status': 'In Progress',
             'last_update': timestamp,
+            'last_update_epoch': epoch,
             'updated_by': session['username'],
             'assigned_time': default_time,  # Use the default assigned time from global settings
             'total_time_worked': 0,  # Initialize total time worked to 0
@@ -2740,7 +3780,7 @@ def reset_file_steps(file_id):
         }
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('files_db', file_id=file_id)
 
     flash('Process steps have been reset to the default')
     return redirect(url_for('manage_file_steps', file_id=file_id))
@@ -2822,10 +3862,10 @@ def manage_step_users(file_id):
     file['step_assignments'][step] = assigned_users
 
     # Mark data as changed
-    data_manager.mark_data_changed()
+    data_manager.mark_data_changed('files_db', file_id=file_id)
 
-    # Trigger notification scan since step assignments were updated
-    trigger_notification_scan()
+    # Update notifications since step assignments were updated
+    trigger_notification_update(file_id=file_id)
 
     flash(f'Users for step "{step}" updated successfully')
     return redirect(url_for('file_pipeline', file_id=file_id))
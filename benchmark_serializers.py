@@ -0,0 +1,160 @@
+"""
+Benchmark the data serializers on synthetic files_db datasets.
+
+Reports save time, load time, file size and peak memory for every serializer in
+serializers.SERIALIZERS, so SERIALIZER in data_manager.py can be picked with evidence.
+
+Usage:
+    python benchmark_serializers.py
+    python benchmark_serializers.py --sizes 1000 10000 --serializers pickle binary
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import uuid
+
+import serializers
+
+STEPS = ['intake', 'processing', 'validation', 'approval', 'final']
+STATUSES = ['Not Started', 'In Progress', 'Completed']
+USERS = ['admin', 'alice', 'bob', 'carol', 'dave', 'erin']
+SUPPLIERS = [f'Supplier {i}' for i in range(40)]
+PROCESS_TYPES = ['PS', 'PLM', 'IPS']
+
+def generate_file(rng, start):
+    """
+    Generate one files_db record shaped like the ones the app creates.
+    """
+    current_index = rng.randrange(len(STEPS))
+    timestamp = start + timedelta(minutes=rng.randrange(60 * 24 * 365))
+    filename = f'drawing_{rng.randrange(100000)}.pdf'
+
+    # Most files have a short history, some have been through many revisions
+    history = []
+    for _ in range(min(int(rng.expovariate(1 / 8)) + 1, 200)):
+        step = STEPS[rng.randrange(current_index + 1)]
+        timestamp += timedelta(minutes=rng.randrange(1, 600))
+        entry = {
+            'step': step,
+            'timestamp': timestamp.strftime('%Y-%m-%d %H:%M'),
+            'filename': filename,
+            'path': f'uploads/{step}/{timestamp.strftime("%Y%m%d_%H%M%S")}_{filename}',
+            'user': rng.choice(USERS)
+        }
+        if rng.random() < 0.5:
+            entry['status'] = rng.choice(STATUSES)
+            entry['comment'] = rng.choice(['', 'Checked', 'Needs rework on page 3'])
+        history.append(entry)
+
+    step_statuses = {}
+    for index, step in enumerate(STEPS):
+        status = 'Completed' if index < current_index else ('In Progress' if index == current_index else 'Not Started')
+        step_statuses[step] = {
+            'status': status,
+            'last_update': timestamp.strftime('%Y-%m-%d %H:%M') if index <= current_index else None,
+            'updated_by': rng.choice(USERS) if index <= current_index else None,
+            'assigned_time': rng.choice([0, 60, 240, 480]),
+            'total_time_worked': rng.randrange(600) if index <= current_index else 0,
+            'is_overdue': False
+        }
+
+    return {
+        'supplier': rng.choice(SUPPLIERS),
+        'process_type': rng.choice(PROCESS_TYPES),
+        'original_filename': filename,
+        'current_step': STEPS[current_index],
+        'history': history,
+        'custom_steps': list(STEPS),
+        'step_assignments': {step: rng.sample(USERS, 2) for step in STEPS},
+        'step_statuses': step_statuses,
+        'creation_time': history[0]['timestamp']
+    }
+
+def generate_files_db(count, seed=42):
+    """
+    Generate a synthetic files_db with count files.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return {str(uuid.UUID(int=rng.getrandbits(128))): generate_file(rng, start) for _ in range(count)}
+
+def measure_peak_memory(function, *args):
+    """
+    Run function and return its peak traced memory in bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark(files_db, name, repeat):
+    """
+    Benchmark one serializer on files_db, returning its measurements.
+    """
+    dumps, loads = serializers.SERIALIZERS[name]
+    fd, path = tempfile.mkstemp(suffix='.dat')
+    os.close(fd)
+
+    def save():
+        with open(path, 'wb') as f:
+            f.write(dumps(files_db))
+
+    def load():
+        with open(path, 'rb') as f:
+            return loads(f.read())
+
+    try:
+        save_times = []
+        load_times = []
+        for _ in range(repeat):
+            gc.collect()
+            started = time.perf_counter()
+            save()
+            save_times.append(time.perf_counter() - started)
+
+            gc.collect()
+            started = time.perf_counter()
+            loaded = load()
+            load_times.append(time.perf_counter() - started)
+
+        round_trip = loaded == files_db
+        del loaded
+        return {
+            'save': min(save_times),
+            'load': min(load_times),
+            'size': os.path.getsize(path),
+            'save_peak': measure_peak_memory(save),
+            'load_peak': measure_peak_memory(load),
+            'round_trip': round_trip
+        }
+    finally:
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of files to generate')
+    parser.add_argument('--serializers', nargs='+', default=list(serializers.SERIALIZERS), choices=list(serializers.SERIALIZERS))
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs per measurement, the fastest is reported')
+    args = parser.parse_args()
+
+    header = f"{'files':>8} {'serializer':<10} {'save s':>9} {'load s':>9} {'size MB':>9} {'save peak MB':>13} {'load peak MB':>13}  round trip"
+    print(header)
+    print('-' * len(header))
+    for size in args.sizes:
+        files_db = generate_files_db(size)
+        for name in args.serializers:
+            result = benchmark(files_db, name, args.repeat)
+            print(f"{size:>8} {name:<10} {result['save']:>9.3f} {result['load']:>9.3f} {result['size'] / 1e6:>9.2f} "
+                  f"{result['save_peak'] / 1e6:>13.1f} {result['load_peak'] / 1e6:>13.1f}  {'ok' if result['round_trip'] else 'LOSSY'}")
+        del files_db
+
+if __name__ == '__main__':
+    main()
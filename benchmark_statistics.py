@@ -0,0 +1,68 @@
+"""
+Benchmark the ways of calculating the /statistics numbers on synthetic files_db datasets.
+
+Compares the loop over every file (file_statistics.compute_statistics), the columnar
+NumPy snapshot (analytics) and the incrementally maintained totals (file_statistics),
+and checks that all of them give the same statistics.
+
+Usage:
+    python benchmark_statistics.py
+    python benchmark_statistics.py --sizes 1000 100000 --repeat 5
+"""
+import argparse
+import time
+
+import analytics
+import data_manager
+import file_statistics
+from benchmark_serializers import STEPS, USERS, generate_files_db
+
+def best_time(function, repeat):
+    """
+    Run function repeat times and return (fastest time, last result).
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of files to generate')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs per measurement, the fastest is reported')
+    args = parser.parse_args()
+
+    users_db = {username: {'roles': [STEPS[index % len(STEPS)]]} for index, username in enumerate(USERS)}
+    steps = list(STEPS)
+    step_assignments = {step: USERS[:2] for step in steps}
+
+    header = f"{'files':>8} {'loop s':>9} {'summaries s':>12} {'snapshot s':>11} {'numpy s':>9} {'totals s':>9} {'read s':>9}  same"
+    print(header)
+    print('-' * len(header))
+    for size in args.sizes:
+        files_db = generate_files_db(size)
+
+        loop_time, expected = best_time(lambda: file_statistics.compute_statistics(files_db, users_db, steps, step_assignments), args.repeat)
+
+        # The snapshot is built from the file summaries, which the files index keeps in
+        # memory, so building those is measured separately
+        summaries_time, summaries = best_time(lambda: data_manager.get_file_summaries(files_db), 1)
+        snapshot_time, snapshot = best_time(lambda: analytics.build_snapshot(summaries), args.repeat)
+        numpy_time, from_snapshot = best_time(lambda: analytics.snapshot_statistics(snapshot, users_db, steps, step_assignments), args.repeat)
+
+        # Building the totals includes building the summaries, reading them is what a page view costs
+        def build_totals():
+            file_statistics.mark_file_changed()
+            return file_statistics.get_statistics(files_db, users_db, steps, step_assignments)
+        totals_time, _ = best_time(build_totals, args.repeat)
+        read_time, from_totals = best_time(lambda: file_statistics.get_statistics(files_db, users_db, steps, step_assignments), args.repeat)
+
+        same = not file_statistics.statistics_differences(expected, from_snapshot) and not file_statistics.statistics_differences(expected, from_totals)
+        print(f"{size:>8} {loop_time:>9.3f} {summaries_time:>12.3f} {snapshot_time:>11.3f} {numpy_time:>9.4f} "
+              f"{totals_time:>9.3f} {read_time:>9.5f}  {'ok' if same else 'DIFFERENT'}")
+        del files_db, summaries, snapshot
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Shared fixtures for the tests.
+"""
+import atexit
+import os
+from datetime import datetime
+
+import pytest
+
+import data_manager
+
+# Module state of data_manager, as it is before anything is loaded
+FRESH_STATE = {
+    '_data_changed': False,
+    '_dirty_collections': set(),
+    '_dirty_files': set(),
+    '_dirty_notification_users': set(),
+    '_shard_members': {},
+    '_lazy_files_db': None,
+    '_file_change_listeners': [],
+    '_collections': {},
+    '_journal_file': None,
+    '_journal_pending': 0,
+    '_journal_records': 0,
+    '_notification_copies': {},
+    '_notification_copies_source': None,
+    '_backup_hashes': {},
+    '_last_backup_manifest': None
+}
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    Run a test in an empty data directory, with fresh change tracking and journal state.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(data_manager.BACKUP_DIR)
+    for name, value in FRESH_STATE.items():
+        # Mutable values are copied, so tests do not share them
+        value = value.copy() if hasattr(value, 'copy') else value
+        monkeypatch.setattr(data_manager, name, value)
+    yield tmp_path
+
+    if data_manager._journal_file is not None:
+        data_manager._journal_file.close()
+    # Backups are pruned in the background, let it finish before leaving the directory
+    if data_manager._prune_thread is not None:
+        data_manager._prune_thread.join(timeout=5)
+
+@pytest.fixture
+def make_file():
+    """
+    Build minimal file records, make_file(name, ...) -> record in a single step.
+    """
+    def make(name, supplier='Acme', process_type='PLM', step='intake', created=1767258000, completed=False, step_users=('admin',)):
+        timestamp = datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M')
+        return {
+            'supplier': supplier,
+            'process_type': process_type,
+            'original_filename': f'{name}.txt',
+            'current_step': step,
+            'creation_time': timestamp,
+            'creation_epoch': created,
+            'custom_steps': [step],
+            'history': [{'step': step, 'timestamp': timestamp, 'epoch': created, 'user': 'admin'}],
+            'step_statuses': {step: {'status': 'Completed' if completed else 'In Progress', 'total_time_worked': 0, 'assigned_time': 0}},
+            'step_assignments': {step: list(step_users)}
+        }
+    return make
+
+@pytest.fixture(scope='session')
+def started_app(tmp_path_factory):
+    """
+    The app, started once on an empty data directory, and that directory.
+    Auto-save, the notification compactor and the deadline scheduler are stopped so they do not
+    run into other tests; tests call what they would do themselves.
+    """
+    app_dir = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    try:
+        import app
+        data_manager.stop_auto_save()
+        app.stop_notification_compactor_thread()
+        app.stop_step_deadline_scheduler_thread()
+        app_state = {name: getattr(data_manager, name) for name in FRESH_STATE}
+    finally:
+        os.chdir(cwd)
+    yield app, app_dir, app_state
+
+    os.chdir(app_dir)
+    try:
+        app.stop_notification_worker_thread()
+        app.save_data_on_exit()
+        atexit.unregister(app.save_data_on_exit)
+        if data_manager._prune_thread is not None:
+            data_manager._prune_thread.join(timeout=5)
+    finally:
+        os.chdir(cwd)
+
+@pytest.fixture
+def app_module(started_app, monkeypatch):
+    """
+    The started app, with the test running in its data directory and data_manager holding
+    the app's state again, tests loading data on their own replace it.
+    """
+    app, app_dir, app_state = started_app
+    monkeypatch.chdir(app_dir)
+    for name, value in app_state.items():
+        monkeypatch.setattr(data_manager, name, value)
+    return app
@@ -1,21 +1,70 @@
+import hashlib
 import json
 import os
 import pickle
+import shutil
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import nullcontext
 from datetime import datetime
 import threading
 import time
+import zlib
+import serializers
+import sqlite_storage
 
 # Define data file paths
 DATA_DIR = 'data'
 USERS_FILE = os.path.join(DATA_DIR, 'users.pkl')
-FILES_DB_FILE = os.path.join(DATA_DIR, 'files_db.pkl')
+FILES_DB_FILE = os.path.join(DATA_DIR, 'files_db.pkl')  # Legacy single-file layout
+FILES_DB_DIR = os.path.join(DATA_DIR, 'files_db')  # One pickle per shard of file_ids
+FILES_DB_LAYOUT_FILE = os.path.join(FILES_DB_DIR, 'layout.pkl')  # Shard count, empty shards have no file
 STEPS_FILE = os.path.join(DATA_DIR, 'steps.pkl')
 STEP_ASSIGNMENTS_FILE = os.path.join(DATA_DIR, 'step_assignments.pkl')
 CUSTOM_STEPS_FILE = os.path.join(DATA_DIR, 'custom_steps.pkl')
 PROCESS_TYPES_FILE = os.path.join(DATA_DIR, 'process_types.pkl')
 DEFAULT_ASSIGNED_TIMES_FILE = os.path.join(DATA_DIR, 'default_assigned_times.pkl')
 NOTIFICATIONS_FILE = os.path.join(DATA_DIR, 'notifications.pkl')
+NOTIFICATIONS_ARCHIVE_FILE = os.path.join(DATA_DIR, 'notifications_archive.jsonl')  # Notifications removed by retention
+JOURNAL_FILE = os.path.join(DATA_DIR, 'journal.log')
 BACKUP_DIR = os.path.join(DATA_DIR, 'backups')
+BACKUP_OBJECTS_DIR = os.path.join(BACKUP_DIR, 'objects')  # Content-addressed copies shared by all backups
+
+# Storage backend: 'pickle' keeps each collection in its own pickle file,
+# 'sqlite' stores them in normalized tables in sqlite_storage.DB_FILE
+STORAGE_BACKEND = 'pickle'
+
+# Serializer for the data files: 'pickle' (protocol 5), 'binary' (compact schema-aware format)
+# or 'jsonl' (JSON Lines). Files are read in whatever format they were written,
+# so switching converts each file the next time it is saved.
+# Run benchmark_serializers.py to compare them on a dataset of your size.
+SERIALIZER = 'pickle'
+
+# Number of shards files_db is split into; only shards with changed files are rewritten
+FILES_DB_SHARDS = 64
+
+# Lazy files_db: keep only the summary index in memory and load shards on demand
+FILES_DB_LAZY = True
+FILES_DB_CACHE_SHARDS = 16  # Loaded shards kept before least recently used ones are evicted
+FILES_DB_CACHE_MIN_IDLE = 60  # Seconds a shard used outside hold_files_db_shards must be unused before it can be evicted
+
+# Names of the collections tracked for changes
+COLLECTIONS = ['users_db', 'files_db', 'steps', 'step_assignments', 'custom_steps', 'process_types', 'default_assigned_times', 'notifications_db']
+
+# Journal settings
+JOURNAL_ENABLED = True
+JOURNAL_FSYNC_INTERVAL = 1  # Seconds between group fsyncs of the journal
+JOURNAL_COMPACT_RECORDS = 5000  # Journal records before compacting into a snapshot
+
+# Backup retention: keep every backup from the last BACKUP_KEEP_ALL seconds,
+# then one per hour up to BACKUP_KEEP_HOURLY and one per day up to BACKUP_KEEP_DAILY
+BACKUP_KEEP_ALL = 3600
+BACKUP_KEEP_HOURLY = 24 * 3600
+BACKUP_KEEP_DAILY = 30 * 24 * 3600
+
+# Seconds within which two writes can leave a file the same modification time (FAT rounds to 2),
+# a file hashed that soon after its last write is hashed again by the next backup
+BACKUP_MTIME_GRANULARITY = 2
 
 # Ensure data directories exist
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -27,6 +76,36 @@ _save_lock = threading.Lock()
 _auto_save_thread = None
 _stop_auto_save = threading.Event()
 
+# Change tracking, per collection and per file_id for files_db
+_dirty_lock = threading.Lock()
+_dirty_collections = set()
+_dirty_files = set()
+_dirty_notification_users = set()  # Users whose notifications changed, when not all of notifications_db did
+_shard_members = {}  # {shard: set(file_ids)} for the pickle shard layout
+_lazy_files_db = None  # The LazyFilesDB returned by load_files_db, if any
+_file_change_listeners = []  # Called with the changed file_id, or None when any file may have changed
+_data_generation = 0  # Bumped on every data change, so cached results can tell they are stale
+
+# Journal state
+_journal_lock = threading.Lock()
+_journal_file = None
+_journal_pending = 0  # Records written since the last fsync
+_journal_records = 0  # Records written since the last snapshot
+_journal_thread = None
+_collections = {}
+
+# Snapshot state: the notifications of every user as last copied for a save.
+# Copies are replaced, never changed, so a snapshot can share them with later saves
+_snapshot_lock = threading.Lock()
+_notification_copies = {}
+_notification_copies_source = None  # The notifications_db the copies were taken from
+
+# Backup state
+_backup_lock = threading.Lock()
+_backup_hashes = {}  # {path: ((size, mtime_ns, inode, ctime_ns), digest, hashed_at_ns)} so unchanged files are not hashed again
+_last_backup_manifest = None
+_prune_thread = None
+
 def load_data():
     """
     Load all data from files.
@@ -41,54 +120,619 @@ def load_data():
 
     return users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types
 
+def _load_from_sqlite(loader, default_factory, label):
+    """
+    Load a collection from the SQLite backend, falling back to its default when missing.
+    """
+    try:
+        value = loader()
+        return value if value else default_factory()
+    except Exception as e:
+        print(f"Error loading {label} data: {e}")
+        return default_factory()
+
 def load_custom_steps():
     """
     Load custom steps list from file.
     """
+    if STORAGE_BACKEND == 'sqlite':
+        return _load_from_sqlite(lambda: sqlite_storage.load_setting('custom_steps'), list, 'custom steps')
     if os.path.exists(CUSTOM_STEPS_FILE):
         try:
-            with open(CUSTOM_STEPS_FILE, 'rb') as f:
-                return pickle.load(f)
+            return _read_data_file(CUSTOM_STEPS_FILE)
         except Exception as e:
             print(f"Error loading custom steps data: {e}")
             return []
     else:
         return []
 
-def save_data(users_db, files_db, steps_list, step_assignments, custom_steps_list=None, process_types=None, default_assigned_times=None, notifications_db=None):
+def save_data(users_db, files_db, steps_list, step_assignments, custom_steps_list=None, process_types=None, default_assigned_times=None, notifications_db=None, only_dirty=False):
     """
     Save all data to files.
+    With only_dirty, only the collections and files_db shards marked as changed are written.
+
+    Only the changed records are copied into a point-in-time snapshot while files_db is
+    locked; serializing and writing the snapshot happen afterwards, without any lock that
+    request threads wait on.
     """
-    print("saving all data")
-    save_users(users_db)
-    save_files_db(files_db)
-    save_steps(steps_list)
-    save_step_assignments(step_assignments)
-    if custom_steps_list is not None:
-        save_custom_steps(custom_steps_list)
-    if process_types is not None:
-        save_process_types(process_types)
-    if default_assigned_times is not None:
-        save_default_assigned_times(default_assigned_times)
-    if notifications_db is not None:
-        save_notifications(notifications_db)
+    print("saving changed data" if only_dirty else "saving all data")
+    if STORAGE_BACKEND != 'sqlite':
+        # Rotate first so every journaled record is covered by the dirty sets taken below
+        _rotate_journal()
+    collections = _collection_map(users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db)
+
+    # Snapshot only what changed. A lazy files_db keeps the taken dirty shards loaded until copied
+    with _files_db_lock(files_db):
+        dirty_collections, dirty_files, dirty_users = _take_dirty()
+        if not only_dirty:
+            dirty_collections = set(COLLECTIONS)
+        files_snapshot = _snapshot_files_db(collections['files_db'], dirty_collections, dirty_files)
+    if isinstance(files_db, LazyFilesDB):
+        # Copied shards can be evicted now
+        with files_db.lock:
+            files_db.evict()
+    snapshot = _snapshot_collections(collections, dirty_collections, dirty_users)
+
+    # Serialize and write the snapshot without holding anything request threads wait on
+    saved = True
+    if STORAGE_BACKEND == 'sqlite':
+        if files_snapshot is not None:
+            snapshot['files_db'] = files_snapshot
+        _save_copy_snapshot(snapshot, dirty_collections, dirty_files)
+    else:
+        serialized, saved = _serialize_snapshot(files_snapshot, snapshot)
+        saved = _write_serialized_snapshot(serialized) and saved
+    # The rotated journal holds the only durable copy of what failed, keep it for the next
+    # save or a replay on startup
+    if saved:
+        _discard_rotated_journal()
     create_backup()
 
-def mark_data_changed():
+def _serialize(data):
+    """
+    Serialize data to bytes with SERIALIZER.
+    The other serializers run Python code over the data, so they work on a pickled copy.
+    """
+    if SERIALIZER == 'pickle':
+        return serializers.dumps_pickle(data)
+    return serializers.dumps(_copy(data), SERIALIZER)
+
+def _copy(data):
+    """
+    Make a deep, point-in-time copy of data by pickling it.
+    """
+    return pickle.loads(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+def _read_data_file(path):
+    """
+    Read and deserialize a data file written by any serializer.
+    """
+    with open(path, 'rb') as f:
+        return serializers.loads(f.read())
+
+def _snapshot_files_db(files_db, dirty_collections, dirty_files):
+    """
+    Take the part of a snapshot for files_db, or None when no file changed.
+    For the pickle backend that is {shard: (records, summaries)} of the shards to rewrite,
+    for SQLite {file_id: record} of the changed files (all files when all of files_db changed).
+
+    Changed records are copied. The unchanged records of their shards are shared: a record
+    changed after this point is marked dirty again and rewritten by the next save, so a
+    shared record is never the last version written. Summaries are replaced rather than
+    changed, so sharing them is safe.
+    """
+    if 'files_db' in dirty_collections:
+        if STORAGE_BACKEND == 'sqlite':
+            return dict(files_db.items())
+        return _snapshot_files_db_shards(files_db)
+    if not dirty_files:
+        return None
+    if STORAGE_BACKEND == 'sqlite':
+        # Files missing from the copy were deleted
+        return {file_id: _copy(files_db[file_id]) for file_id in dirty_files if file_id in files_db}
+    return _snapshot_files_db_shards(files_db, dirty_files)
+
+def _snapshot_collections(collections, dirty_collections, dirty_users):
+    """
+    Take the part of a snapshot for the collections other than files_db, {collection: data}.
+    notifications_db is rebuilt from the kept copies of every user's notifications,
+    copying only the users whose notifications changed.
+    """
+    snapshot = {}
+    for collection in dirty_collections:
+        if collection not in ('files_db', 'notifications_db') and collections.get(collection) is not None:
+            snapshot[collection] = _copy(collections[collection])
+
+    global _notification_copies_source
+    notifications_db = collections.get('notifications_db')
+    if notifications_db is not None and ('notifications_db' in dirty_collections or dirty_users):
+        with _snapshot_lock:
+            # Copy every user when the copies were not taken from this notifications_db yet
+            if 'notifications_db' in dirty_collections or _notification_copies_source is not notifications_db:
+                _notification_copies.clear()
+                _notification_copies_source = notifications_db
+                dirty_users = list(notifications_db)
+            for username in dirty_users:
+                user_notifications = notifications_db.get(username)
+                if user_notifications is None:
+                    _notification_copies.pop(username, None)
+                else:
+                    _notification_copies[username] = _copy(user_notifications)
+            snapshot['notifications_db'] = dict(_notification_copies)
+    return snapshot
+
+def _serialize_snapshot(files_snapshot, snapshot):
+    """
+    Serialize a snapshot of files_db shards and collections to ([(collection, path, bytes)], complete).
+    A shard that fails to serialize, e.g. because a shared record changed meanwhile,
+    has its files marked changed again for the next save, a collection is marked changed
+    again as a whole. complete is False when anything failed.
+    """
+    serialized = []
+    complete = True
+    for shard, (records, summaries) in (files_snapshot or {}).items():
+        try:
+            serialized += [('files_db', path, data) for path, data in _serialize_files_db_shard(shard, records, summaries)]
+        except Exception as e:
+            print(f"Error serializing files data shard {shard}: {e}")
+            _mark_files_unsaved(records)
+            complete = False
+
+    collection_files = {
+        'users_db': USERS_FILE,
+        'steps': STEPS_FILE,
+        'step_assignments': STEP_ASSIGNMENTS_FILE,
+        'custom_steps': CUSTOM_STEPS_FILE,
+        'process_types': PROCESS_TYPES_FILE,
+        'default_assigned_times': DEFAULT_ASSIGNED_TIMES_FILE,
+        'notifications_db': NOTIFICATIONS_FILE
+    }
+    for collection, path in collection_files.items():
+        if collection in snapshot:
+            try:
+                serialized.append((collection, path, _serialize(snapshot[collection])))
+            except Exception as e:
+                print(f"Error serializing {collection}: {e}")
+                mark_data_changed(collection)
+                complete = False
+    return serialized, complete
+
+def _write_serialized_snapshot(snapshot):
+    """
+    Write a serialized snapshot to its files. Failed collections are marked changed again.
+    Returns whether every file was written.
+    """
+    os.makedirs(FILES_DB_DIR, exist_ok=True)
+    written = True
+    for collection, path, data in snapshot:
+        try:
+            _write_snapshot_file(path, data)
+        except Exception as e:
+            print(f"Error saving {collection} to {path}: {e}")
+            mark_data_changed(collection)
+            written = False
+    _remove_stale_files_db_shards()
+    try:
+        _write_files_db_layout()
+    except Exception as e:
+        print(f"Error saving files data layout: {e}")
+        written = False
+    return written
+
+def _save_copy_snapshot(snapshot, dirty_collections, dirty_files):
+    """
+    Save a copied snapshot with the per-collection save functions.
+    """
+    save_functions = {
+        'users_db': save_users,
+        'steps': save_steps,
+        'step_assignments': save_step_assignments,
+        'custom_steps': save_custom_steps,
+        'process_types': save_process_types,
+        'default_assigned_times': save_default_assigned_times,
+        'notifications_db': save_notifications
+    }
+    if 'files_db' in dirty_collections:
+        save_files_db(snapshot['files_db'])
+    elif dirty_files:
+        save_files_db_changes(snapshot['files_db'], dirty_files)
+    for collection, save_function in save_functions.items():
+        if collection in snapshot:
+            save_function(snapshot[collection])
+
+def mark_data_changed(*collections, file_id=None, username=None):
     """
     Mark that data has been changed and needs to be saved.
+    Pass the changed collection names, file_id for a single file in files_db and username
+    for a single user's notifications, so the next save only copies what changed.
+    Without arguments everything is saved.
+    """
+    global _data_changed
+    _mark_dirty(collections, file_id, username)
+    _data_changed = True
+
+def get_data_generation():
+    """
+    Get the data generation, which changes whenever any collection is changed.
+    """
+    return _data_generation
+
+def _bump_data_generation():
+    """
+    Start a new data generation after a change.
+    """
+    global _data_generation
+    with _dirty_lock:
+        _data_generation += 1
+
+def _mark_dirty(collections, file_id=None, username=None):
+    """
+    Add collections, a single file_id of files_db or a single user of notifications_db
+    to the dirty sets.
+    """
+    with _dirty_lock:
+        if not collections:
+            _dirty_collections.update(COLLECTIONS)
+        for collection in collections:
+            if collection == 'files_db' and file_id is not None:
+                _dirty_files.add(file_id)
+            elif collection == 'notifications_db' and username is not None:
+                _dirty_notification_users.add(username)
+            else:
+                _dirty_collections.add(collection)
+
+    if not collections or 'files_db' in collections:
+        # Keep the summary index of a lazy files_db up to date
+        if _lazy_files_db is not None:
+            if file_id is not None and collections:
+                _lazy_files_db.refresh_summary(file_id)
+            else:
+                _lazy_files_db.refresh_summaries()
+        _notify_file_change(file_id if collections else None)
+
+    # After the listeners, so a result computed for the new generation includes the change
+    _bump_data_generation()
+
+def add_file_change_listener(listener):
+    """
+    Register listener(file_id) to be called after a file of files_db changed.
+    file_id is None when any file may have changed.
+    """
+    _file_change_listeners.append(listener)
+
+def _notify_file_change(file_id):
+    """
+    Tell the file change listeners that a file changed.
+    """
+    for listener in _file_change_listeners:
+        try:
+            listener(file_id)
+        except Exception as e:
+            print(f"Error in file change listener: {e}")
+
+def _take_dirty():
+    """
+    Return the dirty collections, file_ids and notification users and start tracking afresh.
+    """
+    global _dirty_collections, _dirty_files, _dirty_notification_users
+
+    with _dirty_lock:
+        dirty = _dirty_collections, _dirty_files, _dirty_notification_users
+        _dirty_collections, _dirty_files, _dirty_notification_users = set(), set(), set()
+    return dirty
+
+def _mark_files_unsaved(file_ids):
+    """
+    Mark files changed again after their shard could not be saved.
     """
     global _data_changed
+    with _dirty_lock:
+        _dirty_files.update(file_ids)
     _data_changed = True
 
+def _files_in_sync():
+    """
+    Check that no files_db change is waiting to be saved.
+    """
+    return 'files_db' not in _dirty_collections and not _dirty_files
+
+def _collection_map(users_db, files_db, steps_list, step_assignments, custom_steps_list=None, process_types=None, default_assigned_times=None, notifications_db=None):
+    """
+    Map journal collection names to the in-memory objects they refer to.
+    """
+    collections = {
+        'users_db': users_db,
+        'files_db': files_db,
+        'steps': steps_list,
+        'step_assignments': step_assignments,
+        'custom_steps': custom_steps_list,
+        'process_types': process_types,
+        'default_assigned_times': default_assigned_times,
+        'notifications_db': notifications_db
+    }
+    return {name: obj for name, obj in collections.items() if obj is not None}
+
+def _select(container, key):
+    """
+    Look up a journal path element.
+    A dict element selects the first list item whose fields match it.
+    """
+    if isinstance(key, dict):
+        items = container.values() if isinstance(container, dict) else container
+        return next(item for item in items if all(item.get(k) == v for k, v in key.items()))
+    return container[key]
+
+def _resolve_path(collections, collection, path):
+    """
+    Walk a journal path and return the container holding its last element.
+    """
+    target = collections[collection]
+    for key in path[:-1]:
+        target = _select(target, key)
+    return target
+
+def record_change(collection, op, path, value=None):
+    """
+    Record a single mutation of a collection.
+
+    In journal mode the mutation is appended to the journal and made durable by the
+    next group fsync, so the auto-save does not need to rewrite every data file.
+    Otherwise this falls back to mark_data_changed().
+
+    Supported ops:
+    - 'set': container[path[-1]] = value
+    - 'delete': remove the key path[-1] from its dict
+    - 'append': append value to the list at path
+    - 'update': update the dict at path with the fields in value
+    - 'remove': drop every item of the list at path whose fields match value
+    """
+    global _journal_file, _journal_pending, _journal_records
+
+    if STORAGE_BACKEND == 'sqlite':
+        _commit_sqlite_changes(collection, [(op, path)])
+        return
+
+    file_id = path[0] if collection == 'files_db' else None
+    username = path[0] if collection == 'notifications_db' else None
+    if not JOURNAL_ENABLED:
+        mark_data_changed(collection, file_id=file_id, username=username)
+        return
+
+    # Mark dirty before journaling so the next snapshot covers this record
+    _mark_dirty([collection], file_id, username)
+    record = {'op': op, 'collection': collection, 'path': list(path), 'value': value}
+    if op == 'append' and collection in _collections:
+        # Remember the list position so replaying over a newer snapshot is idempotent
+        try:
+            record['index'] = len(_resolve_path(_collections, collection, path)[path[-1]]) - 1
+        except (KeyError, IndexError, StopIteration, TypeError):
+            pass
+
+    with _journal_lock:
+        try:
+            if _journal_file is None:
+                _journal_file = open(JOURNAL_FILE, 'ab')
+            pickle.dump(record, _journal_file, protocol=pickle.HIGHEST_PROTOCOL)
+            _journal_pending += 1
+            _journal_records += 1
+        except Exception as e:
+            print(f"Error writing journal record: {e}")
+            mark_data_changed(collection, file_id=file_id, username=username)
+
+def record_changes(collection, changes):
+    """
+    Record several mutations of a collection, a list of (op, path, value) as taken by
+    record_change(). The SQLite backend writes them in a single transaction.
+    """
+    if STORAGE_BACKEND == 'sqlite':
+        _commit_sqlite_changes(collection, [(op, path) for op, path, value in changes])
+        return
+
+    for op, path, value in changes:
+        record_change(collection, op, path, value)
+
+def _commit_sqlite_changes(collection, changes):
+    """
+    Write the records touched by mutations straight to the SQLite backend.
+    Mutations of collections without per-record tables fall back to a full save.
+    """
+    if collection not in ('files_db', 'notifications_db') or collection not in _collections:
+        mark_data_changed(collection)
+        return
+
+    if collection == 'files_db':
+        for op, path in changes:
+            _commit_sqlite_file_change(op, path)
+        return
+
+    # Notifications are written per row, or for the whole user when the path is the user
+    notifications_db = _collections['notifications_db']
+    users = {}
+    notifications = {}
+    for op, path in changes:
+        username = path[0]
+        if len(path) == 1:
+            users[username] = notifications_db.get(username)
+        else:
+            notifications[(username, path[1])] = notifications_db.get(username, {}).get(path[1])
+    _bump_data_generation()
+    try:
+        sqlite_storage.save_notification_changes(users, notifications)
+    except Exception as e:
+        print(f"Error committing notifications_db change to SQLite: {e}")
+        for username in {path[0] for op, path in changes}:
+            mark_data_changed('notifications_db', username=username)
+
+def _commit_sqlite_file_change(op, path):
+    """
+    Write the file record touched by a mutation straight to the SQLite backend.
+    """
+    key = path[0]
+    _notify_file_change(key)
+    _bump_data_generation()
+    try:
+        file = _collections['files_db'].get(key)
+        if file is None:
+            sqlite_storage.delete_file(key)
+        elif op == 'append' and list(path[1:]) == ['history']:
+            sqlite_storage.append_history_entry(key, len(file['history']) - 1, file['history'][-1])
+        else:
+            sqlite_storage.save_file(key, file, include_history=len(path) == 1 or path[1] == 'history')
+    except Exception as e:
+        print(f"Error committing files_db change to SQLite: {e}")
+        mark_data_changed('files_db', file_id=key)
+
+def sync_journal():
+    """
+    Flush and fsync all journal records written since the last sync.
+    """
+    global _journal_pending
+
+    with _journal_lock:
+        if _journal_file is None or _journal_pending == 0:
+            return
+        try:
+            _journal_file.flush()
+            os.fsync(_journal_file.fileno())
+            _journal_pending = 0
+        except Exception as e:
+            print(f"Error syncing journal: {e}")
+
+def journal_needs_compaction():
+    """
+    Check whether enough records have accumulated to compact the journal into a snapshot.
+    """
+    return JOURNAL_ENABLED and _journal_records >= JOURNAL_COMPACT_RECORDS
+
+def _rotate_journal():
+    """
+    Move the active journal aside before a snapshot is written.
+    Records appended while the snapshot is being written go to a fresh journal.
+    """
+    global _journal_file, _journal_pending, _journal_records
+
+    rotated_file = JOURNAL_FILE + '.1'
+    with _journal_lock:
+        try:
+            if _journal_file is not None:
+                _journal_file.flush()
+                os.fsync(_journal_file.fileno())
+                _journal_file.close()
+                _journal_file = None
+            if os.path.exists(JOURNAL_FILE):
+                if os.path.exists(rotated_file):
+                    # A previous snapshot did not complete, keep its records as well
+                    with open(JOURNAL_FILE, 'rb') as src, open(rotated_file, 'ab') as dst:
+                        dst.write(src.read())
+                    os.remove(JOURNAL_FILE)
+                else:
+                    os.replace(JOURNAL_FILE, rotated_file)
+            _journal_pending = 0
+            _journal_records = 0
+        except Exception as e:
+            print(f"Error rotating journal: {e}")
+
+def _discard_rotated_journal():
+    """
+    Remove the rotated journal once the snapshot covering it has been written.
+    """
+    rotated_file = JOURNAL_FILE + '.1'
+    if os.path.exists(rotated_file):
+        try:
+            os.remove(rotated_file)
+        except Exception as e:
+            print(f"Error removing rotated journal: {e}")
+
+def _apply_journal_record(collections, record):
+    """
+    Apply a single journal record to the in-memory collections.
+    """
+    op = record['op']
+    path = record['path']
+    value = record.get('value')
+    container = _resolve_path(collections, record['collection'], path)
+    key = path[-1]
+
+    if op == 'set':
+        container[key] = value
+    elif op == 'delete':
+        container.pop(key, None)
+    elif op == 'append':
+        if isinstance(container, dict):
+            target = container.setdefault(key, [])
+        else:
+            target = container[key]
+        if isinstance(target, dict):
+            # Notifications journaled before they were keyed by id
+            target[value['id']] = value
+            return
+        index = record.get('index')
+        # Skip entries the snapshot already contains
+        if index is None or index >= len(target) or target[index] != value:
+            target.append(value)
+    elif op == 'update':
+        _select(container, key).update(value)
+    elif op == 'remove':
+        if key in container:
+            if isinstance(container[key], dict):
+                container[key] = {item_id: item for item_id, item in container[key].items()
+                                  if not all(item.get(k) == v for k, v in value.items())}
+            else:
+                container[key] = [item for item in container[key]
+                                  if not all(item.get(k) == v for k, v in value.items())]
+    else:
+        raise ValueError(f"Unknown journal op '{op}'")
+
+def replay_journal(users_db, files_db, steps_list, step_assignments, custom_steps_list=None, process_types=None, default_assigned_times=None, notifications_db=None):
+    """
+    Replay journal records written since the last snapshot on top of the loaded data.
+    Returns the number of records applied.
+    """
+    if STORAGE_BACKEND == 'sqlite':
+        return 0  # Changes are committed to the database as they happen
+
+    collections = _collection_map(users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db)
+    applied = 0
+
+    for journal_path in [JOURNAL_FILE + '.1', JOURNAL_FILE]:
+        if not os.path.exists(journal_path):
+            continue
+        with open(journal_path, 'rb') as f:
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    # A torn write at the end of the journal, nothing after it was synced
+                    print(f"Stopping journal replay of {journal_path}: {e}")
+                    break
+                try:
+                    _apply_journal_record(collections, record)
+                    applied += 1
+                    # Fold the replayed record into the next snapshot
+                    if record['collection'] == 'files_db':
+                        mark_data_changed('files_db', file_id=record['path'][0])
+                    else:
+                        mark_data_changed(record['collection'])
+                except Exception as e:
+                    print(f"Error replaying journal record {record.get('op')} {record.get('path')}: {e}")
+
+    if applied:
+        print(f"Replayed {applied} journal records")
+        if notifications_db is not None:
+            _key_notifications_by_id(notifications_db)
+    return applied
+
 def load_users():
     """
     Load users database from file.
     """
+    if STORAGE_BACKEND == 'sqlite':
+        return _load_from_sqlite(sqlite_storage.load_users, create_default_users, 'users')
     if os.path.exists(USERS_FILE):
         try:
-            with open(USERS_FILE, 'rb') as f:
-                return pickle.load(f)
+            return _read_data_file(USERS_FILE)
         except Exception as e:
             print(f"Error loading users data: {e}")
             return create_default_users()
@@ -100,43 +744,681 @@ def save_users(users_db):
     Save users database to file.
     """
     try:
-        with open(USERS_FILE, 'wb') as f:
-            pickle.dump(users_db, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_users(users_db)
+            return
+        _write_bytes_atomic(USERS_FILE, _serialize(users_db))
     except Exception as e:
         print(f"Error saving users data: {e}")
 
+def get_files_db_shard(file_id):
+    """
+    Get the shard number a file_id is stored in.
+    """
+    return zlib.crc32(str(file_id).encode('utf-8')) % FILES_DB_SHARDS
+
+def _files_db_shard_path(shard):
+    """
+    Get the path of a files_db shard file.
+    """
+    return os.path.join(FILES_DB_DIR, f'shard_{shard:03d}.pkl')
+
+def _write_bytes_atomic(path, data):
+    """
+    Write data to a temporary file and move it into place.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _write_snapshot_file(path, data):
+    """
+    Write a serialized data file, or remove it when data is None (a files_db shard that is empty).
+    """
+    if data is None:
+        if os.path.exists(path):
+            os.remove(path)
+    else:
+        _write_bytes_atomic(path, data)
+
+def _files_db_index_path(shard):
+    """
+    Get the path of the summary index file of a files_db shard.
+    """
+    return os.path.join(FILES_DB_DIR, f'index_{shard:03d}.pkl')
+
+def timestamp_to_epoch(timestamp):
+    """
+    Convert a timestamp string ('%Y-%m-%d %H:%M' or isoformat) to integer epoch seconds.
+    Returns None for a missing or unreadable timestamp.
+    """
+    if not timestamp:
+        return None
+    try:
+        return int(datetime.fromisoformat(str(timestamp)).timestamp())
+    except ValueError:
+        return None
+
+def _step_completions(file):
+    """
+    List the completed steps of a file as [completed_at, step, user, time_worked, is_overdue].
+    Like the step times, a step is completed at its newest "Status update to Completed" entry
+    and worked on since the previous step was completed (the first step since the first entry).
+    """
+    first_time = None
+    first_step = None
+    completions = {}  # {step: (completed_at, user)}
+    for entry in file.get('history') or ():
+        entry_time = entry.get('epoch')
+        if entry_time is None:
+            entry_time = timestamp_to_epoch(entry.get('timestamp'))
+            if entry_time is None:
+                continue
+        if first_time is None or entry_time < first_time:
+            first_time, first_step = entry_time, entry.get('step')
+        if (entry.get('filename') or '').startswith('Status update to Completed'):
+            step = entry.get('step')
+            if step not in completions or entry_time >= completions[step][0]:
+                completions[step] = (entry_time, entry.get('user'))
+    if not completions:
+        return []
+
+    step_statuses = file.get('step_statuses') or {}
+    file_steps = file.get('custom_steps') or list(step_statuses)
+    result = []
+    for index, step in enumerate(file_steps):
+        if step not in completions:
+            continue
+        completed_at, user = completions[step]
+        if index > 0:
+            start_time = completions.get(file_steps[index - 1], (None,))[0]
+        else:
+            start_time = first_time if first_step == step else None
+        time_worked = int((completed_at - start_time) / 60) if start_time is not None else 0
+        step_status = step_statuses.get(step)
+        assigned_time = step_status.get('assigned_time', 0) if isinstance(step_status, dict) else 0
+        result.append([completed_at, step, user, time_worked, assigned_time > 0 and time_worked > assigned_time])
+    return result
+
+def build_file_summary(file):
+    """
+    Build the compact summary of a file record kept in the files_db index.
+    It holds what the main page, step counts and notification scan need, and which steps
+    and users a file refers to, so they can run and find the files a step or user change
+    touches without loading the full record with its history.
+    """
+    history = file.get('history') or []
+    step_statuses = file.get('step_statuses') or {}
+    current_step = file.get('current_step')
+
+    # Time spent in the current step
+    current_step_time = None
+    step_status = step_statuses.get(current_step) if current_step else None
+    if isinstance(step_status, dict):
+        total_time_worked = step_status.get('total_time_worked', 0)
+        assigned_time = step_status.get('assigned_time', 0)
+        # The step deadline scheduler flags a step overdue as its assigned time runs out,
+        # the worked time only tells for steps it has not seen
+        is_overdue = step_status.get('is_overdue')
+        if is_overdue is None:
+            is_overdue = assigned_time > 0 and total_time_worked > assigned_time
+        current_step_time = {
+            'total_time_worked': total_time_worked,
+            'assigned_time': assigned_time,
+            'is_overdue': bool(is_overdue)
+        }
+
+    file_assignments = file.get('step_assignments') or {}
+    current_step_users = file_assignments.get(current_step) if current_step in file_assignments else None
+    # None when the file has no step assignments of its own yet
+    assigned_users = sorted({user for users in file_assignments.values() for user in users}) if 'step_assignments' in file else None
+
+    # What each step adds to the statistics: [step, status, total_time_worked, is_overdue, updated_by]
+    step_stats = [[step, step_status.get('status', 'Not Started'), step_status.get('total_time_worked', 0),
+                   bool(step_status.get('is_overdue', False)), step_status.get('updated_by')]
+                  for step, step_status in step_statuses.items() if isinstance(step_status, dict)]
+
+    return {
+        'supplier': file.get('supplier'),
+        'process_type': file.get('process_type'),
+        'original_filename': file.get('original_filename'),
+        'current_step': current_step,
+        'creation_time': file.get('creation_time'),
+        'first_update': history[0].get('timestamp') if history else None,
+        'last_update': history[-1].get('timestamp') if history else None,
+        'creation_epoch': file.get('creation_epoch'),
+        'first_update_epoch': history[0].get('epoch') if history else None,
+        'last_update_epoch': history[-1].get('epoch') if history else None,
+        'history_count': len(history),
+        'is_completed': all(isinstance(entry, dict) and entry.get('status') == 'Completed' for entry in step_statuses.values()),
+        'current_step_time': current_step_time,
+        'is_overdue': bool(current_step_time and current_step_time['is_overdue']),
+        'current_step_users': list(current_step_users) if current_step_users is not None else None,
+        'assigned_users': assigned_users,
+        'custom_steps': list(file['custom_steps']) if file.get('custom_steps') is not None else None,
+        'history_steps': sorted({entry.get('step') for entry in history if entry.get('step')}),
+        'step_stats': step_stats,
+        'completions': _step_completions(file)
+    }
+
+def get_file_summary(files_db, file_id):
+    """
+    Get the summary of a single file, or None if it does not exist.
+    """
+    if isinstance(files_db, LazyFilesDB):
+        return files_db.get_summary(file_id)
+    file = files_db.get(file_id)
+    return build_file_summary(file) if file is not None else None
+
+def get_file_summaries(files_db):
+    """
+    Get {file_id: summary} for every file.
+    A lazy files_db answers from its index, otherwise the summaries are built from the records.
+    """
+    if isinstance(files_db, LazyFilesDB):
+        return files_db.summaries()
+    return {file_id: build_file_summary(file) for file_id, file in list(files_db.items())}
+
+def _files_db_lock(files_db):
+    """
+    Get a lock that keeps a lazy files_db from evicting shards while they are saved.
+    """
+    return files_db.lock if isinstance(files_db, LazyFilesDB) else nullcontext()
+
+def hold_files_db_shards(files_db):
+    """
+    Keep the files_db shards the current thread accesses loaded until release_files_db_shards,
+    e.g. for a request or a batch of background work that holds records.
+    """
+    if isinstance(files_db, LazyFilesDB):
+        files_db.hold_shards()
+
+def release_files_db_shards(files_db):
+    """
+    Let the shards held since hold_files_db_shards be evicted again.
+    """
+    if isinstance(files_db, LazyFilesDB):
+        files_db.release_shards()
+
+class LazyFilesDB(MutableMapping):
+    """
+    files_db mapping that keeps only the summary index of every file in memory.
+    Full records are loaded a shard at a time on first access, and the least recently
+    used shards are evicted once more than FILES_DB_CACHE_SHARDS are loaded.
+    Shards with unsaved changes or held by a thread (see hold_shards) are never evicted.
+    """
+
+    def __init__(self, summaries=None):
+        self.lock = threading.RLock()
+        self._summaries = summaries if summaries is not None else {}
+        self._records = {}
+        self._loaded_shards = OrderedDict()  # {shard: last access time}, oldest first
+        self._pins = {}  # {shard: number of threads holding it}
+        self._unheld = set()  # Shards last used without a hold
+        self._stale = set()  # Loaded records changed since their summary was built
+        self._held = threading.local()  # Shards held by the current thread and how deeply holds nest
+
+    def __getitem__(self, file_id):
+        with self.lock:
+            if file_id not in self._summaries:
+                raise KeyError(file_id)
+            self._touch(get_files_db_shard(file_id))
+            return self._records[file_id]
+
+    def __setitem__(self, file_id, file):
+        with self.lock:
+            shard = get_files_db_shard(file_id)
+            # Load the rest of the shard so the next shard write keeps it
+            self._touch(shard)
+            self._records[file_id] = file
+            self._summaries[file_id] = build_file_summary(file)
+            self._stale.discard(file_id)
+            _shard_members.setdefault(shard, set()).add(file_id)
+
+    def __delitem__(self, file_id):
+        with self.lock:
+            if file_id not in self._summaries:
+                raise KeyError(file_id)
+            shard = get_files_db_shard(file_id)
+            self._touch(shard)
+            del self._summaries[file_id]
+            self._records.pop(file_id, None)
+            self._stale.discard(file_id)
+            _shard_members.get(shard, set()).discard(file_id)
+
+    def __contains__(self, file_id):
+        return file_id in self._summaries
+
+    def __iter__(self):
+        return iter(list(self._summaries))
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def summaries(self):
+        """
+        Get the {file_id: summary} index without loading any record.
+        """
+        with self.lock:
+            self._rebuild_stale_summaries(list(self._stale))
+            return dict(self._summaries)
+
+    def get_summary(self, file_id):
+        """
+        Get the summary of a single file, or None if it does not exist.
+        """
+        if file_id in self._stale:
+            with self.lock:
+                self._rebuild_stale_summaries([file_id])
+        return self._summaries.get(file_id)
+
+    def refresh_summary(self, file_id):
+        """
+        Mark the summary of a loaded record for rebuilding after it was changed.
+        It is rebuilt when it is next read, so a run of changes to a file costs one rebuild.
+        """
+        with self.lock:
+            if file_id in self._records and file_id in self._summaries:
+                self._stale.add(file_id)
+
+    def refresh_summaries(self):
+        """
+        Mark the summaries of every loaded record for rebuilding.
+        """
+        with self.lock:
+            self._stale.update(file_id for file_id in self._records if file_id in self._summaries)
+
+    def _rebuild_stale_summaries(self, file_ids):
+        """
+        Rebuild the summaries of those file_ids that are marked stale.
+        """
+        for file_id in file_ids:
+            if file_id not in self._stale:
+                continue
+            self._stale.discard(file_id)
+            file = self._records.get(file_id)
+            if file is not None and file_id in self._summaries:
+                self._summaries[file_id] = build_file_summary(file)
+
+    def shard_records(self, shard):
+        """
+        Get {file_id: record} of a shard for writing it, without counting it as a use.
+        """
+        with self.lock:
+            if shard not in self._loaded_shards:
+                self._load_shard(shard)
+            return {file_id: self._records[file_id] for file_id in _shard_members.get(shard, ())
+                    if file_id in self._summaries and file_id in self._records}
+
+    def loaded_shards(self):
+        """
+        Get the shards whose records are currently in memory.
+        """
+        with self.lock:
+            return list(self._loaded_shards)
+
+    def hold_shards(self):
+        """
+        Pin every shard the current thread accesses from now on until release_shards, so
+        records it holds are never evicted and replaced by a copy read from disk.
+        Holds nest, the shards are released with the outermost one.
+        """
+        depth = getattr(self._held, 'depth', 0)
+        if depth == 0:
+            self._held.shards = set()
+        self._held.depth = depth + 1
+
+    def release_shards(self):
+        """
+        Unpin the shards held by the current thread once its outermost hold ends.
+        """
+        depth = getattr(self._held, 'depth', 0)
+        if depth == 0:
+            return
+        self._held.depth = depth - 1
+        if depth > 1:
+            return
+        with self.lock:
+            for shard in self._held.shards:
+                self._pins[shard] -= 1
+                if not self._pins[shard]:
+                    del self._pins[shard]
+        self._held.shards = None
+
+    def load_all(self):
+        """
+        Load every shard, e.g. before rewriting all of them with a new shard count.
+        """
+        with self.lock:
+            for shard in range(FILES_DB_SHARDS):
+                if shard not in self._loaded_shards:
+                    self._load_shard(shard)
+
+    def _touch(self, shard):
+        """
+        Make sure a shard is loaded and mark it as most recently used.
+        """
+        if shard not in self._loaded_shards:
+            self._load_shard(shard)
+            self.evict(keep=shard)
+        self._loaded_shards[shard] = time.time()
+        self._loaded_shards.move_to_end(shard)
+
+        held = getattr(self._held, 'shards', None)
+        if held is None:
+            self._unheld.add(shard)
+            return
+        self._unheld.discard(shard)
+        if shard not in held:
+            held.add(shard)
+            self._pins[shard] = self._pins.get(shard, 0) + 1
+
+    def _load_shard(self, shard):
+        """
+        Read the records of a shard file into memory.
+        """
+        path = _files_db_shard_path(shard)
+        if os.path.exists(path):
+            try:
+                shard_files = _read_data_file(path)
+                for file_id, file in shard_files.items():
+                    # Records replaced in memory before the shard was loaded win
+                    self._records.setdefault(file_id, file)
+            except Exception as e:
+                print(f"Error loading files data shard {shard}: {e}")
+        self._loaded_shards[shard] = time.time()
+
+    def evict(self, keep=None):
+        """
+        Drop least recently used shards that no thread holds and that have no unsaved changes.
+        The shard keep, usually the one just loaded, stays. Shards last used without a hold
+        must also have been idle for FILES_DB_CACHE_MIN_IDLE seconds.
+        """
+        if len(self._loaded_shards) <= FILES_DB_CACHE_SHARDS:
+            return
+        with _dirty_lock:
+            if 'files_db' in _dirty_collections:
+                return
+            pinned = {get_files_db_shard(file_id) for file_id in _dirty_files}
+
+        now = time.time()
+        for shard, last_used in list(self._loaded_shards.items()):
+            if len(self._loaded_shards) <= FILES_DB_CACHE_SHARDS:
+                break
+            if shard == keep or shard in pinned or shard in self._pins:
+                continue
+            # Records of a shard used without a hold may still be in use for a while
+            if shard in self._unheld and now - last_used < FILES_DB_CACHE_MIN_IDLE:
+                continue
+            # Summaries can only be rebuilt while the records are loaded
+            self._rebuild_stale_summaries(_shard_members.get(shard, ()))
+            for file_id in _shard_members.get(shard, ()):
+                self._records.pop(file_id, None)
+            del self._loaded_shards[shard]
+            self._unheld.discard(shard)
+
+def _load_files_db_index():
+    """
+    Load the summary index of every shard into a LazyFilesDB.
+    Shards without an index file are loaded once to build it.
+    """
+    global _lazy_files_db
+
+    files_db = LazyFilesDB()
+    missing_index = []
+    summary_fields = set(build_file_summary({}))
+    for shard in range(FILES_DB_SHARDS):
+        index_path = _files_db_index_path(shard)
+        if not os.path.exists(index_path):
+            if os.path.exists(_files_db_shard_path(shard)):
+                missing_index.append(shard)
+            continue
+        try:
+            summaries = _read_data_file(index_path)
+        except Exception as e:
+            print(f"Error loading files index {index_path}: {e}")
+            missing_index.append(shard)
+            continue
+        # Indexes written before a summary field was added are rebuilt
+        if summaries and not summary_fields <= set(next(iter(summaries.values()))):
+            missing_index.append(shard)
+            continue
+        files_db._summaries.update(summaries)
+
+    for shard in missing_index:
+        files_db._load_shard(shard)
+        for file_id, file in files_db._records.items():
+            if get_files_db_shard(file_id) == shard:
+                files_db._summaries[file_id] = build_file_summary(file)
+
+    for file_id in files_db._summaries:
+        _shard_members.setdefault(get_files_db_shard(file_id), set()).add(file_id)
+    for shard in missing_index:
+        # Write the missing index files with the next save
+        for file_id in _shard_members.get(shard, ()):
+            mark_data_changed('files_db', file_id=file_id)
+
+    _lazy_files_db = files_db
+    return files_db
+
 def load_files_db():
     """
-    Load files database from file.
+    Load files database from its shard files, or from the legacy single file.
+    With FILES_DB_LAZY only the summary index is loaded and records load on demand.
     """
+    global _lazy_files_db
+
+    if STORAGE_BACKEND == 'sqlite':
+        return _load_from_sqlite(sqlite_storage.load_files_db, dict, 'files')
+
+    _shard_members.clear()
+    _lazy_files_db = None
+    shard_files = []
+    if os.path.isdir(FILES_DB_DIR):
+        shard_files = sorted(name for name in os.listdir(FILES_DB_DIR) if name.startswith('shard_') and name.endswith('.pkl'))
+
+    # Shards without a file are empty
+    shard_count = _read_files_db_shard_count(shard_files)
+    if shard_count == FILES_DB_SHARDS and FILES_DB_LAZY:
+        return _load_files_db_index()
+
+    if shard_count is not None:
+        files_db = {}
+        for name in shard_files:
+            try:
+                files_db.update(_read_data_file(os.path.join(FILES_DB_DIR, name)))
+            except Exception as e:
+                print(f"Error loading files data shard {name}: {e}")
+        for file_id in files_db:
+            _shard_members.setdefault(get_files_db_shard(file_id), set()).add(file_id)
+        if shard_count != FILES_DB_SHARDS:
+            # The shard count changed, rewrite every shard with the new layout
+            mark_data_changed('files_db')
+        return _to_lazy_files_db(files_db)
+
     if os.path.exists(FILES_DB_FILE):
         try:
-            with open(FILES_DB_FILE, 'rb') as f:
-                return pickle.load(f)
+            files_db = _read_data_file(FILES_DB_FILE)
+            # Convert the legacy single file to shards on the next save
+            mark_data_changed('files_db')
+            return _to_lazy_files_db(files_db)
         except Exception as e:
             print(f"Error loading files data: {e}")
-            return {}
+            return _to_lazy_files_db({})
     else:
-        return {}
+        return _to_lazy_files_db({})
+
+def _to_lazy_files_db(files_db):
+    """
+    Wrap fully loaded records in a LazyFilesDB when lazy loading is enabled.
+    """
+    global _lazy_files_db
+
+    if not FILES_DB_LAZY:
+        return files_db
+    lazy_files_db = LazyFilesDB({file_id: build_file_summary(file) for file_id, file in files_db.items()})
+    lazy_files_db._records.update(files_db)
+    for shard in range(FILES_DB_SHARDS):
+        lazy_files_db._loaded_shards[shard] = time.time()
+    _shard_members.clear()
+    for file_id in files_db:
+        _shard_members.setdefault(get_files_db_shard(file_id), set()).add(file_id)
+    _lazy_files_db = lazy_files_db
+    return lazy_files_db
+
+def _snapshot_files_db_shard(files_db, shard, copy_file_ids=()):
+    """
+    Take (records, summaries) of a shard for writing it, copying the records in copy_file_ids.
+    summaries is the shard's summary index for a lazy files_db, otherwise None.
+    """
+    if isinstance(files_db, LazyFilesDB):
+        records = files_db.shard_records(shard)
+        summaries = {file_id: files_db.get_summary(file_id) for file_id in records}
+    else:
+        records = {}
+        summaries = None
+        for file_id in list(_shard_members.get(shard, ())):
+            file = files_db.get(file_id)
+            if file is None:
+                _shard_members[shard].discard(file_id)
+            else:
+                records[file_id] = file
+    for file_id in copy_file_ids:
+        if file_id in records:
+            records[file_id] = _copy(records[file_id])
+    return records, summaries
+
+def _snapshot_files_db_shards(files_db, file_ids=None):
+    """
+    Take {shard: (records, summaries)} of the shards holding file_ids, copying those files.
+    Without file_ids every shard is taken, sharing its records; for a lazy files_db only
+    its loaded shards, the others are unchanged on disk.
+    """
+    if file_ids is None:
+        if isinstance(files_db, LazyFilesDB):
+            shards = files_db.loaded_shards()
+        else:
+            _shard_members.clear()
+            for file_id in list(files_db):
+                _shard_members.setdefault(get_files_db_shard(file_id), set()).add(file_id)
+            shards = range(FILES_DB_SHARDS)
+        shard_file_ids = {}
+    else:
+        shard_file_ids = {}
+        for file_id in file_ids:
+            shard = get_files_db_shard(file_id)
+            members = _shard_members.setdefault(shard, set())
+            if file_id in files_db:
+                members.add(file_id)
+            else:
+                members.discard(file_id)
+            shard_file_ids.setdefault(shard, []).append(file_id)
+        shards = shard_file_ids
+
+    with _files_db_lock(files_db):
+        return {shard: _snapshot_files_db_shard(files_db, shard, shard_file_ids.get(shard, ())) for shard in shards}
+
+def _serialize_files_db_shard(shard, records, summaries):
+    """
+    Serialize a shard, and its summary index for a lazy files_db, to [(path, bytes)].
+    An empty shard has no files, its bytes are None so the files are removed.
+    """
+    if not records:
+        return [(_files_db_shard_path(shard), None), (_files_db_index_path(shard), None)]
+    serialized = [(_files_db_shard_path(shard), _serialize(records))]
+    if summaries is not None:
+        serialized.append((_files_db_index_path(shard), _serialize(summaries)))
+    return serialized
+
+def _serialize_files_db(files_db, file_ids=None):
+    """
+    Serialize the shards holding file_ids to [(path, bytes)].
+    Without file_ids every shard is serialized; for a lazy files_db only its loaded shards,
+    the others are unchanged on disk.
+    """
+    serialized = []
+    for shard, (records, summaries) in _snapshot_files_db_shards(files_db, file_ids).items():
+        serialized += _serialize_files_db_shard(shard, records, summaries)
+    return serialized
+
+def _remove_stale_files_db_shards():
+    """
+    Remove shard and index files left over from a different shard count.
+    """
+    if not os.path.isdir(FILES_DB_DIR):
+        return
+    for name in os.listdir(FILES_DB_DIR):
+        if name.startswith(('shard_', 'index_')) and name.endswith('.pkl') and int(name[6:-4]) >= FILES_DB_SHARDS:
+            os.remove(os.path.join(FILES_DB_DIR, name))
+
+def _read_files_db_shard_count(shard_files):
+    """
+    Get the shard count of the files_db shards on disk, or None when there are none.
+    Layouts written before empty shards were skipped have no layout file, but a file for
+    every shard.
+    """
+    if os.path.exists(FILES_DB_LAYOUT_FILE):
+        try:
+            return _read_data_file(FILES_DB_LAYOUT_FILE)['shards']
+        except Exception as e:
+            print(f"Error loading files data layout: {e}")
+    return len(shard_files) or None
+
+def _write_files_db_layout():
+    """
+    Record the shard count next to the shards, once the shards have been written.
+    """
+    if _read_files_db_shard_count([]) != FILES_DB_SHARDS:
+        _write_bytes_atomic(FILES_DB_LAYOUT_FILE, _serialize({'shards': FILES_DB_SHARDS}))
 
 def save_files_db(files_db):
     """
-    Save files database to file.
+    Save files database, rewriting every shard file.
+    A lazy files_db only rewrites its loaded shards, the others are unchanged on disk.
     """
     try:
-        with open(FILES_DB_FILE, 'wb') as f:
-            pickle.dump(files_db, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_files_db(files_db)
+            return
+        os.makedirs(FILES_DB_DIR, exist_ok=True)
+        for path, data in _serialize_files_db(files_db):
+            _write_snapshot_file(path, data)
+        _remove_stale_files_db_shards()
+        _write_files_db_layout()
     except Exception as e:
         print(f"Error saving files data: {e}")
 
+def save_files_db_changes(files_db, file_ids):
+    """
+    Save only the given files: their shard files, or their rows in SQLite.
+    """
+    try:
+        if STORAGE_BACKEND == 'sqlite':
+            for file_id in file_ids:
+                file = files_db.get(file_id)
+                if file is None:
+                    sqlite_storage.delete_file(file_id)
+                else:
+                    sqlite_storage.save_file(file_id, file)
+            return
+        os.makedirs(FILES_DB_DIR, exist_ok=True)
+        for path, data in _serialize_files_db(files_db, file_ids):
+            _write_snapshot_file(path, data)
+        _write_files_db_layout()
+    except Exception as e:
+        print(f"Error saving files data: {e}")
+        mark_data_changed('files_db')
+
 def load_steps():
     """
     Load steps list from file.
     """
+    if STORAGE_BACKEND == 'sqlite':
+        return _load_from_sqlite(lambda: sqlite_storage.load_setting('steps'), create_default_steps, 'steps')
     if os.path.exists(STEPS_FILE):
         try:
-            with open(STEPS_FILE, 'rb') as f:
-                return pickle.load(f)
+            return _read_data_file(STEPS_FILE)
         except Exception as e:
             print(f"Error loading steps data: {e}")
             return create_default_steps()
@@ -148,8 +1430,10 @@ def save_steps(steps_list):
     Save steps list to file.
     """
     try:
-        with open(STEPS_FILE, 'wb') as f:
-            pickle.dump(steps_list, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_setting('steps', steps_list)
+            return
+        _write_bytes_atomic(STEPS_FILE, _serialize(steps_list))
     except Exception as e:
         print(f"Error saving steps data: {e}")
 
@@ -157,10 +1441,11 @@ def load_step_assignments():
     """
     Load step assignments from file.
     """
+    if STORAGE_BACKEND == 'sqlite':
+        return _load_from_sqlite(lambda: sqlite_storage.load_setting('step_assignments'), create_default_step_assignments, 'step assignments')
     if os.path.exists(STEP_ASSIGNMENTS_FILE):
         try:
-            with open(STEP_ASSIGNMENTS_FILE, 'rb') as f:
-                return pickle.load(f)
+            return _read_data_file(STEP_ASSIGNMENTS_FILE)
         except Exception as e:
             print(f"Error loading step assignments data: {e}")
             return create_default_step_assignments()
@@ -172,8 +1457,10 @@ def save_step_assignments(step_assignments):
     Save step assignments to file.
     """
     try:
-        with open(STEP_ASSIGNMENTS_FILE, 'wb') as f:
-            pickle.dump(step_assignments, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_setting('step_assignments', step_assignments)
+            return
+        _write_bytes_atomic(STEP_ASSIGNMENTS_FILE, _serialize(step_assignments))
     except Exception as e:
         print(f"Error saving step assignments data: {e}")
 
@@ -184,8 +1471,10 @@ def save_custom_steps(custom_steps_list):
     Save custom steps list to file.
     """
     try:
-        with open(CUSTOM_STEPS_FILE, 'wb') as f:
-            pickle.dump(custom_steps_list, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_setting('custom_steps', custom_steps_list)
+            return
+        _write_bytes_atomic(CUSTOM_STEPS_FILE, _serialize(custom_steps_list))
     except Exception as e:
         print(f"Error saving custom steps data: {e}")
 
@@ -193,10 +1482,11 @@ def load_process_types():
     """
     Load process types list from file.
     """
+    if STORAGE_BACKEND == 'sqlite':
+        return _load_from_sqlite(lambda: sqlite_storage.load_setting('process_types'), create_default_process_types, 'process types')
     if os.path.exists(PROCESS_TYPES_FILE):
         try:
-            with open(PROCESS_TYPES_FILE, 'rb') as f:
-                return pickle.load(f)
+            return _read_data_file(PROCESS_TYPES_FILE)
         except Exception as e:
             print(f"Error loading process types data: {e}")
             return create_default_process_types()
@@ -208,8 +1498,10 @@ def save_process_types(process_types):
     Save process types list to file.
     """
     try:
-        with open(PROCESS_TYPES_FILE, 'wb') as f:
-            pickle.dump(process_types, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_setting('process_types', process_types)
+            return
+        _write_bytes_atomic(PROCESS_TYPES_FILE, _serialize(process_types))
     except Exception as e:
         print(f"Error saving process types data: {e}")
 
@@ -217,10 +1509,11 @@ def load_default_assigned_times():
     """
     Load default assigned times for steps from file.
     """
+    if STORAGE_BACKEND == 'sqlite':
+        return _load_from_sqlite(lambda: sqlite_storage.load_setting('default_assigned_times'), dict, 'default assigned times')
     if os.path.exists(DEFAULT_ASSIGNED_TIMES_FILE):
         try:
-            with open(DEFAULT_ASSIGNED_TIMES_FILE, 'rb') as f:
-                return pickle.load(f)
+            return _read_data_file(DEFAULT_ASSIGNED_TIMES_FILE)
         except Exception as e:
             print(f"Error loading default assigned times data: {e}")
             return {}
@@ -232,35 +1525,66 @@ def save_default_assigned_times(default_assigned_times):
     Save default assigned times for steps to file.
     """
     try:
-        with open(DEFAULT_ASSIGNED_TIMES_FILE, 'wb') as f:
-            pickle.dump(default_assigned_times, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_setting('default_assigned_times', default_assigned_times)
+            return
+        _write_bytes_atomic(DEFAULT_ASSIGNED_TIMES_FILE, _serialize(default_assigned_times))
     except Exception as e:
         print(f"Error saving default assigned times data: {e}")
 
 def load_notifications():
     """
     Load notifications database from file.
+    Each user's notifications are a dict keyed by notification id.
     """
+    if STORAGE_BACKEND == 'sqlite':
+        return _key_notifications_by_id(_load_from_sqlite(sqlite_storage.load_notifications, dict, 'notifications'))
     if os.path.exists(NOTIFICATIONS_FILE):
         try:
-            with open(NOTIFICATIONS_FILE, 'rb') as f:
-                return pickle.load(f)
+            return _key_notifications_by_id(_read_data_file(NOTIFICATIONS_FILE))
         except Exception as e:
             print(f"Error loading notifications data: {e}")
             return {}
     else:
         return {}
 
+def _key_notifications_by_id(notifications_db):
+    """
+    Convert per-user notification lists of the old format to dicts keyed by notification id.
+    """
+    for username, user_notifications in notifications_db.items():
+        if isinstance(user_notifications, list):
+            notifications_db[username] = {notification['id']: notification for notification in user_notifications}
+    return notifications_db
+
 def save_notifications(notifications_db):
     """
     Save notifications database to file.
     """
     try:
-        with open(NOTIFICATIONS_FILE, 'wb') as f:
-            pickle.dump(notifications_db, f)
+        if STORAGE_BACKEND == 'sqlite':
+            sqlite_storage.save_notifications(notifications_db)
+            return
+        _write_bytes_atomic(NOTIFICATIONS_FILE, _serialize(notifications_db))
     except Exception as e:
         print(f"Error saving notifications data: {e}")
 
+def archive_notifications(username, notifications):
+    """
+    Append notifications removed by the retention policy to the archive, one JSON line each.
+    """
+    if not notifications:
+        return
+    archived_at = datetime.now().isoformat()
+    lines = [json.dumps({'username': username, 'archived_at': archived_at, 'notification': notification}, default=str)
+             for notification in notifications]
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with open(NOTIFICATIONS_ARCHIVE_FILE, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+    except Exception as e:
+        print(f"Error archiving notifications: {e}")
+
 def create_default_process_types():
     """
     Create default process types list.
@@ -301,52 +1625,330 @@ def create_default_step_assignments():
 
     return step_assignments
 
+def _backup_timestamp(name):
+    """
+    Get the creation time of a backup folder from its name, or None for other entries.
+    """
+    try:
+        return datetime.strptime(name, "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+def _list_backups():
+    """
+    List (name, timestamp) of all backup folders, newest first.
+    """
+    backups = []
+    for name in os.listdir(BACKUP_DIR):
+        timestamp = _backup_timestamp(name)
+        if timestamp is not None and os.path.isdir(os.path.join(BACKUP_DIR, name)):
+            backups.append((name, timestamp))
+    backups.sort(key=lambda backup: backup[1], reverse=True)
+    return backups
+
+def _read_backup_manifest(name):
+    """
+    Read the {relative path: digest} manifest of a backup folder, or None if it has none.
+    """
+    try:
+        with open(os.path.join(BACKUP_DIR, name, 'manifest.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _backup_object_path(digest):
+    """
+    Get the path of a content-addressed backup object.
+    """
+    return os.path.join(BACKUP_OBJECTS_DIR, digest[:2], digest)
+
+def _store_backup_object(file_path):
+    """
+    Store the content of a data file in the object store and return its digest.
+    Files whose size, modification and change time and inode did not change since the last
+    backup are not read again, unless they were hashed too soon after being written to tell
+    a later write in the same timestamp apart.
+    """
+    stat = os.stat(file_path)
+    file_key = (stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_ctime_ns)
+    cached = _backup_hashes.get(file_path)
+    if (cached and cached[0] == file_key and stat.st_mtime_ns < cached[2] - BACKUP_MTIME_GRANULARITY * 1_000_000_000
+            and os.path.exists(_backup_object_path(cached[1]))):
+        return cached[1]
+    hashed_at = time.time_ns()
+
+    # Hash while copying so the object matches the content that was read
+    os.makedirs(BACKUP_OBJECTS_DIR, exist_ok=True)
+    temp_path = os.path.join(BACKUP_OBJECTS_DIR, f'.{threading.get_ident()}.tmp')
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as src, open(temp_path, 'wb') as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b''):
+            digest.update(chunk)
+            dst.write(chunk)
+    digest = digest.hexdigest()
+
+    object_path = _backup_object_path(digest)
+    if os.path.exists(object_path):
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        os.replace(temp_path, object_path)
+    _backup_hashes[file_path] = (file_key, digest, hashed_at)
+    return digest
+
+def _link_or_copy(source, destination):
+    """
+    Hardlink a backup object into a backup folder, copying it where hardlinks are not supported.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
 def create_backup():
     """
     Create a backup of all data files.
+    Each file is stored once by content hash and hardlinked into the timestamped backup folder.
+    No folder is created when nothing changed since the last backup.
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_folder = os.path.join(BACKUP_DIR, timestamp)
-    os.makedirs(backup_folder, exist_ok=True)
+    global _last_backup_manifest
 
-    # Copy all data files to backup folder
-    for file_path in [USERS_FILE, FILES_DB_FILE, STEPS_FILE, STEP_ASSIGNMENTS_FILE, CUSTOM_STEPS_FILE, PROCESS_TYPES_FILE]:
-        if os.path.exists(file_path):
+    with _backup_lock:
+        data_files = []
+        temp_files = []
+        if STORAGE_BACKEND == 'sqlite':
+            db_copy = os.path.join(BACKUP_DIR, os.path.basename(sqlite_storage.DB_FILE) + '.tmp')
             try:
-                filename = os.path.basename(file_path)
-                backup_path = os.path.join(backup_folder, filename)
-                with open(file_path, 'rb') as src, open(backup_path, 'wb') as dst:
-                    dst.write(src.read())
+                sqlite_storage.backup_to(db_copy)
+                data_files.append((db_copy, os.path.basename(sqlite_storage.DB_FILE)))
+                temp_files.append(db_copy)
+            except Exception as e:
+                print(f"Error creating backup for {sqlite_storage.DB_FILE}: {e}")
+                return
+        else:
+            paths = [USERS_FILE, STEPS_FILE, STEP_ASSIGNMENTS_FILE, CUSTOM_STEPS_FILE, PROCESS_TYPES_FILE,
+                     DEFAULT_ASSIGNED_TIMES_FILE, NOTIFICATIONS_FILE]
+            if os.path.isdir(FILES_DB_DIR):
+                paths += [os.path.join(FILES_DB_DIR, name) for name in sorted(os.listdir(FILES_DB_DIR)) if name.endswith('.pkl')]
+            else:
+                paths.append(FILES_DB_FILE)
+            data_files = [(path, os.path.relpath(path, DATA_DIR)) for path in paths if os.path.exists(path)]
+
+        # Hash every data file into the object store
+        manifest = {}
+        for file_path, relative_path in data_files:
+            try:
+                manifest[relative_path] = _store_backup_object(file_path)
             except Exception as e:
                 print(f"Error creating backup for {file_path}: {e}")
+        for temp_path in temp_files:
+            os.remove(temp_path)
+            _backup_hashes.pop(temp_path, None)
+
+        if _last_backup_manifest is None:
+            backups = _list_backups()
+            _last_backup_manifest = _read_backup_manifest(backups[0][0]) if backups else None
+        if manifest == _last_backup_manifest:
+            return  # Nothing changed since the last backup
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_folder = os.path.join(BACKUP_DIR, timestamp)
+        try:
+            for relative_path, digest in manifest.items():
+                backup_path = os.path.join(backup_folder, relative_path)
+                if os.path.exists(backup_path):
+                    os.remove(backup_path)  # Second backup within the same second
+                _link_or_copy(_backup_object_path(digest), backup_path)
+            with open(os.path.join(backup_folder, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+            _last_backup_manifest = manifest
+        except Exception as e:
+            print(f"Error creating backup {backup_folder}: {e}")
+
+    _start_backup_pruning()
+
+def prune_backups(now=None):
+    """
+    Delete backups outside the retention policy and objects no backup refers to any more.
+    The newest backup is always kept.
+    """
+    now = now or datetime.now()
+
+    with _backup_lock:
+        backups = _list_backups()
+        kept_buckets = set()
+        removed = 0
+        for position, (name, timestamp) in enumerate(backups):
+            age = (now - timestamp).total_seconds()
+            if position == 0 or age <= BACKUP_KEEP_ALL:
+                continue
+            if age <= BACKUP_KEEP_HOURLY:
+                bucket = ('hour', timestamp.strftime("%Y%m%d%H"))
+            elif age <= BACKUP_KEEP_DAILY:
+                bucket = ('day', timestamp.strftime("%Y%m%d"))
+            else:
+                bucket = None
+            # Keep the newest backup of each bucket
+            if bucket is not None and bucket not in kept_buckets:
+                kept_buckets.add(bucket)
+                continue
+            shutil.rmtree(os.path.join(BACKUP_DIR, name), ignore_errors=True)
+            removed += 1
+
+        if not os.path.isdir(BACKUP_OBJECTS_DIR):
+            return removed
+
+        # Remove objects that are no longer part of any backup
+        referenced = set()
+        for name, _ in _list_backups():
+            referenced.update((_read_backup_manifest(name) or {}).values())
+        for prefix in os.listdir(BACKUP_OBJECTS_DIR):
+            prefix_dir = os.path.join(BACKUP_OBJECTS_DIR, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for digest in os.listdir(prefix_dir):
+                if digest not in referenced:
+                    try:
+                        os.remove(os.path.join(prefix_dir, digest))
+                    except OSError as e:
+                        print(f"Error removing backup object {digest}: {e}")
+
+    if removed:
+        print(f"Pruned {removed} old backups")
+    return removed
+
+def _start_backup_pruning():
+    """
+    Prune old backups in a background thread unless a pruning run is in progress.
+    """
+    global _prune_thread
+
+    if _prune_thread is not None and _prune_thread.is_alive():
+        return
+    _prune_thread = threading.Thread(target=prune_backups, daemon=True)
+    _prune_thread.start()
+
+def count_files_in_steps(files_db, steps_list):
+    """
+    Count files per current step.
+    Uses the SQLite index when the backend is in sync with memory, otherwise scans the file summaries.
+    """
+    if STORAGE_BACKEND == 'sqlite' and _files_in_sync():
+        try:
+            return sqlite_storage.count_files_in_steps(steps_list)
+        except Exception as e:
+            print(f"Error counting files in SQLite: {e}")
+
+    step_counts = {step: 0 for step in steps_list}
+    for _, file in get_file_summaries(files_db).items():
+        current_step = file.get('current_step')
+        if current_step in step_counts:
+            step_counts[current_step] += 1
+    return step_counts
+
+def count_files_by_supplier(files_db):
+    """
+    Count files per supplier.
+    Uses the SQLite index when the backend is in sync with memory, otherwise scans the file summaries.
+    """
+    if STORAGE_BACKEND == 'sqlite' and _files_in_sync():
+        try:
+            return sqlite_storage.count_files_by_supplier()
+        except Exception as e:
+            print(f"Error counting suppliers in SQLite: {e}")
+
+    suppliers = {}
+    for _, file in get_file_summaries(files_db).items():
+        supplier = file.get('supplier')
+        if supplier is None:
+            supplier = 'unknown'
+        suppliers[supplier] = suppliers.get(supplier, 0) + 1
+    return suppliers
+
+def get_file_ids_by_supplier(files_db, supplier):
+    """
+    Get the ids of all files from a supplier.
+    Uses the SQLite index when the backend is in sync with memory, otherwise scans the file summaries.
+    """
+    if STORAGE_BACKEND == 'sqlite' and _files_in_sync():
+        try:
+            return [file_id for file_id in sqlite_storage.get_file_ids_by_supplier(supplier) if file_id in files_db]
+        except Exception as e:
+            print(f"Error querying supplier files in SQLite: {e}")
+
+    return [file_id for file_id, file in get_file_summaries(files_db).items() if file.get('supplier') == supplier]
+
+def migrate_pickle_to_sqlite():
+    """
+    Import the existing *.pkl data files into the SQLite database.
+    """
+    global STORAGE_BACKEND
+
+    previous_backend = STORAGE_BACKEND
+    STORAGE_BACKEND = 'pickle'
+    try:
+        users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types = load_data()
+        default_assigned_times = load_default_assigned_times()
+        notifications_db = load_notifications()
+        # Include changes journaled since the last pickle snapshot
+        replay_journal(users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db)
+    finally:
+        STORAGE_BACKEND = previous_backend
+
+    sqlite_storage.save_users(users_db)
+    sqlite_storage.save_files_db(files_db)
+    sqlite_storage.save_setting('steps', steps_list)
+    sqlite_storage.save_setting('step_assignments', step_assignments)
+    sqlite_storage.save_setting('custom_steps', custom_steps_list)
+    sqlite_storage.save_setting('process_types', process_types)
+    sqlite_storage.save_setting('default_assigned_times', default_assigned_times)
+    sqlite_storage.save_notifications(notifications_db)
+    print(f"Migrated {len(users_db)} users, {len(files_db)} files and "
+          f"{sum(len(n) for n in notifications_db.values())} notifications to {sqlite_storage.DB_FILE}")
 
 def start_auto_save(users_db, files_db, steps_list, step_assignments, custom_steps_list=None, process_types=None, default_assigned_times=None, notifications_db=None, interval=60):
     """
     Start auto-save thread that saves data at regular intervals if changes were made.
     """
-    global _auto_save_thread, _stop_auto_save
+    global _auto_save_thread, _stop_auto_save, _journal_thread, _collections
 
     if _auto_save_thread is not None and _auto_save_thread.is_alive():
         return  # Auto-save already running
 
     _stop_auto_save.clear()
+    _collections = _collection_map(users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db)
 
     def auto_save_worker():
         global _data_changed
 
         while not _stop_auto_save.is_set():
-            # Check if data has changed
-            if _data_changed:
-                with _save_lock:
-                    save_data(users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db)
-                    _data_changed = False
-                    print(f"Auto-saved data at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            # Check if data has changed or the journal has grown enough to compact
+            if _data_changed or journal_needs_compaction():
+                # An error must not end the thread, later saves would never happen
+                try:
+                    with _save_lock:
+                        _data_changed = False
+                        save_data(users_db, files_db, steps_list, step_assignments, custom_steps_list, process_types, default_assigned_times, notifications_db, only_dirty=True)
+                        print(f"Auto-saved data at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                except Exception as e:
+                    print(f"Error auto-saving data: {e}")
+                    _data_changed = True
 
             # Wait for the next interval
             _stop_auto_save.wait(interval)
 
+    def journal_sync_worker():
+        while not _stop_auto_save.is_set():
+            sync_journal()
+            _stop_auto_save.wait(JOURNAL_FSYNC_INTERVAL)
+        sync_journal()
+
     _auto_save_thread = threading.Thread(target=auto_save_worker, daemon=True)
     _auto_save_thread.start()
+    if JOURNAL_ENABLED:
+        _journal_thread = threading.Thread(target=journal_sync_worker, daemon=True)
+        _journal_thread.start()
     print(f"Auto-save started with {interval} second interval")
 
 def stop_auto_save():
@@ -359,3 +1961,6 @@ def stop_auto_save():
         _stop_auto_save.set()
         _auto_save_thread.join(timeout=5)
         print("Auto-save stopped")
+    if _journal_thread is not None and _journal_thread.is_alive():
+        _journal_thread.join(timeout=5)
+    sync_journal()
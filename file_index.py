@@ -0,0 +1,210 @@
+"""
+Secondary indexes over the file summaries for the paginated main page.
+
+Every file is indexed by supplier, process type, current step, status and whether its
+current step is overdue: {field: {value: set(file_ids)}}. Filtering intersects the sets of
+the chosen values, smallest first, and the facet counts shown in the filter dropdowns are
+the sizes of the sets. The indexes are updated per changed file, like the statistics totals,
+so a page only sorts the files that match its filters.
+"""
+import heapq
+import threading
+
+import data_manager
+
+# Fields files can be filtered by
+INDEX_FIELDS = ('supplier', 'process_type', 'current_step', 'status', 'overdue')
+
+# Page sizes offered on the main page
+PAGE_SIZES = (25, 50, 100, 200)
+DEFAULT_PAGE_SIZE = 50
+
+def _text(value):
+    return (value or '').lower()
+
+def _created(summary):
+    return summary.get('creation_epoch') or summary.get('first_update_epoch') or 0
+
+def _creation_order(file_id, summary):
+    # The default order and the tie-break of the sorts, stable across restarts and shard order
+    return (_created(summary), file_id)
+
+def _total_time(summary):
+    created = summary.get('creation_epoch') or summary.get('first_update_epoch')
+    last_update = summary.get('last_update_epoch')
+    return last_update - created if created and last_update else -1
+
+# Sort keys of the main page columns
+SORT_KEYS = {
+    'supplier': lambda summary: _text(summary.get('supplier')),
+    'process_type': lambda summary: _text(summary.get('process_type')),
+    'filename': lambda summary: _text(summary.get('original_filename')),
+    'current_step': lambda summary: _text(summary.get('current_step')),
+    'created': _created,
+    'last_update': lambda summary: summary.get('last_update_epoch') or 0,
+    'total_time': _total_time,
+    'step_time': lambda summary: (summary.get('current_step_time') or {}).get('total_time_worked', 0),
+    'status': lambda summary: bool(summary.get('is_completed'))
+}
+
+# Index state
+_lock = threading.RLock()
+_summaries = {}  # {file_id: summary}
+_file_values = {}  # {file_id: {field: value}} the file is indexed under
+_indexes = {field: {} for field in INDEX_FIELDS}  # {field: {value: set(file_ids)}}
+_restricted = set()  # Files whose current step is assigned to specific users
+_changed_files = set()
+_rebuild_needed = True
+
+def index_values(summary):
+    """
+    Get the indexed value of each field of a file, {field: value}, from its summary.
+    Files without a current step are not indexed by it.
+    """
+    values = {
+        'supplier': summary.get('supplier') or 'Unknown',
+        'process_type': summary.get('process_type') or 'Unknown',
+        'status': 'Completed' if summary.get('is_completed') else 'In Progress',
+        'overdue': bool(summary.get('is_overdue'))
+    }
+    if summary.get('current_step'):
+        values['current_step'] = summary['current_step']
+    return values
+
+def _add_file(file_id, summary):
+    """
+    Add a file to the indexes.
+    """
+    _summaries[file_id] = summary
+    values = _file_values[file_id] = index_values(summary)
+    for field, value in values.items():
+        _indexes[field].setdefault(value, set()).add(file_id)
+    if summary.get('current_step_users') is not None:
+        _restricted.add(file_id)
+
+def _remove_file(file_id):
+    """
+    Remove a file from the indexes, dropping values left without files.
+    """
+    _summaries.pop(file_id, None)
+    values = _file_values.pop(file_id, None)
+    if values is None:
+        return
+    for field, value in values.items():
+        file_ids = _indexes[field].get(value)
+        if file_ids is not None:
+            file_ids.discard(file_id)
+            if not file_ids:
+                del _indexes[field][value]
+    _restricted.discard(file_id)
+
+def mark_file_changed(file_id=None):
+    """
+    Note that a file changed, or any file when file_id is None.
+    Registered as a data_manager file change listener.
+    """
+    global _rebuild_needed
+    with _lock:
+        if file_id is None:
+            _rebuild_needed = True
+        else:
+            _changed_files.add(file_id)
+
+def _update_indexes(files_db):
+    """
+    Bring the indexes up to date with the files changed since the last update.
+    """
+    global _rebuild_needed
+    if _rebuild_needed:
+        _summaries.clear()
+        _file_values.clear()
+        for values in _indexes.values():
+            values.clear()
+        _restricted.clear()
+        _changed_files.clear()
+        _rebuild_needed = False
+        for file_id, summary in data_manager.get_file_summaries(files_db).items():
+            _add_file(file_id, summary)
+        print(f"[FILE INDEX] Indexed {len(_summaries)} files")
+        return
+
+    changed_files = list(_changed_files)
+    _changed_files.clear()
+    for file_id in changed_files:
+        _remove_file(file_id)
+        summary = data_manager.get_file_summary(files_db, file_id)
+        if summary is not None:
+            _add_file(file_id, summary)
+
+def get_facets(files_db):
+    """
+    Get the number of files per value of each field, {field: {value: count}}, sorted by value.
+    """
+    with _lock:
+        _update_indexes(files_db)
+        return {field: {value: len(file_ids) for value, file_ids in sorted(_indexes[field].items(), key=lambda item: str(item[0]).lower())}
+                for field in INDEX_FIELDS}
+
+def query_files(files_db, filters=None, assigned_to=None, assigned_steps=(), sort=None, descending=False, page=1, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Get one page of the files matching filters ({field: value}), sorted by a SORT_KEYS key
+    or by creation time, ties broken by creation time and then file ID. With assigned_to, only files whose current step is one of
+    assigned_steps and, where the file narrows its assignment, is assigned to that user.
+    Returns {'summaries': {file_id: summary}, 'total', 'page', 'pages', 'per_page'}.
+    """
+    per_page = max(1, per_page)
+    with _lock:
+        _update_indexes(files_db)
+
+        candidates = []
+        for field, value in (filters or {}).items():
+            candidates.append(_indexes[field].get(value, set()))
+        if assigned_to is not None:
+            step_files = set()
+            for step in assigned_steps:
+                step_files |= _indexes['current_step'].get(step, set())
+            candidates.append(step_files)
+
+        if candidates:
+            candidates.sort(key=len)
+            matches = set(candidates[0])
+            for file_ids in candidates[1:]:
+                matches &= file_ids
+        else:
+            matches = set(_summaries)
+        if assigned_to is not None:
+            matches -= {file_id for file_id in matches & _restricted if assigned_to not in _summaries[file_id]['current_step_users']}
+
+        total = len(matches)
+        pages = max(1, (total + per_page - 1) // per_page)
+        page = min(max(1, page), pages)
+        end = page * per_page
+
+        # Ties keep the creation order
+        creation_order = lambda file_id: _creation_order(file_id, _summaries[file_id])
+        if sort in SORT_KEYS:
+            sort_key = SORT_KEYS[sort]
+            if descending:
+                ordered = sorted(matches, key=creation_order)
+                ordered.sort(key=lambda file_id: sort_key(_summaries[file_id]), reverse=True)
+                ordered = ordered[:end]
+            else:
+                key = lambda file_id: (sort_key(_summaries[file_id]), creation_order(file_id))
+                ordered = heapq.nsmallest(end, matches, key=key) if end < total else sorted(matches, key=key)
+        else:
+            key = creation_order
+            if descending:
+                ordered = heapq.nlargest(end, matches, key=key) if end < total else sorted(matches, key=key, reverse=True)
+            else:
+                ordered = heapq.nsmallest(end, matches, key=key) if end < total else sorted(matches, key=key)
+
+        page_ids = ordered[(page - 1) * per_page:end]
+        return {
+            'summaries': {file_id: _summaries[file_id] for file_id in page_ids},
+            'total': total,
+            'page': page,
+            'pages': pages,
+            'per_page': per_page
+        }
+
+data_manager.add_file_change_listener(mark_file_changed)
@@ -0,0 +1,551 @@
+"""
+Statistics for the /statistics page.
+
+compute_statistics() walks every file and step status. get_statistics() answers from
+totals that are kept up to date as files change: each file's contribution to the totals
+is remembered, and when a file changes its old contribution is subtracted and the new one,
+built from its summary, added. Reading the statistics then costs O(steps + users + suppliers)
+plus the files changed since the last read.
+
+The completed steps are also kept in hourly rollup buckets per step, user, supplier and
+process type, so get_range_statistics() answers a date range by summing the buckets in it.
+Their durations are counted in quantile sketches per step and supplier for
+get_duration_statistics().
+"""
+import bisect
+import threading
+
+import data_manager
+from sketches import DurationSketch
+
+# Aggregator state: the totals, what each file added to them and the files changed since
+_lock = threading.RLock()
+_totals = {}  # {group: {key: {field: amount}}}
+_contributions = {}  # {file_id: {(group, key): {field: amount}}}
+_changed_files = set()
+_rebuild_needed = True
+_totals_steps = None  # The global steps the totals were built with
+
+# Completions rolled up per hour: {bucket start epoch: {(dimension, name): {field: amount}}}
+ROLLUP_BUCKET_SECONDS = 3600
+ROLLUP_DIMENSIONS = ('step', 'user', 'supplier', 'process_type')
+_rollups = {}
+_rollup_buckets = []  # Sorted bucket start epochs in _rollups
+_file_rollups = {}  # {file_id: {(bucket, dimension, name): {field: amount}}}
+
+# Completed step durations: {dimension: {name: DurationSketch}}
+DURATION_DIMENSIONS = ('step', 'supplier')
+_duration_sketches = {dimension: {} for dimension in DURATION_DIMENSIONS}
+_file_durations = {}  # {file_id: [(dimension, name, minutes)]}
+
+def new_statistics(file_count, users_db, steps, step_assignments):
+    """
+    Create the statistics dict with every counter at zero.
+    """
+    stats = {
+        'total_files': file_count,
+        'total_users': len(users_db),
+        'total_steps': len(steps),
+        'user_stats': {},
+        'step_stats': {},
+        'supplier_stats': {},
+        'process_type_stats': {},
+        'overdue_stats': {
+            'total_overdue_files': 0,
+            'total_overdue_steps': 0,
+            'overdue_by_step': {},
+            'overdue_by_user': {}
+        },
+        'time_stats': {
+            'total_time_worked': 0,
+            'average_time_per_file': 0,
+            'average_time_per_step': 0
+        },
+        'file_distribution': {
+            'by_step': {},
+            'by_status': {'Not Started': 0, 'In Progress': 0, 'Completed': 0}
+        }
+    }
+
+    # Initialize step statistics
+    for step in steps:
+        stats['step_stats'][step] = {
+            'total_files': 0,
+            'completed_files': 0,
+            'in_progress_files': 0,
+            'not_started_files': 0,
+            'total_time_worked': 0,
+            'average_time': 0,
+            'overdue_files': 0,
+            'assigned_users': len(step_assignments.get(step, []))
+        }
+        stats['file_distribution']['by_step'][step] = 0
+        stats['overdue_stats']['overdue_by_step'][step] = 0
+
+    # Initialize user statistics
+    for username in users_db:
+        stats['user_stats'][username] = {
+            'total_files_worked': 0,
+            'total_time_worked': 0,
+            'average_time_per_file': 0,
+            'completed_steps': 0,
+            'in_progress_steps': 0,
+            'overdue_steps': 0,
+            'assigned_steps': users_db[username].get('roles', [])
+        }
+        stats['overdue_stats']['overdue_by_user'][username] = 0
+
+    return stats
+
+def finish_statistics(stats):
+    """
+    Calculate the averages from the summed counters.
+    """
+    # Calculate averages
+    if stats['total_files'] > 0:
+        stats['time_stats']['average_time_per_file'] = stats['time_stats']['total_time_worked'] / stats['total_files']
+
+    # Calculate step averages
+    for step, step_data in stats['step_stats'].items():
+        if step_data['total_files'] > 0:
+            step_data['average_time'] = step_data['total_time_worked'] / step_data['total_files']
+
+    # Calculate user averages
+    for username, user_data in stats['user_stats'].items():
+        files_worked = user_data['completed_steps'] + user_data['in_progress_steps']
+        user_data['total_files_worked'] = files_worked
+        if files_worked > 0:
+            user_data['average_time_per_file'] = user_data['total_time_worked'] / files_worked
+
+    # Calculate supplier averages
+    for supplier, supplier_data in stats['supplier_stats'].items():
+        if supplier_data['total_files'] > 0:
+            supplier_data['average_time'] = supplier_data['total_time_worked'] / supplier_data['total_files']
+
+    # Calculate process type averages
+    for process_type, pt_data in stats['process_type_stats'].items():
+        if pt_data['total_files'] > 0:
+            pt_data['average_time'] = pt_data['total_time_worked'] / pt_data['total_files']
+
+    return stats
+
+def compute_statistics(files_db, users_db, steps, step_assignments):
+    """
+    Calculate the statistics by walking every file and step status.
+    """
+    stats = new_statistics(len(files_db), users_db, steps, step_assignments)
+
+    # Process each file for statistics
+    for file_id, file in files_db.items():
+        current_step = file.get('current_step')
+        supplier = file.get('supplier', 'Unknown')
+        process_type = file.get('process_type', 'Unknown')
+
+        # Supplier statistics
+        if supplier not in stats['supplier_stats']:
+            stats['supplier_stats'][supplier] = {
+                'total_files': 0,
+                'total_time_worked': 0,
+                'average_time': 0,
+                'overdue_files': 0
+            }
+        stats['supplier_stats'][supplier]['total_files'] += 1
+
+        # Process type statistics
+        if process_type not in stats['process_type_stats']:
+            stats['process_type_stats'][process_type] = {
+                'total_files': 0,
+                'total_time_worked': 0,
+                'average_time': 0
+            }
+        stats['process_type_stats'][process_type]['total_files'] += 1
+
+        # File distribution by current step
+        if current_step:
+            stats['file_distribution']['by_step'][current_step] = stats['file_distribution']['by_step'].get(current_step, 0) + 1
+
+        # Check if file has any overdue steps
+        file_has_overdue = False
+
+        # Process step statuses for this file
+        step_statuses = file.get('step_statuses', {})
+        for step, step_data in step_statuses.items():
+            if isinstance(step_data, dict):
+                status = step_data.get('status', 'Not Started')
+                total_time_worked = step_data.get('total_time_worked', 0)
+                is_overdue = step_data.get('is_overdue', False)
+                updated_by = step_data.get('updated_by')
+
+                # Update step statistics
+                if step in stats['step_stats']:
+                    stats['step_stats'][step]['total_files'] += 1
+                    stats['step_stats'][step]['total_time_worked'] += total_time_worked
+
+                    if status == 'Completed':
+                        stats['step_stats'][step]['completed_files'] += 1
+                        stats['file_distribution']['by_status']['Completed'] += 1
+                    elif status == 'In Progress':
+                        stats['step_stats'][step]['in_progress_files'] += 1
+                        stats['file_distribution']['by_status']['In Progress'] += 1
+                    else:
+                        stats['step_stats'][step]['not_started_files'] += 1
+                        stats['file_distribution']['by_status']['Not Started'] += 1
+
+                    if is_overdue:
+                        stats['step_stats'][step]['overdue_files'] += 1
+                        stats['overdue_stats']['overdue_by_step'][step] += 1
+                        stats['overdue_stats']['total_overdue_steps'] += 1
+                        file_has_overdue = True
+
+                # Update user statistics
+                if updated_by and updated_by in stats['user_stats']:
+                    stats['user_stats'][updated_by]['total_time_worked'] += total_time_worked
+
+                    if status == 'Completed':
+                        stats['user_stats'][updated_by]['completed_steps'] += 1
+                    elif status == 'In Progress':
+                        stats['user_stats'][updated_by]['in_progress_steps'] += 1
+
+                    if is_overdue:
+                        stats['user_stats'][updated_by]['overdue_steps'] += 1
+                        stats['overdue_stats']['overdue_by_user'][updated_by] += 1
+
+                # Update total time statistics
+                stats['time_stats']['total_time_worked'] += total_time_worked
+
+                # Update supplier time statistics
+                stats['supplier_stats'][supplier]['total_time_worked'] += total_time_worked
+
+                # Update process type time statistics
+                stats['process_type_stats'][process_type]['total_time_worked'] += total_time_worked
+
+        # Count files with overdue steps
+        if file_has_overdue:
+            stats['overdue_stats']['total_overdue_files'] += 1
+            stats['supplier_stats'][supplier]['overdue_files'] += 1
+
+    return finish_statistics(stats)
+
+def file_contribution(summary, steps):
+    """
+    Get what a file adds to the totals, {(group, key): {field: amount}}, from its summary.
+    Only overdue steps in steps count towards the overdue files.
+    """
+    contribution = {}
+
+    def add(group, key, field, amount=1):
+        fields = contribution.setdefault((group, key), {})
+        fields[field] = fields.get(field, 0) + amount
+
+    supplier = summary['supplier'] if summary.get('supplier') is not None else 'Unknown'
+    process_type = summary['process_type'] if summary.get('process_type') is not None else 'Unknown'
+    file_time_worked = 0
+    file_has_overdue = False
+
+    for step, status, total_time_worked, is_overdue, updated_by in summary.get('step_stats') or ():
+        add('steps', step, 'total_files')
+        add('steps', step, 'total_time_worked', total_time_worked)
+        if status == 'Completed':
+            add('steps', step, 'completed_files')
+        elif status == 'In Progress':
+            add('steps', step, 'in_progress_files')
+        else:
+            add('steps', step, 'not_started_files')
+        if is_overdue:
+            add('steps', step, 'overdue_files')
+            if step in steps:
+                file_has_overdue = True
+
+        if updated_by:
+            add('users', updated_by, 'total_time_worked', total_time_worked)
+            if status == 'Completed':
+                add('users', updated_by, 'completed_steps')
+            elif status == 'In Progress':
+                add('users', updated_by, 'in_progress_steps')
+            if is_overdue:
+                add('users', updated_by, 'overdue_steps')
+
+        file_time_worked += total_time_worked
+
+    add('suppliers', supplier, 'total_files')
+    add('suppliers', supplier, 'total_time_worked', file_time_worked)
+    add('process_types', process_type, 'total_files')
+    add('process_types', process_type, 'total_time_worked', file_time_worked)
+    if file_has_overdue:
+        add('suppliers', supplier, 'overdue_files')
+        add('files', None, 'overdue_files')
+    add('files', None, 'total_time_worked', file_time_worked)
+    if summary.get('current_step'):
+        add('current_steps', summary['current_step'], 'files')
+    return contribution
+
+def file_rollup_contribution(summary):
+    """
+    Get what a file adds to the rollups, {(bucket, dimension, name): {field: amount}},
+    from the completed steps in its summary.
+    """
+    contribution = {}
+    supplier = summary['supplier'] if summary.get('supplier') is not None else 'Unknown'
+    process_type = summary['process_type'] if summary.get('process_type') is not None else 'Unknown'
+
+    for completed_at, step, user, time_worked, is_overdue in summary.get('completions') or ():
+        bucket = completed_at - completed_at % ROLLUP_BUCKET_SECONDS
+        for dimension, name in (('step', step), ('user', user or 'Unknown'), ('supplier', supplier), ('process_type', process_type)):
+            fields = contribution.setdefault((bucket, dimension, name), {'completions': 0, 'time_worked': 0, 'overdue': 0})
+            fields['completions'] += 1
+            fields['time_worked'] += time_worked
+            if is_overdue:
+                fields['overdue'] += 1
+    return contribution
+
+def _apply_rollup_contribution(contribution, sign):
+    """
+    Add (sign 1) or subtract (sign -1) a file's contribution to the rollups.
+    Entries and buckets that drop to zero are removed.
+    """
+    for (bucket, dimension, name), fields in contribution.items():
+        if bucket not in _rollups:
+            _rollups[bucket] = {}
+            bisect.insort(_rollup_buckets, bucket)
+        entry = _rollups[bucket].setdefault((dimension, name), {})
+        for field, amount in fields.items():
+            entry[field] = entry.get(field, 0) + sign * amount
+        if not any(entry.values()):
+            del _rollups[bucket][(dimension, name)]
+            if not _rollups[bucket]:
+                del _rollups[bucket]
+                del _rollup_buckets[bisect.bisect_left(_rollup_buckets, bucket)]
+
+def file_durations(summary):
+    """
+    Get the completed step durations of a file, [(dimension, name, minutes)], from its summary.
+    """
+    supplier = summary['supplier'] if summary.get('supplier') is not None else 'Unknown'
+    durations = []
+    for completed_at, step, user, time_worked, is_overdue in summary.get('completions') or ():
+        durations.append(('step', step, time_worked))
+        durations.append(('supplier', supplier, time_worked))
+    return durations
+
+def _apply_durations(durations, sign):
+    """
+    Count (sign 1) or uncount (sign -1) a file's durations in the sketches.
+    Sketches left without durations are removed.
+    """
+    for dimension, name, minutes in durations:
+        sketches = _duration_sketches[dimension]
+        sketch = sketches.get(name)
+        if sketch is None:
+            sketch = sketches[name] = DurationSketch()
+        sketch.add(minutes, sign)
+        if sketch.count <= 0:
+            del sketches[name]
+
+def _add_file(file_id, summary, step_names):
+    """
+    Add a file to the totals and rollups.
+    """
+    contribution = file_contribution(summary, step_names)
+    _contributions[file_id] = contribution
+    _apply_contribution(contribution, 1)
+    rollup_contribution = file_rollup_contribution(summary)
+    if rollup_contribution:
+        _file_rollups[file_id] = rollup_contribution
+        _apply_rollup_contribution(rollup_contribution, 1)
+    durations = file_durations(summary)
+    if durations:
+        _file_durations[file_id] = durations
+        _apply_durations(durations, 1)
+
+def _remove_file(file_id):
+    """
+    Subtract a file's old contribution from the totals and rollups.
+    """
+    old_contribution = _contributions.pop(file_id, None)
+    if old_contribution is not None:
+        _apply_contribution(old_contribution, -1)
+    old_rollup_contribution = _file_rollups.pop(file_id, None)
+    if old_rollup_contribution is not None:
+        _apply_rollup_contribution(old_rollup_contribution, -1)
+    old_durations = _file_durations.pop(file_id, None)
+    if old_durations is not None:
+        _apply_durations(old_durations, -1)
+
+def _apply_contribution(contribution, sign):
+    """
+    Add (sign 1) or subtract (sign -1) a file's contribution to the totals.
+    Entries whose counters all drop to zero are removed.
+    """
+    for (group, key), fields in contribution.items():
+        entry = _totals.setdefault(group, {}).setdefault(key, {})
+        for field, amount in fields.items():
+            entry[field] = entry.get(field, 0) + sign * amount
+        if not any(entry.values()):
+            del _totals[group][key]
+
+def mark_file_changed(file_id=None):
+    """
+    Note that a file changed, or any file when file_id is None.
+    Registered as a data_manager file change listener.
+    """
+    global _rebuild_needed
+    with _lock:
+        if file_id is None:
+            _rebuild_needed = True
+        else:
+            _changed_files.add(file_id)
+
+def _update_totals(files_db, steps):
+    """
+    Bring the totals up to date with the files changed since the last update.
+    """
+    global _rebuild_needed, _totals_steps
+
+    # The overdue file counts depend on the global steps
+    if _rebuild_needed or _totals_steps != tuple(steps):
+        _totals.clear()
+        _contributions.clear()
+        _rollups.clear()
+        _rollup_buckets.clear()
+        _file_rollups.clear()
+        for sketches in _duration_sketches.values():
+            sketches.clear()
+        _file_durations.clear()
+        _changed_files.clear()
+        _rebuild_needed = False
+        _totals_steps = tuple(steps)
+        step_names = set(steps)
+        for file_id, summary in data_manager.get_file_summaries(files_db).items():
+            _add_file(file_id, summary, step_names)
+        print(f"[STATISTICS] Built statistics totals for {len(_contributions)} files and {len(_rollup_buckets)} rollup buckets")
+        return
+
+    step_names = set(steps)
+    while _changed_files:
+        file_id = _changed_files.pop()
+        _remove_file(file_id)
+        summary = data_manager.get_file_summary(files_db, file_id)
+        if summary is not None:
+            _add_file(file_id, summary, step_names)
+
+def get_statistics(files_db, users_db, steps, step_assignments):
+    """
+    Get the same statistics as compute_statistics() from the maintained totals.
+    """
+    with _lock:
+        _update_totals(files_db, steps)
+        stats = new_statistics(len(files_db), users_db, steps, step_assignments)
+
+        for step, counts in _totals.get('steps', {}).items():
+            if step not in stats['step_stats']:
+                continue
+            step_data = stats['step_stats'][step]
+            for field in ('total_files', 'completed_files', 'in_progress_files', 'not_started_files', 'total_time_worked', 'overdue_files'):
+                step_data[field] = counts.get(field, 0)
+            stats['file_distribution']['by_status']['Completed'] += step_data['completed_files']
+            stats['file_distribution']['by_status']['In Progress'] += step_data['in_progress_files']
+            stats['file_distribution']['by_status']['Not Started'] += step_data['not_started_files']
+            stats['overdue_stats']['overdue_by_step'][step] = step_data['overdue_files']
+            stats['overdue_stats']['total_overdue_steps'] += step_data['overdue_files']
+
+        for username, counts in _totals.get('users', {}).items():
+            if username not in stats['user_stats']:
+                continue
+            user_data = stats['user_stats'][username]
+            for field in ('total_time_worked', 'completed_steps', 'in_progress_steps', 'overdue_steps'):
+                user_data[field] = counts.get(field, 0)
+            stats['overdue_stats']['overdue_by_user'][username] = user_data['overdue_steps']
+
+        for supplier, counts in _totals.get('suppliers', {}).items():
+            stats['supplier_stats'][supplier] = {
+                'total_files': counts.get('total_files', 0),
+                'total_time_worked': counts.get('total_time_worked', 0),
+                'average_time': 0,
+                'overdue_files': counts.get('overdue_files', 0)
+            }
+
+        for process_type, counts in _totals.get('process_types', {}).items():
+            stats['process_type_stats'][process_type] = {
+                'total_files': counts.get('total_files', 0),
+                'total_time_worked': counts.get('total_time_worked', 0),
+                'average_time': 0
+            }
+
+        for step, counts in _totals.get('current_steps', {}).items():
+            stats['file_distribution']['by_step'][step] = counts['files']
+
+        file_counts = _totals.get('files', {}).get(None, {})
+        stats['time_stats']['total_time_worked'] = file_counts.get('total_time_worked', 0)
+        stats['overdue_stats']['total_overdue_files'] = file_counts.get('overdue_files', 0)
+
+    return finish_statistics(stats)
+
+def get_range_statistics(files_db, steps, start_epoch, end_epoch):
+    """
+    Get the completed steps between start_epoch and end_epoch (exclusive), summed from the
+    rollup buckets starting in that range, per dimension and in total.
+    """
+    range_stats = {dimension: {} for dimension in ROLLUP_DIMENSIONS}
+    with _lock:
+        _update_totals(files_db, steps)
+        first = bisect.bisect_left(_rollup_buckets, start_epoch - start_epoch % ROLLUP_BUCKET_SECONDS)
+        last = bisect.bisect_left(_rollup_buckets, end_epoch)
+        for bucket in _rollup_buckets[first:last]:
+            for (dimension, name), fields in _rollups[bucket].items():
+                entry = range_stats[dimension].setdefault(name, {'completions': 0, 'time_worked': 0, 'overdue': 0, 'average_time': 0})
+                for field, amount in fields.items():
+                    entry[field] += amount
+
+    # Every completion is counted once per dimension, so the step sums are the totals
+    range_stats['total'] = {'completions': 0, 'time_worked': 0, 'overdue': 0, 'average_time': 0}
+    for entry in range_stats['step'].values():
+        for field in ('completions', 'time_worked', 'overdue'):
+            range_stats['total'][field] += entry[field]
+    for entries in [range_stats[dimension] for dimension in ROLLUP_DIMENSIONS] + [{None: range_stats['total']}]:
+        for entry in entries.values():
+            if entry['completions'] > 0:
+                entry['average_time'] = entry['time_worked'] / entry['completions']
+    return range_stats
+
+def get_duration_statistics(files_db, steps):
+    """
+    Get the count, p50, p90, p99 and histogram of the completed step durations (minutes)
+    per step and supplier. The quantiles are within the sketches' relative accuracy.
+    """
+    # Steps come in pipeline order, everything else by name
+    order = {step: index for index, step in enumerate(steps)}
+    with _lock:
+        _update_totals(files_db, steps)
+        return {dimension: {name: sketch.summary() for name, sketch in sorted(_duration_sketches[dimension].items(), key=lambda item: (order.get(item[0], len(order)), str(item[0])))}
+                for dimension in DURATION_DIMENSIONS}
+
+def statistics_differences(expected, actual, path=''):
+    """
+    List the paths at which two statistics dicts differ.
+    """
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in set(expected) | set(actual):
+            differences.extend(statistics_differences(expected.get(key), actual.get(key), f'{path}/{key}'))
+        return differences
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)) and not isinstance(expected, bool):
+        return [] if abs(expected - actual) < 1e-9 else [path]
+    return [] if expected == actual else [path]
+
+def verify_statistics(files_db, users_db, steps, step_assignments):
+    """
+    Recompute the statistics from every file and compare them with the maintained totals.
+    The totals are rebuilt afterwards. Returns (recomputed statistics, differing paths).
+    """
+    with _lock:
+        maintained = get_statistics(files_db, users_db, steps, step_assignments)
+        recomputed = compute_statistics(files_db, users_db, steps, step_assignments)
+        mark_file_changed()
+    differences = statistics_differences(recomputed, maintained)
+    if differences:
+        print(f"[STATISTICS] Maintained statistics differed at {len(differences)} places: {sorted(differences)[:10]}")
+    else:
+        print("[STATISTICS] Maintained statistics match the recomputed ones")
+    return recomputed, differences
+
+data_manager.add_file_change_listener(mark_file_changed)
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Import the existing pickle data files into the SQLite database.
+
+Run this once before setting STORAGE_BACKEND = 'sqlite' in data_manager.py.
+"""
+
+import data_manager
+
+if __name__ == "__main__":
+    data_manager.migrate_pickle_to_sqlite()
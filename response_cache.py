@@ -0,0 +1,107 @@
+"""
+Single-flight cache for the results of expensive GET endpoints.
+
+Results are cached per key together with the data generation they were computed for
+(data_manager.get_data_generation()), and served until any data changes. Concurrent
+requests for a key that is being computed wait for that computation instead of starting
+their own, so a burst of identical requests costs one computation.
+"""
+import threading
+
+import data_manager
+
+# Cached results kept at most; results of older generations are dropped first
+MAX_ENTRIES = 256
+
+_lock = threading.Lock()
+_entries = {}  # {key: (generation, value)}
+_in_flight = {}  # {key: computation dict of the request computing it}
+_stats = {}  # {endpoint: {'hits', 'misses', 'coalesced', 'errors'}}
+
+def _count(key, counter):
+    """
+    Count a cache event for the endpoint of key (its first item).
+    """
+    endpoint = key[0] if isinstance(key, tuple) else key
+    counters = _stats.setdefault(endpoint, {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0})
+    counters[counter] += 1
+
+def _store(key, generation, value):
+    """
+    Cache a value, making room by dropping stale and then the oldest entries.
+    A value computed for an older generation than the cached one is not kept.
+    """
+    entry = _entries.pop(key, None)
+    if entry is not None and entry[0] > generation:
+        _entries[key] = entry
+        return
+    _entries[key] = (generation, value)
+    if len(_entries) > MAX_ENTRIES:
+        current = data_manager.get_data_generation()
+        for stale_key in [stale_key for stale_key, (entry_generation, _) in _entries.items() if entry_generation != current]:
+            del _entries[stale_key]
+        while len(_entries) > MAX_ENTRIES:
+            del _entries[next(iter(_entries))]
+
+def get_or_compute(key, compute):
+    """
+    Get the cached result for key if no data changed since it was computed, otherwise
+    compute() it, sharing one computation between concurrent callers.
+    The result is shared between requests and must not be modified.
+    """
+    generation = data_manager.get_data_generation()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == generation:
+            _count(key, 'hits')
+            return entry[1]
+
+        computation = _in_flight.get(key)
+        if computation is not None and computation['generation'] == generation:
+            _count(key, 'coalesced')
+            leader = False
+        else:
+            computation = {'generation': generation, 'done': threading.Event(), 'value': None, 'error': None}
+            _in_flight[key] = computation
+            _count(key, 'misses')
+            leader = True
+
+    if not leader:
+        computation['done'].wait()
+        if computation['error'] is not None:
+            raise computation['error']
+        return computation['value']
+
+    try:
+        computation['value'] = compute()
+    except Exception as e:
+        computation['error'] = e
+        raise
+    finally:
+        with _lock:
+            if _in_flight.get(key) is computation:
+                del _in_flight[key]
+            if computation['error'] is None:
+                _store(key, generation, computation['value'])
+            else:
+                _count(key, 'errors')
+        computation['done'].set()
+    return computation['value']
+
+def get_cache_stats():
+    """
+    Get the hit and miss counters, per endpoint and in total.
+    """
+    with _lock:
+        endpoints = {endpoint: dict(counters) for endpoint, counters in _stats.items()}
+        totals = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+        for counters in endpoints.values():
+            for counter, value in counters.items():
+                totals[counter] += value
+        return {
+            'generation': data_manager.get_data_generation(),
+            'entries': len(_entries),
+            'in_flight': len(_in_flight),
+            **totals,
+            'endpoints': endpoints
+        }
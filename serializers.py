@@ -0,0 +1,298 @@
+import json
+import pickle
+import struct
+from datetime import datetime
+
+# Serialized data is recognised by its first bytes, so files written with one
+# serializer can still be loaded after switching to another:
+# - pickle (protocol 2+) starts with b'\x80'
+# - the compact binary format starts with BINARY_MAGIC
+# - JSON Lines starts with its '{' header line
+BINARY_MAGIC = b'PMSB\x01'
+JSONL_FORMAT = 'pms-jsonl'
+
+# Strings up to this length are written once and referred to by index afterwards
+# (dict keys, step names, statuses, usernames, timestamps)
+BINARY_INTERN_MAX_LENGTH = 40
+
+# Binary format tags
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_FLOAT = 4
+_STR_NEW = 5
+_STR_REF = 6
+_LIST = 7
+_SHAPE_NEW = 8
+_SHAPE_REF = 9
+_DICT = 10
+_BYTES = 11
+_PICKLE = 12
+_STR_RAW = 13
+
+_DOUBLE = struct.Struct('<d')
+
+def dumps_pickle(data):
+    """
+    Serialize data with pickle protocol 5.
+    """
+    return pickle.dumps(data, protocol=5)
+
+def loads_pickle(data):
+    """
+    Deserialize pickled data.
+    """
+    return pickle.loads(data)
+
+def dumps_binary(data):
+    """
+    Serialize data to the compact schema-aware binary format.
+
+    Dicts with string keys are stored as a shape (their key tuple) plus values, and
+    each shape is written only once, so the repeated layout of history entries and
+    step statuses costs a few bytes per record. Short strings are interned the same way.
+    Types without a tag of their own (datetime, set, tuple, ...) are embedded as pickle.
+    """
+    out = bytearray(BINARY_MAGIC)
+    strings = {}
+    shapes = {}
+
+    def write_varint(value):
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def write_str(value):
+        index = strings.get(value)
+        if index is not None:
+            out.append(_STR_REF)
+            write_varint(index)
+            return
+        encoded = value.encode('utf-8')
+        if len(value) <= BINARY_INTERN_MAX_LENGTH:
+            strings[value] = len(strings)
+            out.append(_STR_NEW)
+        else:
+            out.append(_STR_RAW)
+        write_varint(len(encoded))
+        out.extend(encoded)
+
+    def write(value):
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif type(value) is str:
+            write_str(value)
+        elif type(value) is int:
+            out.append(_INT)
+            # Zigzag encoding keeps small negative numbers short
+            write_varint(value * 2 if value >= 0 else -value * 2 - 1)
+        elif type(value) is float:
+            out.append(_FLOAT)
+            out.extend(_DOUBLE.pack(value))
+        elif type(value) is list:
+            out.append(_LIST)
+            write_varint(len(value))
+            for item in value:
+                write(item)
+        elif type(value) is dict:
+            keys = tuple(value)
+            if all(type(key) is str for key in keys):
+                shape = shapes.get(keys)
+                if shape is None:
+                    shapes[keys] = len(shapes)
+                    out.append(_SHAPE_NEW)
+                    write_varint(len(keys))
+                    for key in keys:
+                        write_str(key)
+                else:
+                    out.append(_SHAPE_REF)
+                    write_varint(shape)
+                for item in value.values():
+                    write(item)
+            else:
+                out.append(_DICT)
+                write_varint(len(value))
+                for key, item in value.items():
+                    write(key)
+                    write(item)
+        elif type(value) is bytes:
+            out.append(_BYTES)
+            write_varint(len(value))
+            out.extend(value)
+        else:
+            blob = pickle.dumps(value, protocol=5)
+            out.append(_PICKLE)
+            write_varint(len(blob))
+            out.extend(blob)
+
+    write(data)
+    return bytes(out)
+
+def loads_binary(data):
+    """
+    Deserialize data written by dumps_binary.
+    """
+    if not data.startswith(BINARY_MAGIC):
+        raise ValueError("Not in the binary serializer format")
+    view = memoryview(data)
+    strings = []
+    shapes = []
+    position = len(BINARY_MAGIC)
+
+    def read_varint():
+        nonlocal position
+        result = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def read_bytes():
+        nonlocal position
+        length = read_varint()
+        start = position
+        position += length
+        return view[start:position]
+
+    def read():
+        nonlocal position
+        tag = data[position]
+        position += 1
+        if tag == _STR_REF:
+            return strings[read_varint()]
+        if tag == _SHAPE_REF:
+            keys = shapes[read_varint()]
+            return {key: read() for key in keys}
+        if tag == _STR_NEW:
+            value = str(read_bytes(), 'utf-8')
+            strings.append(value)
+            return value
+        if tag == _INT:
+            value = read_varint()
+            return value >> 1 if not value & 1 else -((value + 1) >> 1)
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _LIST:
+            return [read() for _ in range(read_varint())]
+        if tag == _SHAPE_NEW:
+            keys = tuple(read() for _ in range(read_varint()))
+            shapes.append(keys)
+            return {key: read() for key in keys}
+        if tag == _STR_RAW:
+            return str(read_bytes(), 'utf-8')
+        if tag == _FLOAT:
+            value = _DOUBLE.unpack_from(data, position)[0]
+            position += _DOUBLE.size
+            return value
+        if tag == _DICT:
+            result = {}
+            for _ in range(read_varint()):
+                key = read()
+                result[key] = read()
+            return result
+        if tag == _BYTES:
+            return bytes(read_bytes())
+        if tag == _PICKLE:
+            return pickle.loads(read_bytes())
+        raise ValueError(f"Unknown tag {tag} at offset {position - 1}")
+
+    return read()
+
+def _json_default(value):
+    """
+    Encode the non-JSON types found in the data.
+    """
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, (set, frozenset)):
+        return {'__set__': list(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _json_object_hook(value):
+    """
+    Decode the types encoded by _json_default.
+    """
+    if len(value) == 1:
+        if '__datetime__' in value:
+            return datetime.fromisoformat(value['__datetime__'])
+        if '__set__' in value:
+            return set(value['__set__'])
+    return value
+
+def dumps_jsonl(data):
+    """
+    Serialize data to JSON Lines: a header line, then one [key, value] line per
+    item of a dict, or a single line for any other value.
+    JSON has no tuples or non-string dict keys below the top level, those come back
+    as lists and strings.
+    """
+    encoder = json.JSONEncoder(default=_json_default, ensure_ascii=False, separators=(',', ':'))
+    if isinstance(data, dict):
+        lines = [json.dumps({'format': JSONL_FORMAT, 'type': 'dict'})]
+        lines.extend(encoder.encode([key, value]) for key, value in data.items())
+    else:
+        lines = [json.dumps({'format': JSONL_FORMAT, 'type': 'value'}), encoder.encode(data)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+def loads_jsonl(data):
+    """
+    Deserialize data written by dumps_jsonl.
+    """
+    decoder = json.JSONDecoder(object_hook=_json_object_hook)
+    lines = data.decode('utf-8').splitlines()
+    header = json.loads(lines[0])
+    if header.get('format') != JSONL_FORMAT:
+        raise ValueError("Not in the JSON Lines serializer format")
+    if header['type'] == 'dict':
+        result = {}
+        for line in lines[1:]:
+            if line:
+                key, value = decoder.decode(line)
+                result[key] = value
+        return result
+    return decoder.decode(lines[1])
+
+# Available serializers: {name: (dumps, loads)}
+SERIALIZERS = {
+    'pickle': (dumps_pickle, loads_pickle),
+    'binary': (dumps_binary, loads_binary),
+    'jsonl': (dumps_jsonl, loads_jsonl),
+}
+
+def dumps(data, serializer='pickle'):
+    """
+    Serialize data with the named serializer.
+    """
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer '{serializer}'")
+    return SERIALIZERS[serializer][0](data)
+
+def detect(data):
+    """
+    Get the name of the serializer that wrote data.
+    """
+    if data.startswith(BINARY_MAGIC):
+        return 'binary'
+    if data.startswith(b'{'):
+        return 'jsonl'
+    return 'pickle'
+
+def loads(data):
+    """
+    Deserialize data written by any of the serializers.
+    """
+    return SERIALIZERS[detect(data)][1](data)
@@ -0,0 +1,113 @@
+"""
+Streaming quantile sketches for step durations.
+
+DurationSketch is a DDSketch-style sketch: durations are counted in logarithmically sized
+buckets, bucket i covering (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so every
+quantile it returns is within relative accuracy a of the true one. Memory is bounded by the
+number of buckets, not the number of durations, and a duration can be removed again by
+counting it with -1, which lets a file's old durations be replaced when it changes.
+"""
+import math
+
+# Quantiles are within 1% of the true durations
+RELATIVE_ACCURACY = 0.01
+
+# Buckets kept per sketch; the lowest ones are merged beyond this (about 1e-8 to 1e9 minutes at 1%)
+MAX_BUCKETS = 2048
+
+# Histogram bin edges in minutes: 15 min, 30 min, 1 h, 2 h, 4 h, 8 h, 1 day, 2 days, 1 week
+HISTOGRAM_EDGES = (15, 30, 60, 120, 240, 480, 1440, 2880, 10080)
+
+class DurationSketch:
+    """
+    Count durations (minutes) in logarithmic buckets to answer quantiles approximately.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, max_buckets=MAX_BUCKETS):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets = {}  # {bucket index: count}
+        self.zero_count = 0  # Durations of 0 minutes or less
+        self.min_index = None  # Lower durations are counted in this bucket once buckets were merged
+        self.count = 0
+
+    def _index(self, value):
+        index = math.ceil(math.log(value) / self.log_gamma)
+        if self.min_index is not None and index < self.min_index:
+            return self.min_index
+        return index
+
+    def _value(self, index):
+        # The midpoint of the bucket, within the relative accuracy of all of its durations
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        """
+        Count a duration, or remove one counted before with count -1.
+        """
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+        index = self._index(value)
+        remaining = self.buckets.get(index, 0) + count
+        if remaining:
+            self.buckets[index] = remaining
+        else:
+            del self.buckets[index]
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        # Merge the lowest buckets so the high quantiles keep their accuracy
+        indexes = sorted(self.buckets)
+        merged = indexes[len(indexes) - self.max_buckets]
+        for index in indexes[:len(indexes) - self.max_buckets]:
+            self.buckets[merged] += self.buckets.pop(index)
+        self.min_index = merged
+
+    def quantile(self, q):
+        """
+        Get the duration at quantile q (0 to 1), or None without durations.
+        """
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.buckets))
+
+    def histogram(self, edges=HISTOGRAM_EDGES):
+        """
+        Count the durations per bin, [{'from': minutes, 'to': minutes or None, 'count': n}].
+        """
+        counts = [0] * (len(edges) + 1)
+        counts[0] = self.zero_count
+        for index, count in self.buckets.items():
+            # Binned by the bucket's upper bound, so a duration equal to an edge lands above it
+            value = self.gamma ** index
+            bin_index = 0
+            while bin_index < len(edges) and value >= edges[bin_index]:
+                bin_index += 1
+            counts[bin_index] += count
+        lower_edges = (0,) + tuple(edges)
+        upper_edges = tuple(edges) + (None,)
+        return [{'from': lower, 'to': upper, 'count': count} for lower, upper, count in zip(lower_edges, upper_edges, counts)]
+
+    def summary(self):
+        """
+        Get the count, p50, p90, p99 and histogram of the durations.
+        """
+        return {
+            'count': self.count,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'histogram': self.histogram()
+        }
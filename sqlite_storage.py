@@ -0,0 +1,490 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+
+# Define database file path
+DATA_DIR = 'data'
+DB_FILE = os.path.join(DATA_DIR, 'pipeline.db')
+
+# Columns stored natively for each record type. Any other keys are kept in the
+# `extra` column so records round-trip unchanged.
+FILE_COLUMNS = ['supplier', 'process_type', 'original_filename', 'current_step', 'creation_time']
+HISTORY_COLUMNS = ['step', 'timestamp', 'user', 'filename', 'path', 'status', 'comment']
+STEP_STATUS_COLUMNS = ['status', 'last_update', 'updated_by', 'assigned_time', 'total_time_worked', 'is_overdue']
+NOTIFICATION_COLUMNS = ['id', 'type', 'title', 'message', 'file_id', 'step', 'timestamp', 'read']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value BLOB
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    supplier TEXT,
+    process_type TEXT,
+    original_filename TEXT,
+    current_step TEXT,
+    creation_time TEXT,
+    custom_steps TEXT,
+    extra BLOB
+);
+CREATE TABLE IF NOT EXISTS history (
+    file_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    step TEXT,
+    timestamp TEXT,
+    user TEXT,
+    filename TEXT,
+    path TEXT,
+    status TEXT,
+    comment TEXT,
+    extra BLOB,
+    PRIMARY KEY (file_id, seq)
+);
+CREATE TABLE IF NOT EXISTS step_statuses (
+    file_id TEXT NOT NULL,
+    step TEXT NOT NULL,
+    position INTEGER,
+    status TEXT,
+    last_update TEXT,
+    updated_by TEXT,
+    assigned_time INTEGER,
+    total_time_worked INTEGER,
+    is_overdue INTEGER,
+    extra BLOB,
+    PRIMARY KEY (file_id, step)
+);
+CREATE TABLE IF NOT EXISTS file_step_assignments (
+    file_id TEXT NOT NULL,
+    step TEXT NOT NULL,
+    position INTEGER,
+    users TEXT,
+    PRIMARY KEY (file_id, step)
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    position INTEGER,
+    type TEXT,
+    title TEXT,
+    message TEXT,
+    file_id TEXT,
+    step TEXT,
+    timestamp TEXT,
+    read INTEGER,
+    extra BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_files_current_step ON files (current_step);
+CREATE INDEX IF NOT EXISTS idx_files_supplier ON files (supplier);
+CREATE INDEX IF NOT EXISTS idx_files_process_type ON files (process_type);
+CREATE INDEX IF NOT EXISTS idx_history_file_id ON history (file_id);
+CREATE INDEX IF NOT EXISTS idx_step_statuses_file_id ON step_statuses (file_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_username_read ON notifications (username, read);
+CREATE INDEX IF NOT EXISTS idx_notifications_file_id ON notifications (file_id);
+CREATE INDEX IF NOT EXISTS idx_notifications_username_position ON notifications (username, position);
+"""
+
+_local = threading.local()
+
+def get_connection():
+    """
+    Get the SQLite connection for the current thread, creating the schema on first use.
+    """
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+        connection = sqlite3.connect(DB_FILE, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA foreign_keys=ON')
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+    return connection
+
+def _split_record(record, columns):
+    """
+    Split a record into its native column values and a dict of the remaining keys.
+    """
+    values = [record.get(column) for column in columns]
+    extra = {key: value for key, value in record.items() if key not in columns}
+    return values, extra
+
+def _join_record(row, columns, extra):
+    """
+    Rebuild a record from its column values and extra blob.
+    """
+    record = {}
+    for column, value in zip(columns, row):
+        record[column] = value
+    if extra:
+        record.update(pickle.loads(extra))
+    return record
+
+def _drop_missing(record, present):
+    """
+    Remove keys that were NULL in the database and absent from the original record.
+    """
+    for key in list(record.keys()):
+        if record[key] is None and key not in present:
+            del record[key]
+    return record
+
+# Settings (small lists and dicts stored as a single value)
+
+def load_setting(name, default=None):
+    """
+    Load a setting value.
+    """
+    row = get_connection().execute('SELECT value FROM settings WHERE name = ?', (name,)).fetchone()
+    if row is None:
+        return default
+    return pickle.loads(row[0])
+
+def save_setting(name, value):
+    """
+    Save a setting value.
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)', (name, pickle.dumps(value)))
+
+# Users
+
+def load_users():
+    """
+    Load users database.
+    """
+    rows = get_connection().execute('SELECT username, data FROM users').fetchall()
+    return {username: pickle.loads(data) for username, data in rows}
+
+def save_users(users_db):
+    """
+    Save users database.
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute('DELETE FROM users')
+        connection.executemany('INSERT INTO users (username, data) VALUES (?, ?)',
+                               [(username, pickle.dumps(user)) for username, user in users_db.items()])
+
+# Files
+
+def _write_file(connection, file_id, file, include_history=True):
+    """
+    Write one file record and its child rows.
+    """
+    values, extra = _split_record(
+        {key: value for key, value in file.items() if key not in ('history', 'step_statuses', 'step_assignments', 'custom_steps')},
+        FILE_COLUMNS)
+    extra['__flags__'] = {'has_history': 'history' in file, 'has_step_statuses': 'step_statuses' in file,
+                          'has_step_assignments': 'step_assignments' in file,
+                          'present': [key for key in FILE_COLUMNS if key in file]}
+    connection.execute(
+        'INSERT OR REPLACE INTO files (file_id, supplier, process_type, original_filename, current_step, creation_time, custom_steps, extra) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [file_id] + values + [json.dumps(file['custom_steps']) if 'custom_steps' in file else None, pickle.dumps(extra)])
+
+    connection.execute('DELETE FROM step_statuses WHERE file_id = ?', (file_id,))
+    for position, (step, step_status) in enumerate(file.get('step_statuses', {}).items()):
+        if isinstance(step_status, dict):
+            values, extra = _split_record(step_status, STEP_STATUS_COLUMNS)
+            extra['__present__'] = [key for key in STEP_STATUS_COLUMNS if key in step_status]
+        else:
+            # Legacy format where the status was stored as a plain string
+            values = [step_status] + [None] * (len(STEP_STATUS_COLUMNS) - 1)
+            extra = {'__legacy__': True}
+        connection.execute(
+            'INSERT INTO step_statuses (file_id, step, position, status, last_update, updated_by, assigned_time, total_time_worked, is_overdue, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [file_id, step, position] + values + [pickle.dumps(extra)])
+
+    connection.execute('DELETE FROM file_step_assignments WHERE file_id = ?', (file_id,))
+    connection.executemany(
+        'INSERT INTO file_step_assignments (file_id, step, position, users) VALUES (?, ?, ?, ?)',
+        [(file_id, step, position, json.dumps(users)) for position, (step, users) in enumerate(file.get('step_assignments', {}).items())])
+
+    if include_history:
+        connection.execute('DELETE FROM history WHERE file_id = ?', (file_id,))
+        for seq, entry in enumerate(file.get('history', [])):
+            _write_history_entry(connection, file_id, seq, entry)
+
+def _write_history_entry(connection, file_id, seq, entry):
+    """
+    Write one history entry.
+    """
+    values, extra = _split_record(entry, HISTORY_COLUMNS)
+    extra['__present__'] = [key for key in HISTORY_COLUMNS if key in entry]
+    connection.execute(
+        'INSERT OR REPLACE INTO history (file_id, seq, step, timestamp, user, filename, path, status, comment, extra) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [file_id, seq] + values + [pickle.dumps(extra)])
+
+def _read_files(connection, where='', params=()):
+    """
+    Read file records, with their child rows, matching an optional WHERE clause.
+    """
+    files_db = {}
+    rows = connection.execute(
+        'SELECT file_id, supplier, process_type, original_filename, current_step, creation_time, custom_steps, extra FROM files ' + where,
+        params).fetchall()
+    for row in rows:
+        file_id = row[0]
+        extra_data = pickle.loads(row[7]) if row[7] else {}
+        flags = extra_data.pop('__flags__', {})
+        file = _drop_missing(_join_record(row[1:6], FILE_COLUMNS, None), flags.get('present', FILE_COLUMNS))
+        file.update(extra_data)
+        if flags.get('has_history', True):
+            file['history'] = []
+        if row[6] is not None:
+            file['custom_steps'] = json.loads(row[6])
+        if flags.get('has_step_assignments', True):
+            file['step_assignments'] = {}
+        if flags.get('has_step_statuses', True):
+            file['step_statuses'] = {}
+        files_db[file_id] = file
+
+    if not files_db:
+        return files_db
+
+    file_filter = ''
+    if where:
+        file_filter = ' WHERE file_id IN (SELECT file_id FROM files ' + where + ')'
+
+    for row in connection.execute(
+            'SELECT file_id, step, status, last_update, updated_by, assigned_time, total_time_worked, is_overdue, extra '
+            'FROM step_statuses' + file_filter + ' ORDER BY file_id, position', params):
+        file = files_db.get(row[0])
+        if file is None:
+            continue
+        extra_data = pickle.loads(row[8]) if row[8] else {}
+        if extra_data.get('__legacy__'):
+            file.setdefault('step_statuses', {})[row[1]] = row[2]
+            continue
+        present = extra_data.pop('__present__', STEP_STATUS_COLUMNS)
+        step_status = _drop_missing(_join_record(row[2:8], STEP_STATUS_COLUMNS, None), present)
+        if 'is_overdue' in step_status and step_status['is_overdue'] is not None:
+            step_status['is_overdue'] = bool(step_status['is_overdue'])
+        step_status.update(extra_data)
+        file.setdefault('step_statuses', {})[row[1]] = step_status
+
+    for row in connection.execute(
+            'SELECT file_id, step, users FROM file_step_assignments' + file_filter + ' ORDER BY file_id, position', params):
+        if row[0] in files_db:
+            files_db[row[0]].setdefault('step_assignments', {})[row[1]] = json.loads(row[2])
+
+    for row in connection.execute(
+            'SELECT file_id, step, timestamp, user, filename, path, status, comment, extra '
+            'FROM history' + file_filter + ' ORDER BY file_id, seq', params):
+        file = files_db.get(row[0])
+        if file is None:
+            continue
+        extra_data = pickle.loads(row[8]) if row[8] else {}
+        present = extra_data.pop('__present__', HISTORY_COLUMNS)
+        entry = _drop_missing(_join_record(row[1:8], HISTORY_COLUMNS, None), present)
+        entry.update(extra_data)
+        file.setdefault('history', []).append(entry)
+
+    return files_db
+
+def load_files_db():
+    """
+    Load files database.
+    """
+    return _read_files(get_connection())
+
+def load_file(file_id):
+    """
+    Load a single file record, or None if it does not exist.
+    """
+    return _read_files(get_connection(), 'WHERE file_id = ?', (file_id,)).get(file_id)
+
+def save_files_db(files_db):
+    """
+    Save files database, replacing all stored files.
+    """
+    connection = get_connection()
+    with connection:
+        existing = {row[0] for row in connection.execute('SELECT file_id FROM files')}
+        for file_id in existing - set(files_db.keys()):
+            _delete_file(connection, file_id)
+        for file_id, file in files_db.items():
+            _write_file(connection, file_id, file)
+
+def save_file(file_id, file, include_history=True):
+    """
+    Save a single file record in its own transaction.
+    """
+    connection = get_connection()
+    with connection:
+        _write_file(connection, file_id, file, include_history)
+
+def append_history_entry(file_id, seq, entry):
+    """
+    Save a single history entry appended to a file.
+    """
+    connection = get_connection()
+    with connection:
+        _write_history_entry(connection, file_id, seq, entry)
+
+def _delete_file(connection, file_id):
+    """
+    Delete a file record and its child rows.
+    """
+    for table in ('history', 'step_statuses', 'file_step_assignments', 'files'):
+        connection.execute(f'DELETE FROM {table} WHERE file_id = ?', (file_id,))
+
+def delete_file(file_id):
+    """
+    Delete a single file record in its own transaction.
+    """
+    connection = get_connection()
+    with connection:
+        _delete_file(connection, file_id)
+
+# Notifications
+
+def _notification_row(username, notification):
+    """
+    Get the id, column values and extra blob of a notification row.
+    """
+    # Shared events are stored as one row per user, the event id is shared by all of
+    # them, so the row id is made unique and the event id kept in extra
+    if 'event' in notification:
+        notification = dict(notification['event'], id=f"{username}:{notification['id']}",
+                            read=notification.get('read', False), event_id=notification['id'])
+    values, extra = _split_record(notification, NOTIFICATION_COLUMNS)
+    return values[0], values[1:], pickle.dumps(extra) if extra else None
+
+def _insert_notification(connection, username, position, notification):
+    """
+    Insert one notification row at a position in the user's list.
+    """
+    row_id, values, extra = _notification_row(username, notification)
+    connection.execute(
+        'INSERT OR REPLACE INTO notifications (id, username, position, type, title, message, file_id, step, timestamp, read, extra) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [row_id, username, position] + values + [extra])
+
+def _write_notification(connection, username, notification):
+    """
+    Write one notification, keeping its position if it is stored already and
+    appending it to the user's list otherwise.
+    """
+    row_id, values, extra = _notification_row(username, notification)
+    updated = connection.execute(
+        'UPDATE notifications SET type = ?, title = ?, message = ?, file_id = ?, step = ?, timestamp = ?, read = ?, extra = ? '
+        'WHERE id = ? AND username = ?',
+        values + [extra, row_id, username]).rowcount
+    if not updated:
+        position = connection.execute(
+            'SELECT COALESCE(MAX(position), -1) + 1 FROM notifications WHERE username = ?', (username,)).fetchone()[0]
+        _insert_notification(connection, username, position, notification)
+
+def _delete_notification(connection, username, notification_id):
+    """
+    Delete one notification, stored under its own id or its shared event row id.
+    """
+    connection.execute('DELETE FROM notifications WHERE username = ? AND id IN (?, ?)',
+                       (username, notification_id, f"{username}:{notification_id}"))
+
+def _write_user_notifications(connection, username, user_notifications):
+    """
+    Write all notifications of one user.
+    """
+    connection.execute('DELETE FROM notifications WHERE username = ?', (username,))
+    if isinstance(user_notifications, dict):
+        user_notifications = user_notifications.values()
+    for position, notification in enumerate(user_notifications):
+        _insert_notification(connection, username, position, notification)
+
+def load_notifications():
+    """
+    Load notifications database.
+    """
+    notifications_db = {}
+    for row in get_connection().execute(
+            'SELECT username, id, type, title, message, file_id, step, timestamp, read, extra FROM notifications ORDER BY username, position'):
+        notification = _join_record(row[1:9], NOTIFICATION_COLUMNS, row[9])
+        notification['read'] = bool(notification['read'])
+        if 'event_id' in notification:
+            notification['id'] = notification.pop('event_id')
+        notifications_db.setdefault(row[0], []).append(notification)
+    return notifications_db
+
+def save_notifications(notifications_db):
+    """
+    Save notifications database, replacing all stored notifications.
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute('DELETE FROM notifications')
+        for username, user_notifications in notifications_db.items():
+            _write_user_notifications(connection, username, user_notifications)
+
+def save_notification_changes(users=None, notifications=None):
+    """
+    Save changed notifications in a single transaction.
+    users maps a username to all of their notifications, which replace the stored ones;
+    notifications maps (username, notification_id) to a notification, or None to delete it.
+    """
+    connection = get_connection()
+    with connection:
+        for username, user_notifications in (users or {}).items():
+            _write_user_notifications(connection, username, user_notifications or {})
+        for (username, notification_id), notification in (notifications or {}).items():
+            if notification is None:
+                _delete_notification(connection, username, notification_id)
+            else:
+                _write_notification(connection, username, notification)
+
+# Indexed queries
+
+def count_files_in_steps(steps_list):
+    """
+    Count files per current step using the current_step index.
+    """
+    step_counts = {step: 0 for step in steps_list}
+    for step, count in get_connection().execute('SELECT current_step, COUNT(*) FROM files GROUP BY current_step'):
+        if step in step_counts:
+            step_counts[step] = count
+    return step_counts
+
+def count_files_by_supplier():
+    """
+    Count files per supplier using the supplier index.
+    Files without a supplier are counted as 'unknown', as data_manager does for pickle storage.
+    """
+    suppliers = {}
+    for supplier, count in get_connection().execute('SELECT supplier, COUNT(*) FROM files GROUP BY supplier'):
+        supplier = 'unknown' if supplier is None else supplier
+        suppliers[supplier] = suppliers.get(supplier, 0) + count
+    return suppliers
+
+def get_file_ids_by_supplier(supplier):
+    """
+    Get the ids of all files from a supplier using the supplier index.
+    """
+    return [row[0] for row in get_connection().execute('SELECT file_id FROM files WHERE supplier = ?', (supplier,))]
+
+def get_unread_notification_count(username):
+    """
+    Count the unread notifications of a user using the (username, read) index.
+    """
+    return get_connection().execute(
+        'SELECT COUNT(*) FROM notifications WHERE username = ? AND read = 0', (username,)).fetchone()[0]
+
+def backup_to(path):
+    """
+    Write a consistent copy of the database to path.
+    """
+    destination = sqlite3.connect(path)
+    try:
+        get_connection().backup(destination)
+    finally:
+        destination.close()
@@ -0,0 +1,90 @@
+"""
+Tests for filtering, sorting and paging the main page file list.
+"""
+import time
+
+import pytest
+
+import data_manager
+import file_index
+
+@pytest.fixture
+def files_db(make_file):
+    """
+    Files added out of creation order, with two created at the same time.
+    """
+    file_index.mark_file_changed()
+    return {
+        'f5': make_file('f5', 'Globex', 'PS', 'review', 500, completed=True),
+        'f2': make_file('f2', 'Acme', 'PLM', 'intake', 200, step_users=()),
+        'f4': make_file('f4', 'acme', 'PLM', 'review', 400, step_users=('bob',)),
+        'f1': make_file('f1', 'Initech', 'PS', 'intake', 100, step_users=()),
+        'f3b': make_file('f3b', 'Acme', 'PS', 'intake', 300, step_users=()),
+        'f3a': make_file('f3a', 'Globex', 'PLM', 'review', 300)
+    }
+
+def page_ids(result):
+    return list(result['summaries'])
+
+def test_default_order_is_creation_time_then_file_id(files_db):
+    assert page_ids(file_index.query_files(files_db)) == ['f1', 'f2', 'f3a', 'f3b', 'f4', 'f5']
+    assert page_ids(file_index.query_files(files_db, descending=True)) == ['f5', 'f4', 'f3b', 'f3a', 'f2', 'f1']
+
+def test_filters_match_every_chosen_value(files_db):
+    result = file_index.query_files(files_db, {'supplier': 'Acme', 'current_step': 'intake'})
+    assert page_ids(result) == ['f2', 'f3b'] and result['total'] == 2
+    assert page_ids(file_index.query_files(files_db, {'status': 'Completed'})) == ['f5']
+    assert file_index.query_files(files_db, {'supplier': 'Nobody'})['total'] == 0
+
+    facets = file_index.get_facets(files_db)
+    assert facets['supplier'] == {'Acme': 2, 'acme': 1, 'Globex': 2, 'Initech': 1}
+    assert facets['status'] == {'Completed': 1, 'In Progress': 5}
+
+def test_column_sort_keeps_creation_order_for_ties(files_db):
+    assert page_ids(file_index.query_files(files_db, sort='supplier')) == ['f2', 'f3b', 'f4', 'f3a', 'f5', 'f1']
+    assert page_ids(file_index.query_files(files_db, sort='supplier', descending=True)) == ['f1', 'f3a', 'f5', 'f2', 'f3b', 'f4']
+    assert page_ids(file_index.query_files(files_db, sort='supplier', per_page=2, page=2)) == ['f4', 'f3a']
+
+def test_pages_split_the_sorted_matches(files_db):
+    pages = [file_index.query_files(files_db, page=page, per_page=4) for page in (1, 2)]
+    assert [page_ids(result) for result in pages] == [['f1', 'f2', 'f3a', 'f3b'], ['f4', 'f5']]
+    assert (pages[1]['page'], pages[1]['pages'], pages[1]['total']) == (2, 2, 6)
+
+    # Pages out of range show the nearest page
+    assert file_index.query_files(files_db, page=9, per_page=4)['page'] == 2
+    assert file_index.query_files(files_db, page=0, per_page=4)['page'] == 1
+    assert file_index.query_files(files_db, {'supplier': 'Nobody'}, page=3)['pages'] == 1
+
+def test_assigned_files_honour_file_specific_assignments(files_db):
+    result = file_index.query_files(files_db, assigned_to='admin', assigned_steps=['review'])
+    assert page_ids(result) == ['f3a', 'f5']
+
+def test_changed_files_are_reindexed(files_db, make_file):
+    assert file_index.query_files(files_db, {'supplier': 'Initech'})['total'] == 1
+
+    files_db['f1']['supplier'] = 'Globex'
+    file_index.mark_file_changed('f1')
+    del files_db['f2']
+    file_index.mark_file_changed('f2')
+    files_db['f0'] = make_file('f0', 'Initech', 'PS', 'intake', 50)
+    file_index.mark_file_changed('f0')
+
+    assert page_ids(file_index.query_files(files_db, {'supplier': 'Globex'})) == ['f1', 'f3a', 'f5']
+    assert page_ids(file_index.query_files(files_db)) == ['f0', 'f1', 'f3a', 'f3b', 'f4', 'f5']
+    assert file_index.get_facets(files_db)['supplier'] == {'Acme': 1, 'acme': 1, 'Globex': 3, 'Initech': 1}
+
+def test_files_flagged_by_the_deadline_scheduler_are_overdue(app_module, make_file):
+    app = app_module
+    # A step with a minute assigned, started an hour ago, and no time worked recorded yet
+    file = make_file('late', step='intake', created=int(time.time()) - 3600)
+    file['step_statuses']['intake'].update({'assigned_time': 1, 'is_overdue': False})
+    app.files_db['late'] = file
+    data_manager.record_change('files_db', 'set', ['late'], file)
+    assert 'late' not in file_index.query_files(app.files_db, {'overdue': True})['summaries']
+
+    deadline, step = app.get_step_deadline('late')
+    app.fire_step_deadline('late', step, deadline)
+
+    assert 'late' in file_index.query_files(app.files_db, {'overdue': True})['summaries']
+    overdue = file_index.get_facets(app.files_db)['overdue']
+    assert overdue[True] == len(file_index.query_files(app.files_db, {'overdue': True}, per_page=1000)['summaries'])
@@ -31,12 +31,14 @@ def test_notification_system():
     # Show current notifications
     print("\n2. Current notifications:")
     for username, user_notifications in notifications_db.items():
-        file_assigned_count = len([n for n in user_notifications if n.get('type') == 'file_assigned'])
+        file_assigned_count = len([n for n in user_notifications.values() if n.get('event', n).get('type') == 'file_assigned'])
         total_count = len(user_notifications)
         print(f"   - {username}: {file_assigned_count} file_assigned / {total_count} total")
         
         # Show details of file_assigned notifications
-        for notification in user_notifications:
+        for notification in user_notifications.values():
+            # file_assigned notifications are entries of an event shared by all users of the step
+            notification = notification.get('event', notification)
             if notification.get('type') == 'file_assigned':
                 file_id = notification.get('file_id')
                 step = notification.get('step')
@@ -0,0 +1,68 @@
+"""
+Tests for the notification worker, which batches notification updates in the background.
+"""
+import io
+import time
+
+import pytest
+
+import data_manager
+
+@pytest.fixture
+def client(app_module):
+    client = app_module.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin'})
+    return client
+
+@pytest.fixture
+def slow_worker(app_module, monkeypatch):
+    """
+    Hold triggers back for a minute, so only flush_notification_worker processes them.
+    """
+    assert app_module.flush_notification_worker(timeout=5)
+    monkeypatch.setattr(app_module, 'NOTIFICATION_WORKER_DEBOUNCE', 60)
+    monkeypatch.setattr(app_module, 'NOTIFICATION_WORKER_MAX_DELAY', 60)
+    return app_module
+
+def upload(app, client, name):
+    """
+    Upload a file into the intake step and get its file ID.
+    """
+    response = client.post('/upload', data={'file': (io.BytesIO(b'data'), name), 'supplier': 'Acme', 'process_type': 'PLM', 'step': 'intake'},
+                           content_type='multipart/form-data')
+    assert response.status_code in (200, 302)
+    return next(file_id for file_id, summary in data_manager.get_file_summaries(app.files_db).items() if summary['original_filename'] == name)
+
+def test_triggers_for_the_same_file_and_user_are_coalesced(slow_worker, client):
+    app = slow_worker
+    file_id = upload(app, client, 'coalesce.txt')
+    assert app.flush_notification_worker(timeout=5)
+    before = app.get_notification_worker_stats()
+
+    for _ in range(5):
+        app.trigger_notification_update(file_id=file_id)
+    for _ in range(3):
+        app.trigger_notification_update(username='admin')
+    time.sleep(0.1)
+    pending = app.get_notification_worker_stats()
+    assert (pending['pending_files'], pending['pending_users'], pending['batches']) == (1, 1, before['batches'])
+
+    assert app.flush_notification_worker(timeout=5)
+    after = app.get_notification_worker_stats()
+    assert after['triggers'] - before['triggers'] == 8
+    assert after['merged'] - before['merged'] == 6
+    assert after['batches'] - before['batches'] == 1
+    assert after['files_processed'] - before['files_processed'] == 1
+    assert after['users_processed'] - before['users_processed'] == 1
+    assert (after['pending_files'], after['pending_users'], after['errors']) == (0, 0, before['errors'])
+
+def test_flushed_work_creates_the_notifications(slow_worker, client):
+    app = slow_worker
+    file_id = upload(app, client, 'assigned.txt')
+    response = client.post('/register', data={'username': 'carol', 'password': 'secret', 'assigned_roles': ['intake']})
+    assert response.status_code == 302
+
+    assert app.get_notification_worker_stats()['pending_users'] == 1
+    assert not app.notification_exists('carol', file_id, 'intake')
+    assert app.flush_notification_worker(timeout=5)
+    assert app.notification_exists('carol', file_id, 'intake')
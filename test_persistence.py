@@ -0,0 +1,345 @@
+"""
+Tests for saving and loading data.
+"""
+import hashlib
+import os
+import threading
+
+import data_manager
+import sqlite_storage
+
+def load_collections():
+    """
+    Load every collection the way the app does at startup, {save_data argument: data}.
+    """
+    users_db, files_db, steps, step_assignments, custom_steps_list, process_types = data_manager.load_data()
+    return {
+        'users_db': users_db,
+        'files_db': files_db,
+        'steps_list': steps,
+        'step_assignments': step_assignments,
+        'custom_steps_list': custom_steps_list,
+        'process_types': process_types,
+        'default_assigned_times': data_manager.load_default_assigned_times(),
+        'notifications_db': data_manager.load_notifications()
+    }
+
+def start_tracking(monkeypatch, collections):
+    """
+    Let record_change resolve paths against the collections, as start_auto_save does.
+    """
+    monkeypatch.setattr(data_manager, '_collections', data_manager._collection_map(**collections))
+
+def restart(monkeypatch):
+    """
+    Drop the in-memory state of a process that stopped without saving.
+    """
+    if data_manager._journal_file is not None:
+        data_manager._journal_file.close()
+    for name, value in {'_journal_file': None, '_journal_pending': 0, '_journal_records': 0,
+                        '_dirty_collections': set(), '_dirty_files': set(), '_dirty_notification_users': set(),
+                        '_shard_members': {}, '_lazy_files_db': None, '_collections': {}}.items():
+        monkeypatch.setattr(data_manager, name, value)
+
+def save_files(collections, files):
+    """
+    Add files ({file_id: record}) to files_db and write a full snapshot.
+    """
+    collections['files_db'].update(files)
+    data_manager.save_data(**collections)
+
+def shard_inodes():
+    """
+    Get {name: inode} of every files_db shard and index file; rewrites replace the inode.
+    """
+    return {name: os.stat(os.path.join(data_manager.FILES_DB_DIR, name)).st_ino for name in os.listdir(data_manager.FILES_DB_DIR)}
+
+def file_ids_in_distinct_shards(count):
+    """
+    Get count file ids that are all in different shards.
+    """
+    file_ids = {}
+    candidate = 0
+    while len(file_ids) < count:
+        file_id = f'file-{candidate}'
+        file_ids.setdefault(data_manager.get_files_db_shard(file_id), file_id)
+        candidate += 1
+    return list(file_ids.values())
+
+def test_journal_is_replayed_after_a_crash(data_dir, monkeypatch, make_file):
+    collections = load_collections()
+    save_files(collections, {'f1': make_file('f1')})
+    start_tracking(monkeypatch, collections)
+
+    # Changes after the snapshot only reach the journal
+    files_db = collections['files_db']
+    entry = {'step': 'intake', 'timestamp': '2026-01-02 10:00', 'epoch': 1767348000, 'user': 'admin', 'status': 'Completed'}
+    files_db['f1']['history'].append(entry)
+    data_manager.record_change('files_db', 'append', ['f1', 'history'], entry)
+    files_db['f1']['supplier'] = 'Globex'
+    data_manager.record_change('files_db', 'set', ['f1', 'supplier'], 'Globex')
+    notification = {'id': 'n1', 'type': 'info', 'title': 'Hello', 'message': '', 'read': False}
+    collections['notifications_db']['admin'] = {'n1': notification}
+    data_manager.record_change('notifications_db', 'set', ['admin'], {'n1': notification})
+    data_manager.sync_journal()
+
+    restart(monkeypatch)
+    reloaded = load_collections()
+    assert reloaded['files_db']['f1']['supplier'] == 'Acme'
+    assert data_manager.replay_journal(**reloaded) == 3
+    assert reloaded['files_db']['f1']['supplier'] == 'Globex'
+    assert reloaded['files_db']['f1']['history'][-1] == entry
+    assert reloaded['notifications_db']['admin']['n1']['title'] == 'Hello'
+
+    # Replaying over data that already holds the appended entry does not append it again
+    data_manager.replay_journal(**reloaded)
+    assert len(reloaded['files_db']['f1']['history']) == 2
+
+    # The replayed changes are part of the next snapshot, which empties the journal
+    data_manager.save_data(**reloaded, only_dirty=True)
+    restart(monkeypatch)
+    saved = load_collections()
+    assert data_manager.replay_journal(**saved) == 0
+    assert saved['files_db']['f1']['supplier'] == 'Globex'
+
+def test_journal_replay_stops_at_a_torn_record(data_dir, monkeypatch, make_file):
+    collections = load_collections()
+    save_files(collections, {'f1': make_file('f1')})
+    start_tracking(monkeypatch, collections)
+    collections['files_db']['f1']['current_step'] = 'review'
+    data_manager.record_change('files_db', 'set', ['f1', 'current_step'], 'review')
+    data_manager.sync_journal()
+
+    restart(monkeypatch)
+    with open(data_manager.JOURNAL_FILE, 'ab') as f:
+        f.write(b'\x80\x05\x95 torn')
+    reloaded = load_collections()
+    assert data_manager.replay_journal(**reloaded) == 1
+    assert reloaded['files_db']['f1']['current_step'] == 'review'
+
+def test_rotated_journal_is_kept_until_a_save_succeeds(data_dir, monkeypatch, make_file):
+    collections = load_collections()
+    save_files(collections, {'f1': make_file('f1')})
+    start_tracking(monkeypatch, collections)
+    collections['users_db']['carol'] = {'password': 'secret', 'roles': []}
+    data_manager.record_change('users_db', 'set', ['carol'], collections['users_db']['carol'])
+    collections['steps_list'].append('review')
+    data_manager.record_change('steps', 'append', [], 'review')
+
+    # One collection fails to write and one fails to serialize
+    write_bytes_atomic = data_manager._write_bytes_atomic
+    def failing_write(path, data):
+        if path == data_manager.USERS_FILE:
+            raise OSError('disk full')
+        write_bytes_atomic(path, data)
+    serialize = data_manager._serialize
+    def failing_serialize(data):
+        if isinstance(data, list) and 'review' in data:
+            raise ValueError('broken')
+        return serialize(data)
+    monkeypatch.setattr(data_manager, '_write_bytes_atomic', failing_write)
+    monkeypatch.setattr(data_manager, '_serialize', failing_serialize)
+    data_manager.save_data(**collections, only_dirty=True)
+    assert os.path.exists(data_manager.JOURNAL_FILE + '.1')
+    assert {'users_db', 'steps'} <= data_manager._dirty_collections
+
+    # The next save writes both and drops the rotated journal
+    monkeypatch.setattr(data_manager, '_write_bytes_atomic', write_bytes_atomic)
+    monkeypatch.setattr(data_manager, '_serialize', serialize)
+    data_manager.save_data(**collections, only_dirty=True)
+    assert not os.path.exists(data_manager.JOURNAL_FILE + '.1')
+    restart(monkeypatch)
+    reloaded = load_collections()
+    assert 'carol' in reloaded['users_db'] and 'review' in reloaded['steps_list']
+
+def test_sqlite_notification_changes_are_written_per_row(data_dir, monkeypatch):
+    monkeypatch.setattr(data_manager, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(sqlite_storage, '_local', threading.local())
+    notification = lambda notification_id: {'id': notification_id, 'type': 'info', 'title': notification_id, 'message': '', 'read': False}
+    notifications_db = {
+        'admin': {notification_id: notification(notification_id) for notification_id in ('n1', 'n2', 'n3')},
+        'bob': {'b1': notification('b1')}
+    }
+    sqlite_storage.save_notifications(notifications_db)
+    monkeypatch.setattr(data_manager, '_collections', {'notifications_db': notifications_db})
+
+    try:
+        # Mark two read in one transaction, remove one and add one
+        for notification_id in ('n1', 'n3'):
+            notifications_db['admin'][notification_id]['read'] = True
+        data_manager.record_changes('notifications_db', [('update', ['admin', notification_id], {'read': True}) for notification_id in ('n1', 'n3')])
+        del notifications_db['admin']['n2']
+        data_manager.record_change('notifications_db', 'delete', ['admin', 'n2'])
+        notifications_db['admin']['n4'] = notification('n4')
+        data_manager.record_change('notifications_db', 'set', ['admin', 'n4'], notifications_db['admin']['n4'])
+
+        stored = sqlite_storage.load_notifications()
+        assert [(n['id'], n['read']) for n in stored['admin']] == [('n1', True), ('n3', True), ('n4', False)]
+        assert [n['id'] for n in stored['bob']] == ['b1']
+        assert sqlite_storage.get_unread_notification_count('admin') == 1
+        assert not data_manager._dirty_collections and not data_manager._dirty_notification_users
+    finally:
+        sqlite_storage.get_connection().close()
+
+def test_both_backends_count_files_by_supplier_alike(data_dir, monkeypatch, make_file):
+    files_db = {'f1': make_file('f1'), 'f2': make_file('f2'), 'f3': make_file('f3', supplier=None), 'f4': make_file('f4', supplier='unknown')}
+    counts = {'pickle': data_manager.count_files_by_supplier(files_db)}
+
+    monkeypatch.setattr(data_manager, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(sqlite_storage, '_local', threading.local())
+    try:
+        sqlite_storage.save_files_db(files_db)
+        counts['sqlite'] = data_manager.count_files_by_supplier(files_db)
+    finally:
+        sqlite_storage.get_connection().close()
+    assert counts['pickle'] == counts['sqlite'] == {'Acme': 2, 'unknown': 2}
+
+def test_only_changed_shards_are_written(data_dir, monkeypatch, make_file):
+    collections = load_collections()
+    file_ids = file_ids_in_distinct_shards(4)
+    save_files(collections, {file_id: make_file(file_id) for file_id in file_ids})
+    before = shard_inodes()
+    users_inode = os.stat(data_manager.USERS_FILE).st_ino
+
+    changed = file_ids[0]
+    collections['files_db'][changed]['supplier'] = 'Globex'
+    data_manager.mark_data_changed('files_db', file_id=changed)
+    data_manager.save_data(**collections, only_dirty=True)
+
+    after = shard_inodes()
+    shard = data_manager.get_files_db_shard(changed)
+    rewritten = {os.path.basename(data_manager._files_db_shard_path(shard)), os.path.basename(data_manager._files_db_index_path(shard))}
+    assert {name for name in after if after[name] != before.get(name)} == rewritten
+    assert os.stat(data_manager.USERS_FILE).st_ino == users_inode
+
+    restart(monkeypatch)
+    assert load_collections()['files_db'][changed]['supplier'] == 'Globex'
+
+def test_empty_shards_have_no_files(data_dir, monkeypatch, make_file):
+    collections = load_collections()
+    file_ids = file_ids_in_distinct_shards(2)
+    save_files(collections, {file_id: make_file(file_id) for file_id in file_ids})
+    shard_names = lambda file_id: {os.path.basename(data_manager._files_db_shard_path(data_manager.get_files_db_shard(file_id))),
+                                   os.path.basename(data_manager._files_db_index_path(data_manager.get_files_db_shard(file_id)))}
+    assert set(os.listdir(data_manager.FILES_DB_DIR)) == shard_names(file_ids[0]) | shard_names(file_ids[1]) | {'layout.pkl'}
+
+    # Removing the last file of a shard removes its files
+    del collections['files_db'][file_ids[0]]
+    data_manager.mark_data_changed('files_db', file_id=file_ids[0])
+    data_manager.save_data(**collections, only_dirty=True)
+    assert set(os.listdir(data_manager.FILES_DB_DIR)) == shard_names(file_ids[1]) | {'layout.pkl'}
+
+    # The missing shards load as empty, without rewriting the layout
+    restart(monkeypatch)
+    files_db = load_collections()['files_db']
+    assert isinstance(files_db, data_manager.LazyFilesDB)
+    assert list(files_db) == [file_ids[1]] and files_db[file_ids[1]] == make_file(file_ids[1])
+    assert not data_manager._dirty_collections and not data_manager._dirty_files
+
+def test_lazy_files_db_evicts_least_recently_used_shards(data_dir, monkeypatch, make_file):
+    monkeypatch.setattr(data_manager, 'FILES_DB_CACHE_SHARDS', 2)
+    monkeypatch.setattr(data_manager, 'FILES_DB_CACHE_MIN_IDLE', 0)
+    file_ids = file_ids_in_distinct_shards(4)
+    save_files(load_collections(), {file_id: make_file(file_id) for file_id in file_ids})
+
+    restart(monkeypatch)
+    files_db = load_collections()['files_db']
+    assert isinstance(files_db, data_manager.LazyFilesDB)
+    assert files_db.loaded_shards() == []
+    assert len(files_db) == 4 and files_db.get_summary(file_ids[0])['supplier'] == 'Acme'
+
+    for file_id in file_ids:
+        assert files_db[file_id]['original_filename'] == f'{file_id}.txt'
+    assert set(files_db.loaded_shards()) == {data_manager.get_files_db_shard(file_id) for file_id in file_ids[-2:]}
+
+    # An evicted shard is read again on the next access
+    assert files_db[file_ids[0]] == make_file(file_ids[0])
+    assert data_manager.get_files_db_shard(file_ids[0]) in files_db.loaded_shards()
+
+def test_shards_with_unsaved_changes_are_not_evicted(data_dir, monkeypatch, make_file):
+    monkeypatch.setattr(data_manager, 'FILES_DB_CACHE_SHARDS', 1)
+    monkeypatch.setattr(data_manager, 'FILES_DB_CACHE_MIN_IDLE', 0)
+    file_ids = file_ids_in_distinct_shards(3)
+    save_files(load_collections(), {file_id: make_file(file_id) for file_id in file_ids})
+
+    restart(monkeypatch)
+    collections = load_collections()
+    files_db = collections['files_db']
+    changed_shard = data_manager.get_files_db_shard(file_ids[0])
+    files_db[file_ids[0]]['supplier'] = 'Globex'
+    data_manager.mark_data_changed('files_db', file_id=file_ids[0])
+    files_db[file_ids[1]]
+    files_db[file_ids[2]]
+    assert changed_shard in files_db.loaded_shards()
+
+    # Once saved, the shard can be evicted and the change is read back from disk
+    data_manager.save_data(**collections, only_dirty=True)
+    assert changed_shard not in files_db.loaded_shards()
+    assert files_db[file_ids[0]]['supplier'] == 'Globex'
+
+def test_shards_held_by_a_thread_are_not_evicted(data_dir, monkeypatch, make_file):
+    monkeypatch.setattr(data_manager, 'FILES_DB_CACHE_SHARDS', 1)
+    monkeypatch.setattr(data_manager, 'FILES_DB_CACHE_MIN_IDLE', 0)
+    file_ids = file_ids_in_distinct_shards(3)
+    save_files(load_collections(), {file_id: make_file(file_id) for file_id in file_ids})
+
+    restart(monkeypatch)
+    files_db = load_collections()['files_db']
+    held_shard = data_manager.get_files_db_shard(file_ids[0])
+    data_manager.hold_files_db_shards(files_db)
+    record = files_db[file_ids[0]]
+
+    # Another thread loading shards does not evict the held one
+    reader = threading.Thread(target=lambda: [files_db[file_id] for file_id in file_ids[1:]])
+    reader.start()
+    reader.join()
+    assert held_shard in files_db.loaded_shards()
+    assert files_db[file_ids[0]] is record
+
+    data_manager.release_files_db_shards(files_db)
+    files_db[file_ids[1]]
+    assert held_shard not in files_db.loaded_shards()
+
+def test_summaries_are_rebuilt_once_when_read(data_dir, monkeypatch, make_file):
+    file_ids = file_ids_in_distinct_shards(2)
+    save_files(load_collections(), {file_id: make_file(file_id) for file_id in file_ids})
+    restart(monkeypatch)
+    collections = load_collections()
+    start_tracking(monkeypatch, collections)
+    files_db = collections['files_db']
+    file = files_db[file_ids[0]]
+
+    builds = []
+    build_file_summary = data_manager.build_file_summary
+    monkeypatch.setattr(data_manager, 'build_file_summary', lambda file: builds.append(1) or build_file_summary(file))
+    for minute in range(10):
+        entry = {'step': 'intake', 'timestamp': f'2026-01-02 10:{minute:02}', 'epoch': 1767348000 + minute * 60, 'user': 'admin'}
+        file['history'].append(entry)
+        data_manager.record_change('files_db', 'append', [file_ids[0], 'history'], entry)
+    assert builds == []
+
+    assert data_manager.get_file_summary(files_db, file_ids[0])['history_count'] == 11
+    assert data_manager.get_file_summaries(files_db)[file_ids[0]]['history_count'] == 11
+    assert len(builds) == 1
+
+def test_backup_hashes_are_only_reused_for_settled_files(data_dir, monkeypatch):
+    path = os.path.join(data_manager.DATA_DIR, 'sample.pkl')
+    with open(path, 'wb') as f:
+        f.write(b'aaaa')
+    digest = data_manager._store_backup_object(path)
+
+    # Rewritten in place with the same size and modification time
+    stat = os.stat(path)
+    with open(path, 'r+b') as f:
+        f.write(b'bbbb')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert data_manager._store_backup_object(path) != digest
+
+    # A file written well before it was hashed is not read again
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 60 * 10**9))
+    data_manager._store_backup_object(path)
+    hashes = []
+    sha256 = hashlib.sha256
+    monkeypatch.setattr(hashlib, 'sha256', lambda: hashes.append(1) or sha256())
+    data_manager._store_backup_object(path)
+    assert hashes == []
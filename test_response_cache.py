@@ -0,0 +1,102 @@
+"""
+Tests for the single-flight response cache.
+"""
+import threading
+import time
+
+import pytest
+
+import data_manager
+import response_cache
+
+@pytest.fixture
+def cache(data_dir, monkeypatch):
+    """
+    An empty response cache.
+    """
+    monkeypatch.setattr(response_cache, '_entries', {})
+    monkeypatch.setattr(response_cache, '_in_flight', {})
+    monkeypatch.setattr(response_cache, '_stats', {})
+    return response_cache
+
+def wait_for(condition, timeout=5):
+    """
+    Wait until condition() is true.
+    """
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'Timed out waiting for condition'
+        time.sleep(0.01)
+
+def test_concurrent_requests_share_one_computation(cache):
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {'files': 3}
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(('api_files',), compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Release the computation once every other request waits for it
+    wait_for(lambda: cache.get_cache_stats()['coalesced'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 5 and all(result is results[0] for result in results)
+    stats = cache.get_cache_stats()
+    assert (stats['misses'], stats['coalesced'], stats['in_flight']) == (1, 4, 0)
+    assert stats['endpoints']['api_files']['misses'] == 1
+
+def test_results_are_served_until_data_changes(cache):
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_compute(('statistics',), compute) == 1
+    assert cache.get_or_compute(('statistics',), compute) == 1
+    assert cache.get_cache_stats()['hits'] == 1
+
+    data_manager.mark_data_changed('steps')
+    assert cache.get_or_compute(('statistics',), compute) == 2
+    assert cache.get_or_compute(('statistics', '2026-01-01'), compute) == 3
+
+def test_result_of_a_generation_changed_during_computation_is_not_served(cache):
+    def compute():
+        # Data changes while the result is computed from the old data
+        data_manager.mark_data_changed('steps')
+        return 'stale'
+
+    assert cache.get_or_compute(('statistics',), compute) == 'stale'
+    assert cache.get_or_compute(('statistics',), lambda: 'fresh') == 'fresh'
+    assert cache.get_or_compute(('statistics',), lambda: 'not computed') == 'fresh'
+
+def test_errors_reach_waiting_requests_and_are_not_cached(cache):
+    release = threading.Event()
+    errors = []
+
+    def compute():
+        release.wait(5)
+        raise ValueError('broken')
+
+    def request():
+        try:
+            cache.get_or_compute(('statistics',), compute)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.get_cache_stats()['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 3
+    assert cache.get_cache_stats()['errors'] == 1
+    assert cache.get_or_compute(('statistics',), lambda: 'recovered') == 'recovered'
@@ -2,4 +2,4 @@ from waitress import serve
 from app import app  # Replace `app` with your Flask app instance
 
 if __name__ == "__main__":
-    serve(app, host="0.0.0.0", port=8002, threads=8)
+    serve(app, host="0.0.0.0", port=8002, threads=24)